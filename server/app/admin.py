@@ -16,7 +16,6 @@ from werkzeug.utils import secure_filename
 
 from . import config
 from .api.tools import error_response, success_response
-from moviepy import VideoFileClip
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 from .database import get_db
@@ -32,6 +31,8 @@ def get_video_duration(file_path):
     """获取视频时长（需要安装moviepy或opencv）"""
     try:
         # 方法1: 使用moviepy（推荐）
+        # moviepy会连带导入tqdm等依赖，用到时才导入，不拖慢Web进程启动
+        from moviepy import VideoFileClip
 
         with VideoFileClip(file_path) as video:
             return video.duration
@@ -53,6 +54,8 @@ def extract_first_frame_moviepy(video_path, thumbnail_path=None, size=(320, 180)
         str: 缩略图保存路径
     """
     try:
+        from moviepy import VideoFileClip
+
         # 打开视频文件
         with VideoFileClip(video_path) as video:
 
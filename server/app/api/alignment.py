@@ -0,0 +1,281 @@
+# app/api/alignment.py
+import math
+import warnings
+
+import cv2
+import numpy as np
+
+from app import config
+from .landmark_cache import cache_key, landmark_cache
+from .pose_extraction import read_video_info
+from .pose_pool import pose_pool
+
+
+ALIGNMENT = getattr(config, 'ALIGNMENT', True)
+# 对齐探测的抽帧率和缩放后的最长边，只需要肩膀高度，远低于正式分析的精度
+ALIGN_PROBE_FPS = getattr(config, 'ALIGN_PROBE_FPS', 5)
+ALIGN_PROBE_SIZE = getattr(config, 'ALIGN_PROBE_SIZE', 256)
+# 两路肩膀高度信号的相关系数低于该值时认为无法对齐，各自只裁掉首尾静止片段
+ALIGN_MIN_CORRELATION = getattr(config, 'ALIGN_MIN_CORRELATION', 0.5)
+# 搜索的最大时间偏移（秒）和计算相关时两路至少重叠的时长（秒）
+ALIGN_MAX_LAG_SECONDS = getattr(config, 'ALIGN_MAX_LAG_SECONDS', 30)
+ALIGN_MIN_OVERLAP_SECONDS = getattr(config, 'ALIGN_MIN_OVERLAP_SECONDS', 5)
+# 1秒内肩膀高度（归一化坐标）的变化幅度超过该值视为在做动作
+ALIGN_MIN_MOTION = getattr(config, 'ALIGN_MIN_MOTION', 0.02)
+# 动作窗口前后保留的秒数，留给滤波和周期检测的边界
+ALIGN_PADDING_SECONDS = getattr(config, 'ALIGN_PADDING_SECONDS', 1.5)
+# 裁剪后的窗口短于该时长（秒）时不裁剪
+ALIGN_MIN_WINDOW_SECONDS = getattr(config, 'ALIGN_MIN_WINDOW_SECONDS', 3)
+
+
+def probe_shoulder_signal(video_path):
+    """
+    按 ALIGN_PROBE_FPS 抽取缩小后的帧，用轻量Pose模型得到肩膀高度信号（较高一侧肩膀的归一化y，未检测到为NaN）
+    返回 {'rate': 采样率, 'heights': 数组, 'fps', 'total_frames'}，无法打开视频时返回None
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        cap.release()
+        return None
+
+    try:
+        info = read_video_info(cap)
+        fps = info['fps']
+        if not fps or fps <= 0:
+            return None
+        step = max(1, int(round(fps / ALIGN_PROBE_FPS)))
+        heights = []
+
+        with pose_pool.borrow('preflight') as pose:
+            frame_idx = 0
+            # 不需要的帧只grab不retrieve，省去像素格式转换
+            while cap.grab():
+                if frame_idx % step == 0:
+                    success, frame = cap.retrieve()
+                    if not success:
+                        break
+                    h, w = frame.shape[:2]
+                    scale = ALIGN_PROBE_SIZE / max(h, w)
+                    if scale < 1:
+                        frame = cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))),
+                                           interpolation=cv2.INTER_AREA)
+                    results = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                    if results.pose_landmarks:
+                        landmarks = results.pose_landmarks.landmark
+                        heights.append(min(landmarks[11].y, landmarks[12].y))
+                    else:
+                        heights.append(np.nan)
+                frame_idx += 1
+    finally:
+        cap.release()
+
+    return {
+        'rate': fps / step,
+        'heights': np.asarray(heights, dtype=np.float64),
+        'fps': fps,
+        # CAP_PROP_FRAME_COUNT 可能不准确，以实际读到的帧数为准
+        'total_frames': frame_idx
+    }
+
+
+def _resample(signal, rate):
+    """把探测信号插值到 ALIGN_PROBE_FPS 的统一时间网格，缺失值按相邻检测插值；有效点太少时返回None"""
+    valid = ~np.isnan(signal['heights'])
+    if valid.sum() < 4:
+        return None
+    times = np.arange(len(signal['heights'])) / signal['rate']
+    grid = np.arange(0, times[-1] + 1e-9, 1.0 / rate)
+    return np.interp(grid, times[valid], signal['heights'][valid])
+
+
+def estimate_offset(front, side):
+    """
+    对两路肩膀高度信号做归一化互相关，返回 (偏移秒数, 相关系数)
+    偏移满足：正面t秒的动作出现在侧面 t + 偏移 秒；无法估计时返回 (None, 0.0)
+    """
+    rate = float(ALIGN_PROBE_FPS)
+    a, b = _resample(front, rate), _resample(side, rate)
+    if a is None or b is None or a.std() < 1e-6 or b.std() < 1e-6:
+        return None, 0.0
+    a = (a - a.mean()) / a.std()
+    b = (b - b.mean()) / b.std()
+
+    # c[lag] = sum(b[n + lag] * a[n])，lag从 -(len(a)-1) 到 len(b)-1；按重叠样本数归一化
+    corr = np.correlate(b, a, 'full')
+    overlap = np.correlate(np.ones(len(b)), np.ones(len(a)), 'full')
+    lags = np.arange(-(len(a) - 1), len(b))
+    allowed = (overlap >= ALIGN_MIN_OVERLAP_SECONDS * rate) & (np.abs(lags) <= ALIGN_MAX_LAG_SECONDS * rate)
+    if not allowed.any():
+        return None, 0.0
+
+    scores = np.where(allowed, corr / np.maximum(overlap, 1), -np.inf)
+    lag = int(lags[int(np.argmax(scores))])
+
+    # 报告最佳偏移处重叠部分的皮尔逊相关系数（-1~1），用于判断对齐是否可信
+    n0, n1 = max(0, -lag), min(len(a), len(b) - lag)
+    correlation = np.corrcoef(a[n0:n1], b[n0 + lag:n1 + lag])[0, 1]
+    return lag / rate, float(correlation) if np.isfinite(correlation) else 0.0
+
+
+def active_window(signal):
+    """肩膀高度有明显变化的时间段 (开始秒, 结束秒)，包含前后留白；没有动作时返回None"""
+    heights = signal['heights']
+    width = max(1, int(round(signal['rate'])))
+    if len(heights) < width:
+        return None
+
+    # 1秒滑动窗口内的变化幅度（NaN不参与）
+    windows = np.lib.stride_tricks.sliding_window_view(heights, width)
+    with warnings.catch_warnings():
+        # 全为NaN的窗口结果为NaN，不视为动作
+        warnings.simplefilter('ignore', RuntimeWarning)
+        motion = np.nanmax(windows, axis=1) - np.nanmin(windows, axis=1)
+    active = np.flatnonzero(motion >= ALIGN_MIN_MOTION)
+    if len(active) == 0:
+        return None
+
+    start = active[0] / signal['rate'] - ALIGN_PADDING_SECONDS
+    end = (active[-1] + width) / signal['rate'] + ALIGN_PADDING_SECONDS
+    return max(0.0, float(start)), float(end)
+
+
+def _frame_range(window, signal):
+    """秒数窗口转换为 [起始帧, 结束帧)，覆盖整个视频或窗口过短时返回None"""
+    if window is None:
+        return None
+    start, end = window
+    if end - start < ALIGN_MIN_WINDOW_SECONDS:
+        return None
+    fps, total_frames = signal['fps'], signal['total_frames']
+    start_frame = max(0, int(math.floor(start * fps)))
+    stop_frame = int(math.ceil(end * fps))
+    if stop_frame >= total_frames:
+        stop_frame = None
+    if start_frame == 0 and stop_frame is None:
+        return None
+    return start_frame, stop_frame
+
+
+def align_views(front_path, side_path):
+    """
+    估计正面/侧面视频的时间偏移和公共动作窗口，两路只分析该窗口内的帧
+    返回 {'offset_seconds', 'correlation', 'aligned', 'views': {视角: {'frame_range', 'fps'}}}，
+    frame_range为None表示分析整个视频；无法对齐时各自只裁掉首尾静止片段
+    """
+    signals = {'front': probe_shoulder_signal(front_path), 'side': probe_shoulder_signal(side_path)}
+    if any(signal is None for signal in signals.values()):
+        return None
+    front, side = signals['front'], signals['side']
+
+    offset, correlation = estimate_offset(front, side)
+    aligned = offset is not None and correlation >= ALIGN_MIN_CORRELATION
+    windows = {view: active_window(signal) for view, signal in signals.items()}
+
+    if aligned:
+        # 在正面时间轴上取：两路视频的重叠部分 ∩ 任一路在做动作的时间段
+        front_duration = front['total_frames'] / front['fps']
+        side_duration = side['total_frames'] / side['fps']
+        start, end = max(0.0, -offset), min(front_duration, side_duration - offset)
+        active = [(w[0] - shift, w[1] - shift) for w, shift in ((windows['front'], 0.0), (windows['side'], offset))
+                  if w is not None]
+        if active:
+            start = max(start, min(w[0] for w in active))
+            end = min(end, max(w[1] for w in active))
+        if end - start >= ALIGN_MIN_WINDOW_SECONDS:
+            windows = {'front': (start, end), 'side': (start + offset, end + offset)}
+        else:
+            aligned = False
+
+    views = {view: {'frame_range': _frame_range(windows[view], signal), 'fps': signal['fps']}
+             for view, signal in signals.items()}
+    return {
+        'offset_seconds': round(offset, 3) if aligned else None,
+        'correlation': round(correlation, 3),
+        'aligned': aligned,
+        'views': views
+    }
+
+
+def _cycle_times(cycles, view):
+    """周期中点在该视角原视频中的时间（秒）"""
+    start = (view['frame_range'] or (0, None))[0]
+    return np.array([(start + (c['start_frame'] + c['end_frame']) / 2) / view['fps'] for c in cycles])
+
+
+def pair_cycles(front_cycles, side_cycles, alignment):
+    """
+    按对齐后的时间把两路的动作周期一一配对，返回按正面顺序排列的 [(正面序号, 侧面序号), ...]
+    中点相差超过半个周期的不配对；未对齐时返回空列表
+    """
+    if not alignment or not alignment['aligned'] or not front_cycles or not side_cycles:
+        return []
+
+    front_times = _cycle_times(front_cycles, alignment['views']['front'])
+    side_times = _cycle_times(side_cycles, alignment['views']['side']) - alignment['offset_seconds']
+    durations = [(c['end_frame'] - c['start_frame']) / alignment['views']['front']['fps'] for c in front_cycles]
+    tolerance = float(np.median(durations)) / 2
+
+    # 按时间差从小到大贪心配对，每个周期最多配对一次
+    distance = np.abs(front_times[:, None] - side_times[None, :])
+    pairs, used_front, used_side = [], set(), set()
+    for i, j in zip(*np.unravel_index(np.argsort(distance, axis=None), distance.shape)):
+        if distance[i, j] > tolerance:
+            break
+        if i not in used_front and j not in used_side:
+            pairs.append((int(i), int(j)))
+            used_front.add(i)
+            used_side.add(j)
+    return sorted(pairs)
+
+
+def number_cycles(front_cycles, side_cycles, alignment, pairs):
+    """
+    按对齐后的时间给两路的全部周期统一编号（从1开始），配对的两个周期编号相同，未配对的周期按时间插入
+    返回 (正面各周期编号, 侧面各周期编号)；没有配对时返回 (None, None)，两路各自按顺序编号
+    """
+    if not pairs:
+        return None, None
+
+    front_times = _cycle_times(front_cycles, alignment['views']['front'])
+    side_times = _cycle_times(side_cycles, alignment['views']['side']) - alignment['offset_seconds']
+    paired_side = {j for _, j in pairs}
+    events = [(float(front_times[i]), 'front', i) for i in range(len(front_cycles))]
+    events += [(float(side_times[j]), 'side', j) for j in range(len(side_cycles)) if j not in paired_side]
+
+    numbers = {'front': [0] * len(front_cycles), 'side': [0] * len(side_cycles)}
+    for number, (_, view, index) in enumerate(sorted(events), start=1):
+        numbers[view][index] = number
+    for i, j in pairs:
+        numbers['side'][j] = numbers['front'][i]
+    return numbers['front'], numbers['side']
+
+
+def _alignment_key(front_hash, side_hash):
+    """两路视频内容哈希和对齐参数对应的缓存键"""
+    if not front_hash or not side_hash:
+        return None
+    return cache_key(f'{front_hash}+{side_hash}', 'alignment',
+                     probe=(ALIGN_PROBE_FPS, ALIGN_PROBE_SIZE),
+                     correlation=ALIGN_MIN_CORRELATION,
+                     lag=(ALIGN_MAX_LAG_SECONDS, ALIGN_MIN_OVERLAP_SECONDS),
+                     window=(ALIGN_MIN_MOTION, ALIGN_PADDING_SECONDS, ALIGN_MIN_WINDOW_SECONDS))
+
+
+def load_alignment(front_hash, side_hash):
+    """
+    读取同一对视频之前的对齐结果，未命中返回None
+    对齐决定了两路的分析窗口，也就决定了关键点缓存键，复用它才能命中之前按窗口提取的缓存
+    """
+    alignment = landmark_cache.load_meta(_alignment_key(front_hash, side_hash))
+    if alignment is None:
+        return None
+    for view in alignment['views'].values():
+        if view['frame_range'] is not None:
+            view['frame_range'] = tuple(view['frame_range'])
+    return alignment
+
+
+def save_alignment(front_hash, side_hash, alignment):
+    """按两路视频内容哈希缓存对齐结果"""
+    if alignment is not None:
+        landmark_cache.save_meta(_alignment_key(front_hash, side_hash), alignment)
@@ -1,16 +1,261 @@
 # app/api/celery_tasks.py
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+import redis
+from celery.signals import worker_process_init
+
+from app.api.timing import StageTimer, log_timings
 from app.celery_app import celery_app
+from app.redis_manager import redis_manager
+
+# Web进程会导入本模块以提交任务，视频分析相关模块（cv2/mediapipe/scipy等）只在任务内部导入，
+# 避免gunicorn worker加载整套视觉依赖
+
+
+VIEW_LABELS = {'side': '侧面', 'front': '正面'}
+# 单路进度中关键点提取阶段所占比例，其余为打分阶段
+EXTRACT_SHARE = 90
+
+
+@worker_process_init.connect
+def init_pose_pool(**kwargs):
+    """worker子进程启动时预先加载Pose模型，任务直接从实例池借用"""
+    from app.api.pose_pool import pose_pool
+    pose_pool.warm_up(('preflight', 'side', 'front'))
+
+
+def _publish(task_id, event):
+    """推送任务事件给SSE订阅者，推送失败不影响分析本身"""
+    try:
+        redis_manager.publish_task_event(task_id, event)
+    except redis.RedisError as e:
+        print(f"⚠️ 任务事件推送失败: {e}")
+
+
+def _record_outcome(task_id, result=None, error=None):
+    """把最终结果或错误写入任务记录，并通知SSE订阅者"""
+    try:
+        if error is None:
+            redis_manager.set_task_result(task_id, result['result'], result['project'])
+            redis_manager.publish_task_event(task_id, result)
+        else:
+            redis_manager.set_task_error(task_id, error)
+            redis_manager.publish_task_event(task_id, {'status': 'error', 'progress': 0, 'error': error})
+    except redis.RedisError as e:
+        print(f"⚠️ 任务结果写入Redis失败: {e}")
+
+
+def _report_progress(task, task_id, meta):
+    """更新Celery任务状态，并推送同样的进度事件"""
+    task.update_state(state='PROCESSING', meta=meta)
+    _publish(task_id, meta)
+
+
+class ViewProgress:
+    """汇总侧面/正面两路分析的进度（阶段、帧数、预计剩余时间），写入Celery任务状态"""
+
+    def __init__(self, task, task_id, views):
+        self.task = task
+        self.task_id = task_id
+        self.lock = threading.Lock()
+        self.views = {
+            view: {'status': 'pending', 'stage': 'pending', 'progress': 0,
+                   'frames_done': 0, 'total_frames': 0, 'eta': None, 'reps': 0}
+            for view in views
+        }
+        self.started = {}
+
+    def update(self, view, status, progress, message, **fields):
+        with self.lock:
+            self.views[view].update(status=status, progress=progress, **fields)
+            # 10%~90% 区间按两路进度的平均值分配
+            average = sum(v['progress'] for v in self.views.values()) / len(self.views)
+            # 两路并行，整体剩余时间取较慢的一路
+            etas = [v['eta'] for v in self.views.values() if v['status'] != 'completed' and v['eta'] is not None]
+            _report_progress(self.task, self.task_id, {
+                'status': 'processing',
+                'progress': 10 + int(average * 0.8),
+                'message': message,
+                'eta': max(etas) if etas else None,
+                'views': {k: dict(v) for k, v in self.views.items()}
+            })
+
+    def frames(self, view, done, total):
+        """提取阶段的帧进度回调，按已用时间和处理速度估算剩余时间"""
+        now = time.monotonic()
+        started = self.started.setdefault(view, now)
+        eta = round((now - started) / done * (total - done), 1) if done and total else None
+        progress = int(done / total * EXTRACT_SHARE) if total else 0
+        self.update(view, 'processing', progress, f'正在提取{VIEW_LABELS[view]}视频关键点（{done}/{total}帧）',
+                    stage='extract', frames_done=done, total_frames=total, eta=eta)
+
+    def rep(self, view, cycle):
+        """提取过程中流式检测到一个完整动作周期"""
+        state = self.views[view]
+        reps = state['reps'] + 1
+        self.update(view, state['status'], state['progress'], f'{VIEW_LABELS[view]}视频已完成{reps}个动作',
+                    reps=reps, last_rep=cycle)
+
+
+def _queue_depth():
+    """当前排队的任务数，读取失败时按无积压处理"""
+    try:
+        return redis_manager.queue_depth()
+    except redis.RedisError as e:
+        print(f"⚠️ 读取队列长度失败: {e}")
+        return 0
+
+
+def _run_view(progress, view, module, video_path, content_hash=None, settings=None):
+    """
+    在线程中提取单路视频并检测动作周期，上报该路的进度，返回 ((逐帧指标, 周期列表), 关键点轨迹, 各阶段计时)
+    settings: 计算预算为该路选择的 model_complexity / analysis_fps，以及对齐得到的 frame_range
+    """
+    settings = settings or {}
+    label = VIEW_LABELS[view]
+    timer = StageTimer()
+    progress.update(view, 'processing', 0, f'开始处理{label}视频...', stage='extract')
+    with timer.span('extract'):
+        extracted = module.extract(video_path, content_hash=content_hash,
+                                   on_progress=lambda done, total: progress.frames(view, done, total),
+                                   on_rep=lambda cycle: progress.rep(view, cycle), timer=timer,
+                                   model_complexity=settings.get('model_complexity'),
+                                   analysis_fps=settings.get('analysis_fps'),
+                                   frame_range=settings.get('frame_range'))
+    if extracted is None:
+        print("❌ 数据提取失败")
+        detected, store = None, None
+    else:
+        progress.update(view, 'processing', EXTRACT_SHARE, f'正在分析{label}动作...', stage='score', eta=None)
+        store, df = extracted
+        with timer.span('score'):
+            detected = module.detect(store, df, timer=timer)
+    progress.update(view, 'completed', 100, f'{label}视频处理完成', stage='done', eta=None)
+    return detected, store, timer
+
+
+def _describe_views(front_detected, side_detected, alignment, timers):
+    """
+    两路周期按对齐后的时间配对并统一编号，使正面/侧面描述中相同序号的周期是同一个动作
+    未配对的周期同样描述，动作个数按各自检测到的全部周期计算；返回 (正面结果, 侧面结果, 配对列表)
+    """
+    from app.api import process_front, process_side
+    from app.api.alignment import number_cycles, pair_cycles
+
+    if front_detected is None or side_detected is None:
+        return None, None, []
+
+    (front_df, front_cycles), (side_df, side_cycles) = front_detected, side_detected
+    pairs = pair_cycles(front_cycles, side_cycles, alignment)
+    front_numbers, side_numbers = number_cycles(front_cycles, side_cycles, alignment, pairs)
+
+    with timers['front'].span('score'):
+        front_result = process_front.describe(front_df, front_cycles, timer=timers['front'],
+                                              cycle_numbers=front_numbers)
+    with timers['side'].span('score'):
+        side = process_side.describe(side_df, side_cycles, timer=timers['side'], cycle_numbers=side_numbers)
+    return front_result, side, pairs
+
+
+def _view_timings(timer):
+    """单路计时汇总，附带运动门控跳过推理的帧占比"""
+    timings = timer.as_dict()
+    counters = timings['counters']
+    frames = counters.get('frames', 0)
+    timings['motion_skip_rate'] = round(counters.get('motion_skipped', 0) / frames, 4) if frames else None
+    return timings
+
+
+def _build_result(front_result, side):
+    """合并两路分析结果"""
+    if side is None or front_result is None:
+        raise Exception('视频处理失败，请检查视频清晰度或背景颜色')
+
+    front, num = front_result
+    return {
+        'status': 'completed',
+        'result': {
+            'message': front + side,
+        },
+        'project': f'引体向上{num}个',
+        'progress': 100
+    }
+
+
+def rescore(task_id):
+    """用保存的关键点轨迹重新滤波、检测周期和打分，不解码视频（评分逻辑调整后批量重算历史记录）"""
+    from app.api import process_front, process_side
+    from app.api.track_store import load_track_alignment, load_tracks
+
+    tracks = load_tracks(task_id)
+    if tracks is None or 'side' not in tracks or 'front' not in tracks:
+        raise Exception('关键点轨迹不存在或已过期')
 
-from app.api import process_side, process_front
+    # 与首次分析相同：先各自检测周期，再按保存的对齐结果配对编号后生成描述
+    timers = {'side': StageTimer(), 'front': StageTimer()}
+    front_result, side, _ = _describe_views(process_front.detect(tracks['front'], timer=timers['front']),
+                                            process_side.detect(tracks['side'], timer=timers['side']),
+                                            load_track_alignment(task_id), timers)
+    return _build_result(front_result, side)
+
+
+@celery_app.task(name='rescore_task')
+def rescore_task(task_id):
+    """Celery任务：重新打分"""
+    return rescore(task_id)
+
+
+@celery_app.task(name='render_overlay_task')
+def render_overlay_task(task_id, view, video_path, first_frame=0):
+    """
+    Celery任务：按保存的关键点轨迹渲染某个视角的骨架可视化视频，完成或失败后删除分析用的视频
+    与分析任务分开执行，渲染耗时不计入分析任务的时限，渲染失败也不影响已写入的评估结果
+    """
+    from app.api.overlay_store import overlay_path, purge_expired
+    from app.api.render_overlay import render_overlay
+    from app.api.track_store import load_tracks
+
+    try:
+        tracks = load_tracks(task_id)
+        if tracks is None or view not in tracks:
+            print(f"⚠️ 关键点轨迹不存在，无法生成{VIEW_LABELS[view]}可视化视频")
+            return None
+        return render_overlay(video_path, tracks[view], overlay_path(task_id, view), view, first_frame)
+    except Exception as e:
+        print(f"⚠️ {VIEW_LABELS[view]}可视化视频生成失败: {e}")
+        return None
+    finally:
+        try:
+            if os.path.exists(video_path):
+                os.remove(video_path)
+        except OSError:
+            pass
+        purge_expired()
 
 
 @celery_app.task(bind=True, name='process_video_task')
-def process_video_task(self, task_id, front_video_path, side_video_path, user_id):
+def process_video_task(self, task_id, front_video_path, side_video_path, user_id,
+                       front_hash=None, side_hash=None, render_overlay=None):
     """
     Celery任务：处理视频分析
+    render_overlay: 是否生成骨架可视化视频，None时取配置 RENDER_OVERLAY
     """
+    from app.api import process_front, process_side
+    from app.api.alignment import ALIGNMENT, align_views, load_alignment, save_alignment
+    from app.api.compute_budget import cached_choice, plan_budget
+    from app.api.landmark_cache import landmark_cache
+    from app.api.pose_extraction import probe_video_info, window_length
+    from app.api.preflight import preflight_check
+    from app.api.render_overlay import RENDER_OVERLAY
+    from app.api.track_store import TRACK_FOLDER, save_tracks
+    from app.api.transcode import analysis_hash, needs_transcode, normalize_video, normalized_path, untranscoded
+
+    # 任务级阶段（转码、预检、两路分析、保存轨迹）的耗时，两路各自的细分阶段见 timings['views']
+    task_timer = StageTimer()
+    started = time.perf_counter()
     try:
         files_to_delete = []
         if front_video_path and os.path.exists(front_video_path):
@@ -18,52 +263,177 @@ def process_video_task(self, task_id, front_video_path, side_video_path, user_id
         if side_video_path and os.path.exists(side_video_path):
             files_to_delete.append(side_video_path)
 
+        _report_progress(self, task_id, {
+            'status': 'processing',
+            'progress': 2,
+            'message': '正在预处理视频...'
+        })
+        # 原视频哈希加上转码参数即可确定分析视频的缓存键，转码前先检查对齐结果和关键点缓存
+        views = ('side', 'front')
+        video_paths = {'side': side_video_path, 'front': front_video_path}
+        content_hashes = {'side': side_hash, 'front': front_hash}
+        with task_timer.span('ingest'):
+            sources = {view: probe_video_info(video_paths[view]) for view in views}
+        # 转码后帧号与原视频不同，缓存键按转码参数区分
+        hashes = {view: analysis_hash(content_hashes[view], needs_transcode(sources[view])) for view in views}
+
+        # 已有关键点缓存的视频之前完整提取过，无需转码和预检；计算预算的任一档有缓存都直接复用
+        def find_cached(view, module, alignment):
+            if not hashes[view]:
+                return None
+            frame_range = alignment['views'][view]['frame_range'] if alignment else None
+            return cached_choice(view, lambda model_complexity, analysis_fps: landmark_cache.contains(
+                module.cache_key(hashes[view], model_complexity, analysis_fps, frame_range)))
+
+        def lookup(alignment=None):
+            # 同一对视频之前的对齐结果决定了分析窗口，缓存检查与提取使用相同的窗口和缓存键
+            if ALIGNMENT and alignment is None:
+                alignment = load_alignment(hashes['front'], hashes['side'])
+            return alignment, {'side': find_cached('side', process_side, alignment),
+                               'front': find_cached('front', process_front, alignment)}
+
+        alignment, cached = lookup()
+
+        # 需要读取视频的视角（未命中缓存、尚无对齐结果或需要可视化视频）在worker中转码为分辨率和帧率统一的中间文件，
+        # 之后的预检、对齐、提取和可视化都使用转码后的视频；命中缓存的视角直接使用原视频路径，不会再读取
+        want_overlay = RENDER_OVERLAY if render_overlay is None else render_overlay
+        normalized = {view: untranscoded(video_paths[view], sources[view]) for view in views}
+        prepared = set()
+        while True:
+            pending = [view for view in views if view not in prepared
+                       and (cached[view] is None or (ALIGNMENT and alignment is None) or want_overlay)]
+            if not pending:
+                break
+            with task_timer.span('ingest'), ThreadPoolExecutor(max_workers=2) as executor:
+                futures = {view: executor.submit(normalize_video, video_paths[view], VIEW_LABELS[view], sources[view])
+                           for view in pending}
+                for view, future in futures.items():
+                    normalized[view] = future.result()
+            prepared.update(pending)
+            files_to_delete.extend(normalized[view]['path'] for view in pending if normalized[view]['transcoded'])
+
+            # 转码失败时分析原视频，缓存键改回原视频哈希后重新检查，对齐结果失效时其余视角也要读取视频
+            fallback = {view: content_hashes[view] for view in pending
+                        if not normalized[view]['transcoded'] and hashes[view] != content_hashes[view]}
+            if fallback:
+                hashes.update(fallback)
+                alignment, cached = lookup()
+        side_path, front_path = normalized['side']['path'], normalized['front']['path']
+
+        # 快速预检，无法分析的视频在完整分析前直接失败
+        _report_progress(self, task_id, {
+            'status': 'processing',
+            'progress': 5,
+            'message': '正在检查视频...'
+        })
+        with task_timer.span('preflight'):
+            if cached['side'] is None:
+                preflight_check(side_path, VIEW_LABELS['side'])
+            if cached['front'] is None:
+                preflight_check(front_path, VIEW_LABELS['front'])
+
+        # 低帧率探测两路的肩膀高度，互相关得到时间偏移和公共动作窗口，两路只分析窗口内的帧
+        if ALIGNMENT and alignment is None:
+            with task_timer.span('alignment'):
+                alignment = align_views(front_path, side_path)
+            print(f"📐 视频对齐: {alignment}")
+            save_alignment(hashes['front'], hashes['side'], alignment)
+            # 分析窗口变化后按新的缓存键重新检查
+            alignment, cached = lookup(alignment)
+        frame_ranges = {view: alignment['views'][view]['frame_range'] if alignment else None
+                        for view in views}
+
+        def budget_info(path, cached, frame_range):
+            info = None if cached else probe_video_info(path)
+            if info is not None:
+                info['total_frames'] = window_length(info['total_frames'], frame_range)
+            return info
+
+        # 按视频时长、分辨率和队列积压选择模型复杂度和抽帧率，高峰期用稍粗的分析换取及时返回
+        # 已有缓存的视角沿用缓存对应的一档，不参与预算
+        with task_timer.span('budget'):
+            budget = plan_budget({
+                'side': budget_info(side_path, cached['side'] is not None, frame_ranges['side']),
+                'front': budget_info(front_path, cached['front'] is not None, frame_ranges['front'])
+            }, _queue_depth(), cached=cached)
+        print(f"📊 计算预算: {budget}")
+        settings = {view: dict(budget['views'][view], frame_range=frame_ranges[view]) for view in ('side', 'front')}
+
         # 更新任务进度
-        self.update_state(
-            state='PROCESSING',
-            meta={
-                'status': 'processing',
-                'progress': 10,
-                'message': '开始处理侧面视频...'
-            }
-        )
+        _report_progress(self, task_id, {
+            'status': 'processing',
+            'progress': 10,
+            'message': '开始处理视频...'
+        })
 
-        # 处理侧面视频
-        side = process_side.process(side_video_path)
+        # 侧面与正面视频互不依赖，两路同时分析（用线程而不是子进程的原因见 pose_extraction._extract_segments）
+        progress = ViewProgress(self, task_id, ('side', 'front'))
+        with task_timer.span('analyze'), ThreadPoolExecutor(max_workers=2) as executor:
+            side_future = executor.submit(_run_view, progress, 'side', process_side,
+                                          side_path, hashes['side'], settings['side'])
+            front_future = executor.submit(_run_view, progress, 'front', process_front,
+                                           front_path, hashes['front'], settings['front'])
+            side_detected, side_store, side_timer = side_future.result()
+            front_detected, front_store, front_timer = front_future.result()
 
-        # 更新进度
-        self.update_state(
-            state='PROCESSING',
-            meta={
-                'status': 'processing',
-                'progress': 50,
-                'message': '侧面视频处理完成，开始处理正面视频...'
-            }
-        )
+        front_result, side, pairs = _describe_views(front_detected, side_detected, alignment,
+                                                    {'side': side_timer, 'front': front_timer})
 
-        # 处理正面视频
-        front, num = process_front.process(front_video_path)
+        # 保存关键点轨迹（分析失败时也保存），评分逻辑调整后可直接重新打分，可视化视频也按轨迹渲染
+        tracks = {view: store for view, store in (('side', side_store), ('front', front_store))
+                  if store is not None}
+        if tracks:
+            with task_timer.span('save_tracks'):
+                save_tracks(task_id, tracks, alignment)
 
-        if side is None or front is None:
-            raise Exception('视频处理失败，请检查视频清晰度或背景颜色')
+        # 需要可视化视频的视角保留分析用的视频，交给渲染任务使用后删除
+        overlay_videos = {}
+        if want_overlay and TRACK_FOLDER:
+            overlay_videos = {view: path for view, path in (('side', side_path), ('front', front_path))
+                              if view in tracks}
+        elif want_overlay:
+            print("⚠️ 未配置 TRACK_FOLDER，无法生成可视化视频")
 
-        # 构建结果
-        result = {
-            'message': front + side,
+        timings = {
+            'total_seconds': round(time.perf_counter() - started, 4),
+            **task_timer.as_dict(),
+            'views': {'side': _view_timings(side_timer), 'front': _view_timings(front_timer)}
         }
+        log_timings(task_id, timings)
+
+        # 构建结果，附带各阶段耗时便于评估worker并发和优化效果
+        result = _build_result(front_result, side)
+        result['timings'] = timings
+        # 记录本次使用的分析精度，评分可追溯
+        result['compute_budget'] = budget
+        # 两路的时间偏移、分析窗口和周期配对
+        result['alignment'] = {**alignment, 'paired_cycles': pairs} if alignment else None
+        # 转码前后的分辨率、帧率和缩放比例，以及是否命中关键点缓存
+        result['ingest'] = {view: {**{key: value for key, value in item.items() if key != 'path'},
+                                   'cached': cached[view] is not None}
+                            for view, item in normalized.items()}
 
         # 更新完成进度
-        self.update_state(
-            state='PROCESSING',
-            meta={
-                'status': 'processing',
-                'progress': 90,
-                'message': '视频处理完成，正在生成报告...'
-            }
-        )
+        _report_progress(self, task_id, {
+            'status': 'processing',
+            'progress': 90,
+            'message': '视频处理完成，正在生成报告...'
+        })
 
         # 这里可以添加保存结果到数据库的逻辑
-        # save_result_to_db(user_id, task_id, result, f'引体向上{num}个')
+        # save_result_to_db(user_id, task_id, result['result'], result['project'])
+
+        # 写入任务记录并通知SSE订阅者，前端无需再轮询
+        _record_outcome(task_id, result=result)
+
+        # 结果写入后再提交渲染任务，渲染失败不会覆盖评估结果
+        for view, path in overlay_videos.items():
+            try:
+                render_overlay_task.delay(task_id, view, path, (frame_ranges[view] or (0, None))[0])
+            except Exception as e:
+                print(f"⚠️ {VIEW_LABELS[view]}可视化任务提交失败: {e}")
+                continue
+            files_to_delete = [file_path for file_path in files_to_delete if file_path != path]
 
         for file_path in files_to_delete:
             try:
@@ -73,23 +443,22 @@ def process_video_task(self, task_id, front_video_path, side_video_path, user_id
             except Exception as e:
                 pass
 
-        return {
-            'status': 'completed',
-            'result': result,
-            'project': f'引体向上{num}个',
-            'progress': 100
-        }
+        return result
 
     except Exception as e:
         try:
             for file_path in [front_video_path, side_video_path]:
-                if file_path and os.path.exists(file_path):
-                    os.remove(file_path)
+                if not file_path:
+                    continue
+                for path in (file_path, normalized_path(file_path)):
+                    if os.path.exists(path):
+                        os.remove(path)
 
         except Exception as cleanup_error:
             pass
 
         # 记录错误
+        _record_outcome(task_id, error=str(e))
         self.update_state(
             state='FAILURE',
             meta={
@@ -98,4 +467,4 @@ def process_video_task(self, task_id, front_video_path, side_video_path, user_id
                 'error': str(e)
             }
         )
-        raise e
\ No newline at end of file
+        raise e
@@ -0,0 +1,104 @@
+# app/api/compute_budget.py
+import os
+
+from app import config
+from app.celery_app import celery_app
+from .frame_sampler import DEFAULT_ANALYSIS_FPS
+from .pose_pool import POSE_PROFILES
+
+
+COMPUTE_BUDGET = getattr(config, 'COMPUTE_BUDGET', True)
+# 单个任务从排队到完成的目标耗时（秒）
+BUDGET_TARGET_SECONDS = getattr(config, 'BUDGET_TARGET_SECONDS', 120)
+# 队列积压很多时，本任务至少保留的目标时间比例
+BUDGET_MIN_SHARE = getattr(config, 'BUDGET_MIN_SHARE', 0.25)
+# 估算排队等待时间用的平均任务耗时（秒）和并行执行的任务数
+BUDGET_AVG_TASK_SECONDS = getattr(config, 'BUDGET_AVG_TASK_SECONDS', 60)
+# 未配置时与Celery worker的并发数一致
+BUDGET_WORKERS = (getattr(config, 'BUDGET_WORKERS', None) or celery_app.conf.worker_concurrency
+                  or os.cpu_count() or 1)
+# 各模型复杂度单帧推理的大致耗时（秒，ROI缩放后与原始分辨率基本无关），可按基准结果调整
+BUDGET_FRAME_COST = getattr(config, 'BUDGET_FRAME_COST', {0: 0.012, 1: 0.02, 2: 0.06})
+# 每百万像素的解码耗时（秒/帧）
+BUDGET_DECODE_COST = getattr(config, 'BUDGET_DECODE_COST', 0.002)
+
+# 各视角从精细到粗糙的候选 (模型复杂度, 抽帧目标帧率)，None表示使用配置 ANALYSIS_FPS；第一档为默认参数
+BUDGET_LADDERS = {
+    'front': [(POSE_PROFILES['front']['model_complexity'], None), (2, 15), (1, 15), (1, 10), (0, 10)],
+    'side': [(POSE_PROFILES['side']['model_complexity'], None), (1, 15), (0, 15), (0, 10)],
+}
+
+
+def estimate_seconds(info, model_complexity, analysis_fps):
+    """按帧数、分辨率和抽帧率估算单路提取耗时"""
+    fps, total_frames = info['fps'], info['total_frames']
+    analysis_fps = analysis_fps or DEFAULT_ANALYSIS_FPS
+    ratio = min(1.0, analysis_fps / fps) if analysis_fps and fps and fps > 0 else 1.0
+    megapixels = info['width'] * info['height'] / 1e6
+    return total_frames * (ratio * BUDGET_FRAME_COST[model_complexity] + megapixels * BUDGET_DECODE_COST)
+
+
+def _choose(view, info, available_seconds):
+    """选择预计能在可用时间内完成的最精细一档，都超出时用最粗糙的一档"""
+    ladder = BUDGET_LADDERS[view]
+    for level, (model_complexity, analysis_fps) in enumerate(ladder):
+        estimated = estimate_seconds(info, model_complexity, analysis_fps)
+        if estimated <= available_seconds or level == len(ladder) - 1:
+            return {
+                'model_complexity': model_complexity,
+                'analysis_fps': analysis_fps,
+                'level': level,
+                'estimated_seconds': round(estimated, 1)
+            }
+
+
+def cached_choice(view, is_cached):
+    """
+    按从精细到粗糙的顺序查找已有关键点缓存的一档，找不到时返回None
+    is_cached(model_complexity, analysis_fps) 判断该档参数的缓存是否存在；
+    同一视频复用之前选定的一档，不会因为队列长度不同而换档重新提取
+    """
+    for level, (model_complexity, analysis_fps) in enumerate(BUDGET_LADDERS[view]):
+        if is_cached(model_complexity, analysis_fps):
+            return {
+                'model_complexity': model_complexity,
+                'analysis_fps': analysis_fps,
+                'level': level,
+                'estimated_seconds': 0.0,
+                'cached': True
+            }
+    return None
+
+
+def plan_budget(infos, queue_depth=0, target_seconds=None, cached=None):
+    """
+    按视频时长、分辨率和当前队列积压，为每个视角选择模型复杂度和抽帧率
+    infos: {视角: read_video_info 的结果}，为None的视角使用默认参数
+    cached: {视角: cached_choice 的结果}，已有缓存的视角直接使用缓存对应的一档
+    返回的计划会写入任务结果，便于追溯每次评分使用的分析精度
+    """
+    cached = cached or {}
+    target = target_seconds or BUDGET_TARGET_SECONDS
+    # 排在后面的任务越多，本任务可用的时间越少
+    queue_wait = queue_depth * BUDGET_AVG_TASK_SECONDS / max(1, BUDGET_WORKERS)
+    available = max(target - queue_wait, target * BUDGET_MIN_SHARE)
+
+    views = {}
+    for view, info in infos.items():
+        default_complexity, default_fps = BUDGET_LADDERS[view][0]
+        if cached.get(view) is not None:
+            views[view] = cached[view]
+        elif not COMPUTE_BUDGET or info is None or not info['total_frames']:
+            views[view] = {'model_complexity': default_complexity, 'analysis_fps': default_fps,
+                           'level': 0, 'estimated_seconds': None}
+        else:
+            # 两路并行提取，各自都需在可用时间内完成
+            views[view] = _choose(view, info, available)
+
+    return {
+        'enabled': COMPUTE_BUDGET,
+        'queue_depth': queue_depth,
+        'target_seconds': target,
+        'available_seconds': round(available, 1),
+        'views': views
+    }
@@ -0,0 +1,90 @@
+# app/api/frame_reader.py
+import queue
+import threading
+import time
+
+import cv2
+
+from app import config
+
+
+DEFAULT_QUEUE_SIZE = getattr(config, 'DECODE_QUEUE_SIZE', 4)
+
+
+class FrameReader:
+    """后台线程解码视频帧并转换为RGB，通过有界队列交给姿态检测阶段
+    rgb=False 时不做颜色转换（如只绘制可视化视频），产出的RGB帧为None
+    timer: 可选的StageTimer，记录解码（decode）和颜色转换（color_convert）耗时
+    """
+
+    _END = object()
+
+    def __init__(self, cap, queue_size=None, start_index=0, rgb=True, timer=None):
+        self.cap = cap
+        self.start_index = start_index
+        self.rgb = rgb
+        self.timer = timer
+        self.queue = queue.Queue(maxsize=max(1, queue_size or DEFAULT_QUEUE_SIZE))
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._decode, name='frame-reader', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __iter__(self):
+        """依次产出 (帧号, BGR帧, RGB帧)"""
+        while True:
+            item = self.queue.get()
+            if item is self._END:
+                break
+            yield item
+
+        if self.error is not None:
+            raise self.error
+
+    def _decode(self):
+        # cap.read() 与 cvtColor 在OpenCV内部会释放GIL，可与推理并行
+        try:
+            frame_idx = self.start_index
+            decode_seconds = convert_seconds = 0.0
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                success, frame = self.cap.read()
+                decoded = time.perf_counter()
+                decode_seconds += decoded - start
+                if not success:
+                    break
+                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if self.rgb else None
+                convert_seconds += time.perf_counter() - decoded
+                self._put((frame_idx, frame, frame_rgb))
+                frame_idx += 1
+
+            if self.timer is not None:
+                # 逐帧累计后一次写入，避免解码线程频繁争锁
+                decoded_frames = frame_idx - self.start_index
+                self.timer.add('decode', decode_seconds, decoded_frames)
+                if self.rgb:
+                    self.timer.add('color_convert', convert_seconds, decoded_frames)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._put(self._END)
+
+    def _put(self, item):
+        # 队列已满时阻塞等待（背压），同时响应停止信号
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def close(self):
+        """停止解码线程（消费端提前退出时也能及时释放）"""
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,68 @@
+# app/api/frame_sampler.py
+from collections import deque
+
+import numpy as np
+
+from app import config
+
+
+DEFAULT_ANALYSIS_FPS = getattr(config, 'ANALYSIS_FPS', None)
+DEFAULT_DENSIFY_VELOCITY = getattr(config, 'SAMPLING_DENSIFY_VELOCITY', 0.15)
+
+# 与周期检测的 prominence 一致，小于该幅度视为静止
+MIN_MOTION_AMPLITUDE = 0.02
+
+
+class FrameSampler:
+    """决定哪些帧需要跑姿态检测：按步长抽帧，肩膀接近最高/最低点时改为逐帧检测"""
+
+    def __init__(self, fps, analysis_fps=None, stride=None, densify_velocity=None):
+        if analysis_fps is None and stride is None:
+            analysis_fps = DEFAULT_ANALYSIS_FPS
+        if densify_velocity is None:
+            densify_velocity = DEFAULT_DENSIFY_VELOCITY
+
+        if stride is None:
+            if analysis_fps and fps and fps > analysis_fps:
+                stride = int(round(fps / analysis_fps))
+            else:
+                stride = 1
+
+        self.fps = fps if fps and fps > 0 else 30
+        self.stride = max(1, int(stride))
+        self.densify_velocity = densify_velocity
+        self.dense = False
+        self.last_processed = None
+        # 最近两秒内检测到的 (帧号, 肩膀高度)，用于估计速度和运动幅度
+        self.history = deque()
+
+    def should_process(self, frame_idx):
+        """当前帧是否需要跑姿态检测"""
+        if self.stride == 1 or self.dense or self.last_processed is None:
+            return True
+        return frame_idx - self.last_processed >= self.stride
+
+    def update(self, frame_idx, points):
+        """记录检测结果，运动中肩膀速度低于阈值（接近波峰/波谷）时加密采样"""
+        self.last_processed = frame_idx
+        if points is None or self.stride == 1 or not self.densify_velocity:
+            return
+
+        shoulder_y = float(np.min(points[[11, 12], 1]))
+        self.history.append((frame_idx, shoulder_y))
+        while frame_idx - self.history[0][0] > 2 * self.fps:
+            self.history.popleft()
+
+        # 用至少相隔一个步长的两帧估计速度，避免逐帧抖动
+        reference = None
+        for idx, y in self.history:
+            if frame_idx - idx >= self.stride:
+                reference = (idx, y)
+        if reference is None:
+            return
+
+        velocity = abs(shoulder_y - reference[1]) * self.fps / (frame_idx - reference[0])
+        heights = [y for _, y in self.history]
+        # 静止悬垂时不加密，只在有明显起伏的动作中加密
+        moving = max(heights) - min(heights) >= MIN_MOTION_AMPLITUDE
+        self.dense = moving and velocity < self.densify_velocity
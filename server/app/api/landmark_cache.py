@@ -0,0 +1,169 @@
+# app/api/landmark_cache.py
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from app import config
+from .landmark_store import LandmarkStore
+
+
+# 缓存格式或提取逻辑变化时递增，旧缓存自动失效
+CACHE_VERSION = 1
+
+
+def cache_key(content_hash, view, **settings):
+    """由视频内容哈希、视角和提取参数生成缓存键，参数变化时不会命中旧结果"""
+    payload = json.dumps({'version': CACHE_VERSION, 'view': view, **settings}, sort_keys=True, default=str)
+    digest = hashlib.sha1(payload.encode()).hexdigest()[:12]
+    return f'{content_hash}_{view}_{digest}'
+
+
+class LandmarkCache:
+    """按视频内容哈希缓存关键点数组和逐帧指标，超出容量时按最近使用时间淘汰"""
+
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(folder, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return bool(self.folder) and bool(self.max_bytes)
+
+    def _path(self, key):
+        return os.path.join(self.folder, f'{key}.npz')
+
+    def contains(self, key):
+        return self.enabled and key is not None and os.path.exists(self._path(key))
+
+    def load(self, key):
+        """命中时返回 (LandmarkStore, 指标DataFrame)，未命中返回None"""
+        if not self.contains(key):
+            return None
+
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                store = LandmarkStore.from_arrays(data['points'], data['valid'], float(data['fps']))
+                columns = [str(name) for name in data['metric_columns']]
+                metrics = pd.DataFrame({name: data[f'metric_{i}'] for i, name in enumerate(columns)})
+        except Exception as e:
+            # 文件损坏（如写入中途被杀）时当作未命中
+            print(f"⚠️ 关键点缓存读取失败，已忽略: {e}")
+            self._remove(path)
+            return None
+
+        # 更新修改时间，作为LRU的最近使用时间
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return store, metrics
+
+    def save(self, key, store, metrics):
+        """写入缓存，先写临时文件再原子替换，避免并发读到半个文件"""
+        if not self.enabled or key is None:
+            return
+
+        arrays = {
+            'points': store.points[:len(store)],
+            'valid': store.valid[:len(store)],
+            'fps': np.float64(store.fps or 0),
+            'metric_columns': np.array(list(metrics.columns), dtype=str)
+        }
+        for i, name in enumerate(metrics.columns):
+            arrays[f'metric_{i}'] = metrics[name].to_numpy()
+
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ 关键点缓存写入失败: {e}")
+            self._remove(tmp_path)
+            return
+
+        self._evict()
+
+    def _meta_path(self, key):
+        return os.path.join(self.folder, f'{key}.json')
+
+    def load_meta(self, key):
+        """读取与关键点一同缓存的JSON数据（如两路视频的对齐结果），未命中返回None"""
+        if not self.enabled or key is None:
+            return None
+        path = self._meta_path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 缓存数据读取失败，已忽略: {e}")
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def save_meta(self, key, data):
+        """写入JSON数据，与关键点缓存一起按LRU淘汰"""
+        if not self.enabled or key is None:
+            return
+
+        path = self._meta_path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ 缓存数据写入失败: {e}")
+            self._remove(tmp_path)
+            return
+
+        self._evict()
+
+    def _evict(self):
+        """删除最久未使用的缓存，直到总大小不超过上限"""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.folder):
+                if not name.endswith(('.npz', '.json')):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.folder, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(os.path.join(self.folder, name))
+                total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+landmark_cache = LandmarkCache(
+    folder=getattr(config, 'LANDMARK_CACHE_FOLDER', os.path.join('cache', 'landmarks')),
+    max_bytes=getattr(config, 'LANDMARK_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024)
+)
@@ -0,0 +1,123 @@
+# app/api/landmark_store.py
+import numpy as np
+import pandas as pd
+
+
+NUM_LANDMARKS = 33  # MediaPipe Pose关键点数量
+NUM_CHANNELS = 4  # x, y, z, visibility
+
+
+def landmarks_to_array(landmarks):
+    """把MediaPipe关键点列表转换为 (33, 4) 数组"""
+    return np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks.landmark],
+        dtype=np.float32
+    )
+
+
+class LandmarkStore:
+    """按帧保存关键点的紧凑数组：帧数 × 33个关键点 × (x, y, z, visibility)"""
+
+    def __init__(self, capacity, fps):
+        capacity = max(int(capacity), 1)
+        self.fps = fps
+        self.points = np.full((capacity, NUM_LANDMARKS, NUM_CHANNELS), np.nan, dtype=np.float32)
+        self.valid = np.zeros(capacity, dtype=bool)
+        # 抽帧时未跑姿态检测的帧，提取结束后由 fill_skipped 插值
+        self.skipped = np.zeros(capacity, dtype=bool)
+        self.length = 0
+
+    @classmethod
+    def from_arrays(cls, points, valid, fps, skipped=None):
+        """从已有数组（如缓存文件）构建"""
+        store = cls(len(points), fps)
+        store.points[:len(points)] = points
+        store.valid[:len(points)] = valid
+        if skipped is not None:
+            store.skipped[:len(points)] = skipped
+        store.length = len(points)
+        return store
+
+    def __len__(self):
+        return self.length
+
+    def append(self, points=None, skipped=False):
+        """追加一帧，points为None表示该帧未检测到人体，skipped表示该帧被抽帧跳过"""
+        if self.length == len(self.points):
+            # CAP_PROP_FRAME_COUNT 只是估计值，实际帧数更多时扩容
+            self._resize(len(self.points) * 2)
+
+        if points is not None:
+            self.points[self.length] = points
+            self.valid[self.length] = True
+        self.skipped[self.length] = skipped
+        self.length += 1
+
+    def extend(self, other):
+        """按帧顺序拼接另一个LandmarkStore（分段提取后合并）"""
+        count = len(other)
+        if self.length + count > len(self.points):
+            self._resize(max(self.length + count, len(self.points) * 2))
+
+        self.points[self.length:self.length + count] = other.points[:count]
+        self.valid[self.length:self.length + count] = other.valid[:count]
+        self.skipped[self.length:self.length + count] = other.skipped[:count]
+        self.length += count
+        return self
+
+    def fill_skipped(self):
+        """对跳过的帧按前后两个已检测帧线性插值，前后任一帧缺失则保持缺失"""
+        skipped = np.flatnonzero(self.skipped[:self.length])
+        processed = np.flatnonzero(~self.skipped[:self.length])
+        if len(skipped) == 0 or len(processed) < 2:
+            return self
+
+        pos = np.searchsorted(processed, skipped)
+        inside = (pos > 0) & (pos < len(processed))
+        skipped, pos = skipped[inside], pos[inside]
+        prev_idx, next_idx = processed[pos - 1], processed[pos]
+
+        both_valid = self.valid[prev_idx] & self.valid[next_idx]
+        skipped, prev_idx, next_idx = skipped[both_valid], prev_idx[both_valid], next_idx[both_valid]
+
+        weight = ((skipped - prev_idx) / (next_idx - prev_idx)).astype(np.float32)[:, None, None]
+        self.points[skipped] = (1 - weight) * self.points[prev_idx] + weight * self.points[next_idx]
+        self.valid[skipped] = True
+        return self
+
+    def trim(self):
+        """释放预分配但未使用的帧"""
+        if self.length < len(self.points):
+            self._resize(self.length)
+        return self
+
+    def _resize(self, capacity):
+        points = np.full((capacity, NUM_LANDMARKS, NUM_CHANNELS), np.nan, dtype=np.float32)
+        valid = np.zeros(capacity, dtype=bool)
+        skipped = np.zeros(capacity, dtype=bool)
+        count = min(capacity, self.length)
+        points[:count] = self.points[:count]
+        valid[:count] = self.valid[:count]
+        skipped[:count] = self.skipped[:count]
+        self.points = points
+        self.valid = valid
+        self.skipped = skipped
+
+    @property
+    def frames(self):
+        return np.arange(self.length)
+
+    @property
+    def timestamps(self):
+        if self.fps and self.fps > 0:
+            return self.frames / self.fps
+        return self.frames.astype(np.float64)
+
+    def to_dataframe(self, landmark_indices):
+        """按需生成 {名称}_X/_Y/_Z/_VIS 列的DataFrame视图"""
+        data = {'frame': self.frames, 'timestamp': self.timestamps}
+        points = self.points[:self.length]
+        for name, idx in landmark_indices.items():
+            for channel, suffix in enumerate(('X', 'Y', 'Z', 'VIS')):
+                data[f'{name}_{suffix}'] = points[:, idx, channel].astype(np.float64)
+        return pd.DataFrame(data)
@@ -0,0 +1,50 @@
+# app/api/motion_gate.py
+import cv2
+import numpy as np
+
+from app import config
+
+
+DEFAULT_MOTION_GATING = getattr(config, 'MOTION_GATING', True)
+DEFAULT_MOTION_THRESHOLD = getattr(config, 'MOTION_GATE_THRESHOLD', 2.0)
+DEFAULT_MOTION_MAX_SKIP = getattr(config, 'MOTION_GATE_MAX_SKIP', 5)
+DEFAULT_MOTION_SIZE = getattr(config, 'MOTION_GATE_SIZE', 64)
+
+
+class MotionGate:
+    """
+    画面几乎不动（悬垂、动作间停顿）时跳过姿态推理，跳过的帧提取结束后由 fill_skipped 插值
+    用缩小的灰度图与上一次推理帧的平均绝对差作为运动能量；连续跳过不超过 max_skip 帧
+    """
+
+    def __init__(self, enabled=None, threshold=None, max_skip=None, size=None):
+        self.enabled = DEFAULT_MOTION_GATING if enabled is None else enabled
+        self.threshold = DEFAULT_MOTION_THRESHOLD if threshold is None else threshold
+        self.max_skip = DEFAULT_MOTION_MAX_SKIP if max_skip is None else max_skip
+        self.size = size or DEFAULT_MOTION_SIZE
+        # 上一次推理帧的缩小灰度图
+        self.reference = None
+        self.skipped = 0
+
+    def _thumbnail(self, frame_rgb):
+        # 先缩小再转灰度，计算量与原始分辨率基本无关
+        h, w = frame_rgb.shape[:2]
+        size = (self.size, max(1, int(round(h * self.size / w))))
+        small = cv2.resize(frame_rgb, size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+
+    def should_skip(self, frame_rgb):
+        """当前帧是否可以跳过推理；不跳过时该帧成为新的参考帧"""
+        if not self.enabled or self.max_skip <= 0:
+            return False
+
+        thumbnail = self._thumbnail(frame_rgb)
+        if self.reference is not None and self.skipped < self.max_skip:
+            energy = float(np.mean(cv2.absdiff(thumbnail, self.reference)))
+            if energy < self.threshold:
+                self.skipped += 1
+                return True
+
+        self.reference = thumbnail
+        self.skipped = 0
+        return False
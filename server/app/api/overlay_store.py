@@ -0,0 +1,30 @@
+# app/api/overlay_store.py
+import os
+import time
+
+from app import config
+
+
+OVERLAY_FOLDER = getattr(config, 'OVERLAY_FOLDER', 'overlays')
+# 可视化视频保存天数，任务记录24小时后过期，之后无法再下载；None表示永久保留
+OVERLAY_RETENTION_DAYS = getattr(config, 'OVERLAY_RETENTION_DAYS', 1)
+
+
+def overlay_path(task_id, view):
+    """某次评估某个视角的可视化视频路径"""
+    return os.path.join(OVERLAY_FOLDER, f'{task_id}_{view}.mp4')
+
+
+def purge_expired():
+    """删除超过保存天数的可视化视频（包括渲染中断留下的临时文件）"""
+    if OVERLAY_RETENTION_DAYS is None or not os.path.isdir(OVERLAY_FOLDER):
+        return
+
+    deadline = time.time() - OVERLAY_RETENTION_DAYS * 24 * 3600
+    for name in os.listdir(OVERLAY_FOLDER):
+        path = os.path.join(OVERLAY_FOLDER, name)
+        try:
+            if os.path.getmtime(path) < deadline:
+                os.remove(path)
+        except OSError:
+            continue
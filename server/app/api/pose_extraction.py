@@ -0,0 +1,333 @@
+# app/api/pose_extraction.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import cv2
+import numpy as np
+
+from app import config
+from app.celery_app import celery_app
+from .frame_reader import FrameReader
+from . import frame_sampler, motion_gate, roi_tracker
+from .frame_sampler import FrameSampler
+from .landmark_store import LandmarkStore, landmarks_to_array
+from .motion_gate import MotionGate
+from .pose_pool import POSE_PROFILES, pose_pool
+from .roi_tracker import PersonRoiTracker
+from .timing import StageTimer
+
+
+# 超过该时长（秒）的视频分段并行提取，None表示不启用
+SEGMENT_MIN_DURATION = getattr(config, 'SEGMENT_PARALLEL_MIN_DURATION', 120)
+# 每个worker进程同时执行 worker_concurrency 个任务，分段线程数按分到的CPU核数限制，避免线程和计算图数量成倍增长
+SEGMENT_WORKERS = (getattr(config, 'SEGMENT_WORKERS', None)
+                   or max(1, (os.cpu_count() or 1) // celery_app.conf.worker_concurrency))
+# 每段在起点前多解码的秒数，让跟踪器重新锁定人体
+SEGMENT_WARMUP_SECONDS = getattr(config, 'SEGMENT_WARMUP_SECONDS', 1.0)
+MIN_SEGMENT_SECONDS = 10
+# 进度回调的最小间隔（秒）
+PROGRESS_INTERVAL = getattr(config, 'PROGRESS_INTERVAL', 0.5)
+
+def read_video_info(cap):
+    """读取视频基本信息"""
+    return {
+        'fps': cap.get(cv2.CAP_PROP_FPS),
+        'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        'total_frames': int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    }
+
+
+class ProgressReporter:
+    """统计已处理帧数，按时间间隔节流后回调 callback(已处理帧数, 总帧数)"""
+
+    def __init__(self, total, callback=None, interval=None):
+        self.total = total
+        self.callback = callback
+        self.interval = PROGRESS_INTERVAL if interval is None else interval
+        self.done = 0
+        self._last_report = 0.0
+
+    def update(self, count=1):
+        self.set(self.done + count)
+
+    def set(self, done):
+        self.done = done
+        now = time.monotonic()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self._report()
+
+    def finish(self):
+        """提取结束时总是上报一次，帧数以实际读到的为准"""
+        self.total = self.done
+        self._report()
+
+    def _report(self):
+        if self.callback is not None:
+            # CAP_PROP_FRAME_COUNT 只是估计值，不让进度超过100%
+            self.callback(self.done, max(self.total, self.done))
+
+
+def probe_video_info(video_path):
+    """只读取视频基本信息，无法打开时返回None"""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        return read_video_info(cap) if cap.isOpened() else None
+    finally:
+        cap.release()
+
+
+def window_length(total_frames, frame_range=None):
+    """frame_range（[起始帧, 结束帧)，结束帧为None表示到结尾）内的帧数"""
+    start, stop = frame_range or (0, None)
+    return max((stop if stop is not None else total_frames) - start, 0)
+
+
+def extraction_settings(profile, model_complexity=None, **options):
+    """影响提取结果的全部参数（用于缓存键），未传入的选项取配置默认值"""
+    pose_params = dict(POSE_PROFILES[profile])
+    if model_complexity is not None:
+        pose_params['model_complexity'] = model_complexity
+
+    return {
+        'pose': pose_params,
+        'analysis_fps': options.get('analysis_fps') or frame_sampler.DEFAULT_ANALYSIS_FPS,
+        'stride': options.get('stride'),
+        'densify_velocity': frame_sampler.DEFAULT_DENSIFY_VELOCITY,
+        'roi_tracking': (roi_tracker.DEFAULT_ROI_TRACKING if options.get('roi_tracking') is None
+                         else options['roi_tracking']),
+        'roi_inference_size': roi_tracker.DEFAULT_INFERENCE_SIZE,
+        'roi_padding': roi_tracker.DEFAULT_ROI_PADDING,
+        'motion_gating': (motion_gate.DEFAULT_MOTION_GATING if options.get('motion_gating') is None
+                          else options['motion_gating']),
+        'motion_threshold': motion_gate.DEFAULT_MOTION_THRESHOLD,
+        'motion_max_skip': motion_gate.DEFAULT_MOTION_MAX_SKIP,
+        'motion_size': motion_gate.DEFAULT_MOTION_SIZE,
+        'frame_range': options.get('frame_range')
+    }
+
+
+def extract_landmarks(video_path, pose, profile, model_complexity=None, on_points=None,
+                      on_progress=None, segment_parallel=None, timer=None, frame_range=None, **options):
+    """
+    从视频中提取关键点到LandmarkStore，被抽帧跳过的帧由调用方插值
+    pose: 顺序提取时使用的Pose实例；分段并行时用于第一段，其余各段按 profile/model_complexity 从实例池借用
+    on_points(frame_idx, points): 按帧顺序回调关键点（跳过或未检测到为None），分段并行时在合并后补发
+    on_progress(frames_done, total_frames): 进度回调，按 PROGRESS_INTERVAL 节流
+    segment_parallel: True/False 强制开关分段并行，None 时按视频时长自动决定
+    timer: 可选的StageTimer，记录解码/推理耗时和帧数计数；分段并行时为各段之和
+    frame_range: 只处理 [起始帧, 结束帧) 区间（如前后视频对齐后的公共窗口），结束帧为None表示到视频结尾；
+                 store中的帧号从区间起点开始计
+    options: queue_size / analysis_fps / stride / roi_tracking / motion_gating
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"❌ 无法打开视频文件: {video_path}")
+        return None
+
+    info = read_video_info(cap)
+    timer = timer or StageTimer()
+    start, stop = frame_range or (0, None)
+    total = window_length(info['total_frames'], frame_range)
+    reporter = ProgressReporter(total, on_progress)
+    segments = _plan_segments(info, segment_parallel, start, stop)
+    if segments:
+        cap.release()
+        print(f"📊 视频分为 {len(segments)} 段并行提取")
+        store = _extract_segments(video_path, pose, profile, model_complexity, info, segments, options,
+                                  reporter, timer)
+        if on_points is not None:
+            # 各段并行推理，合并后按帧顺序补发
+            for frame_idx in range(len(store)):
+                on_points(frame_idx, store.points[frame_idx] if store.valid[frame_idx] else None)
+    else:
+        # 按视频帧数预分配关键点数组
+        store = LandmarkStore(total, info['fps'])
+        # 从区间起点开始时，先多解码一小段让跟踪器锁定人体
+        first_frame = max(0, start - int(round(SEGMENT_WARMUP_SECONDS * info['fps']))) if start else 0
+        if first_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, first_frame)
+        try:
+            _run_pose_loop(pose, cap, info, store, first_frame=first_frame, start_frame=start, stop_frame=stop,
+                           options=options, on_points=on_points, on_progress=reporter.update, timer=timer)
+        finally:
+            cap.release()
+
+    reporter.finish()
+    return store
+
+
+def _process(pose, tracker, frame_rgb, counts):
+    if tracker.input_changed():
+        counts['roi_changes'] += 1
+        # 输入区域变化后，上一帧的跟踪结果在新输入中坐标不同，重置Pose从检测重新开始；
+        # 上一帧没有检测到人体时Pose本来就会重新检测，无需重置
+        if tracker.pose_tracking:
+            pose.reset()
+            counts['pose_resets'] += 1
+    results = pose.process(tracker.prepare(frame_rgb))
+    tracker.pose_tracking = bool(results.pose_landmarks)
+    return results
+
+
+def _detect(pose, tracker, frame_rgb, counts):
+    """单帧姿态检测，返回整帧归一化坐标的 (33, 4) 数组或None；counts 累计裁剪区域变化和Pose重置次数"""
+    results = _process(pose, tracker, frame_rgb, counts)
+    if not results.pose_landmarks and tracker.active:
+        # 裁剪区域内丢失人体，回退到整帧重新检测
+        tracker.reset()
+        results = _process(pose, tracker, frame_rgb, counts)
+
+    if not results.pose_landmarks:
+        return None
+    return tracker.to_frame_coords(landmarks_to_array(results.pose_landmarks))
+
+
+def _run_pose_loop(pose, cap, info, store, first_frame, start_frame, stop_frame, options,
+                   on_points=None, on_progress=None, timer=None):
+    """逐帧推理主循环，start_frame 之前的帧只用于预热跟踪，不写入store"""
+    timer = timer or StageTimer()
+    # 帧数计数先在本地累加，结束时一次写入timer
+    counts = {'frames': 0, 'inferences': 0, 'detections': 0, 'missed': 0, 'sampled_out': 0, 'motion_skipped': 0,
+              'roi_changes': 0, 'pose_resets': 0}
+    # 抽帧策略：按目标帧率跳帧，动作接近最高/最低点时逐帧检测
+    sampler = FrameSampler(info['fps'], analysis_fps=options.get('analysis_fps'), stride=options.get('stride'))
+    # 首次检测到人体后只对人体周围区域做推理
+    tracker = PersonRoiTracker(info['width'], info['height'], enabled=options.get('roi_tracking'))
+    # 画面静止时跳过推理，由提取后的插值补齐
+    gate = MotionGate(enabled=options.get('motion_gating'))
+    gate_seconds = 0.0
+
+    # 解码在后台线程进行，与姿态推理并行
+    try:
+        with FrameReader(cap, options.get('queue_size'), start_index=first_frame, timer=timer) as reader:
+            for frame_idx, _, frame_rgb in reader:
+                if stop_frame is not None and frame_idx >= stop_frame:
+                    break
+
+                warmup = frame_idx < start_frame
+                points = None
+                sampled = warmup or sampler.should_process(frame_idx)
+                gated = False
+                if sampled and not warmup and gate.enabled:
+                    gate_start = time.perf_counter()
+                    gated = gate.should_skip(frame_rgb)
+                    gate_seconds += time.perf_counter() - gate_start
+
+                if sampled and not gated:
+                    with timer.span('pose_inference'):
+                        points = _detect(pose, tracker, frame_rgb, counts)
+                    counts['inferences'] += 1
+                    tracker.update(points)
+                    if not warmup:
+                        # 未检测到人体时points为None，标记缺失数据
+                        store.append(points)
+                        sampler.update(frame_idx, points)
+                        counts['detections' if points is not None else 'missed'] += 1
+                else:
+                    # 被抽帧或运动门控跳过的帧，提取结束后插值
+                    store.append(None, skipped=True)
+                    counts['motion_skipped' if gated else 'sampled_out'] += 1
+
+                if not warmup:
+                    counts['frames'] += 1
+                    if on_points is not None:
+                        on_points(frame_idx, points)
+                    if on_progress is not None:
+                        on_progress(1)
+    finally:
+        for name, value in counts.items():
+            timer.count(name, value)
+        if gate.enabled:
+            timer.add('motion_gate', gate_seconds, counts['frames'])
+
+
+def _plan_segments(info, segment_parallel, start=0, stop=None):
+    """长视频（或其 [start, stop) 区间）按时间切成若干段，返回 [(起始帧, 结束帧), ...]，不分段时返回None"""
+    fps, total_frames = info['fps'], info['total_frames']
+    end = stop if stop is not None else total_frames
+    if segment_parallel is False or not fps or fps <= 0 or end - start <= 0:
+        return None
+
+    duration = (end - start) / fps
+    if segment_parallel is None and (SEGMENT_MIN_DURATION is None or duration < SEGMENT_MIN_DURATION):
+        return None
+
+    count = min(SEGMENT_WORKERS, int(duration // MIN_SEGMENT_SECONDS))
+    if count < 2:
+        return None
+
+    bounds = np.linspace(start, end, count + 1).astype(int)
+    # 最后一段读到区间结尾，不限定时读到视频结尾（CAP_PROP_FRAME_COUNT 可能不准确）
+    return [(int(bounds[i]), int(bounds[i + 1]) if i < count - 1 else stop) for i in range(count)]
+
+
+class _FrameCounter:
+    """各段线程共享的已处理帧计数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def add(self, count=1):
+        with self._lock:
+            self.value += count
+
+
+def _extract_segments(video_path, pose, profile, model_complexity, info, segments, options, reporter, timer):
+    """
+    在线程池中分段提取，再按帧顺序拼接，各段的计时合并到timer
+    第一段使用调用方的Pose，其余各段从实例池借用（池中不足时临时创建），每段的跟踪状态互不影响
+    Celery prefork的worker子进程是守护进程，不能再创建子进程；OpenCV解码和MediaPipe推理都会释放GIL，线程即可利用多核
+    """
+    warmup = int(round(SEGMENT_WARMUP_SECONDS * info['fps']))
+
+    def run(index, start, stop):
+        if index == 0:
+            return _extract_segment(video_path, pose, start, stop, warmup, options, counter.add)
+        with pose_pool.borrow(profile, model_complexity) as segment_pose:
+            return _extract_segment(video_path, segment_pose, start, stop, warmup, options, counter.add)
+
+    counter = _FrameCounter()
+    workers = min(len(segments), SEGMENT_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='segment') as executor:
+        futures = [executor.submit(run, index, start, stop) for index, (start, stop) in enumerate(segments)]
+        # 等待期间定时读取各段累计的帧数上报进度
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=reporter.interval or None)
+            reporter.set(counter.value)
+        parts = [future.result() for future in futures]
+
+    # 按要处理的帧数（只处理对齐窗口时为窗口长度）预分配
+    store = LandmarkStore(reporter.total, info['fps'])
+    for (start, stop), (part, timings) in zip(segments, parts):
+        store.extend(part)
+        # 某段实际解码的帧数少于计划（帧数估计不准、解码提前结束）时补上缺失帧，后续各段的帧号不偏移
+        if stop is not None:
+            for _ in range(stop - start - len(part)):
+                store.append(None)
+        timer.merge(timings)
+    return store
+
+
+def _extract_segment(video_path, pose, start, stop, warmup, options, on_progress=None):
+    """用给定的Pose处理 [start, stop) 帧段，返回 (LandmarkStore, 计时汇总)"""
+    timer = StageTimer()
+    cap = cv2.VideoCapture(video_path)
+    try:
+        info = read_video_info(cap)
+        first_frame = max(0, start - warmup)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first_frame)
+
+        capacity = (stop if stop is not None else info['total_frames']) - start
+        store = LandmarkStore(capacity, info['fps'])
+        _run_pose_loop(pose, cap, info, store, first_frame, start, stop, options,
+                       on_progress=on_progress, timer=timer)
+    finally:
+        cap.release()
+
+    return store.trim(), timer.as_dict()
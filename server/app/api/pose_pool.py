@@ -0,0 +1,159 @@
+# app/api/pose_pool.py
+import queue
+import threading
+from contextlib import contextmanager
+
+import mediapipe as mp
+import numpy as np
+
+from app import config
+
+
+# 各视角使用的Pose参数
+POSE_PROFILES = {
+    'front': {
+        'static_image_mode': False,
+        'model_complexity': 2,
+        'smooth_landmarks': True,
+        'enable_segmentation': False,
+        'min_detection_confidence': 0.8,
+        'min_tracking_confidence': 0.8
+    },
+    'side': {
+        'static_image_mode': False,
+        'model_complexity': 1,
+        'smooth_landmarks': True,
+        'min_detection_confidence': 0.5,
+        'min_tracking_confidence': 0.5
+    },
+    # 预检只看少量互不相关的帧，用单图模式和最轻量的模型
+    'preflight': {
+        'static_image_mode': True,
+        'model_complexity': 0,
+        'smooth_landmarks': False,
+        'min_detection_confidence': 0.5,
+        'min_tracking_confidence': 0.5
+    },
+}
+
+
+# 没有人体的空白帧，用于触发模型加载
+_BLANK_FRAME = np.zeros((256, 256, 3), dtype=np.uint8)
+# 借出时池中没有空闲实例、但有实例正在后台重置时，最多等待的秒数（重置约需0.15秒，新建实例约0.2秒）
+_RESET_WAIT_SECONDS = 1.0
+
+
+def load_model(pose):
+    """
+    构造Pose或 reset() 之后，计算图和模型在第一次 process() 时才加载（约0.12~0.2秒），
+    先处理一帧空白图像，让这部分开销不落在视频的第一帧上
+    """
+    pose.process(_BLANK_FRAME)
+
+
+def create_pose(profile, model_complexity=None):
+    """按视角参数创建新的Pose实例"""
+    params = dict(POSE_PROFILES[profile])
+    if model_complexity is not None:
+        params['model_complexity'] = model_complexity
+
+    try:
+        return mp.solutions.pose.Pose(**params)
+    except TypeError as e:
+        # 旧版本MediaPipe不支持全部参数时，使用最简参数
+        print(f"⚠️ 使用最简参数: {e}")
+        return mp.solutions.pose.Pose(
+            static_image_mode=params['static_image_mode'],
+            model_complexity=1,
+            smooth_landmarks=params['smooth_landmarks'],
+            min_detection_confidence=params['min_detection_confidence'],
+            min_tracking_confidence=params['min_tracking_confidence']
+        )
+
+
+class PosePool:
+    """进程内常驻的Pose实例池，避免每个任务重新加载模型"""
+
+    def __init__(self, size=1):
+        self.size = size
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._resetting = {}
+
+    def _get_queue(self, key):
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = queue.Queue()
+                self._resetting[key] = 0
+            return self._pools[key]
+
+    def warm_up(self, profiles):
+        """预先创建各视角的Pose实例并加载模型（在worker进程启动时调用）"""
+        for profile in profiles:
+            key = (profile, POSE_PROFILES[profile]['model_complexity'])
+            pool = self._get_queue(key)
+            while pool.qsize() < self.size:
+                pose = create_pose(*key)
+                load_model(pose)
+                pool.put(pose)
+
+    @contextmanager
+    def borrow(self, profile, model_complexity=None):
+        """借出一个Pose实例，用完后在后台重置并归还"""
+        if model_complexity is None:
+            model_complexity = POSE_PROFILES[profile]['model_complexity']
+        key = (profile, model_complexity)
+        pool = self._get_queue(key)
+
+        try:
+            pose = pool.get_nowait()
+        except queue.Empty:
+            pose = None
+            if self._resetting[key]:
+                # 上一个任务归还的实例正在重置，等待它比新建实例更快
+                try:
+                    pose = pool.get(timeout=_RESET_WAIT_SECONDS)
+                except queue.Empty:
+                    pass
+            if pose is None:
+                # 池中没有空闲实例时临时创建一个
+                pose = create_pose(*key)
+
+        try:
+            yield pose
+        finally:
+            self._give_back(key, pool, pose)
+
+    def _give_back(self, key, pool, pose):
+        """
+        清空跟踪和平滑状态后归还：reset() 之后第一次 process() 要重新加载模型，
+        在后台线程中重置并加载，这部分开销不计入当前任务的后续阶段，也不落在下一个任务的第一帧上
+        单图模式没有跟踪状态，直接归还
+        """
+        with self._lock:
+            if pool.qsize() + self._resetting[key] >= self.size:
+                pose.close()
+                return
+            if POSE_PROFILES[key[0]]['static_image_mode']:
+                pool.put(pose)
+                return
+            self._resetting[key] += 1
+
+        def reset():
+            try:
+                pose.reset()
+                load_model(pose)
+            except Exception as e:
+                print(f"⚠️ Pose实例重置失败，已丢弃: {e}")
+                pose.close()
+            else:
+                pool.put(pose)
+            finally:
+                with self._lock:
+                    self._resetting[key] -= 1
+
+        threading.Thread(target=reset, name='pose-reset', daemon=True).start()
+
+
+# 每个worker进程一个全局实例
+pose_pool = PosePool(size=getattr(config, 'POSE_POOL_SIZE', 1))
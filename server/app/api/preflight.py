@@ -0,0 +1,84 @@
+# app/api/preflight.py
+import cv2
+import numpy as np
+
+from app import config
+from .pose_extraction import read_video_info
+from .pose_pool import pose_pool
+
+
+PREFLIGHT_SAMPLES = getattr(config, 'PREFLIGHT_SAMPLES', 8)  # 抽查的帧数
+PREFLIGHT_SIZE = getattr(config, 'PREFLIGHT_SIZE', 256)  # 抽查帧缩放后的最长边
+PREFLIGHT_MIN_DETECTION_RATE = getattr(config, 'PREFLIGHT_MIN_DETECTION_RATE', 0.5)
+PREFLIGHT_MIN_BRIGHTNESS = getattr(config, 'PREFLIGHT_MIN_BRIGHTNESS', 40)  # 灰度均值 0~255
+PREFLIGHT_FPS_RANGE = getattr(config, 'PREFLIGHT_FPS_RANGE', (10, 240))
+PREFLIGHT_MIN_DURATION = getattr(config, 'PREFLIGHT_MIN_DURATION', 1.0)  # 秒
+
+
+class PreflightError(Exception):
+    """视频预检不通过，异常信息即返回给用户的具体原因"""
+
+
+def preflight_check(video_path, label=''):
+    """
+    正式分析前的快速预检：均匀抽取少量缩小后的帧，用轻量Pose模型检查
+    帧率、时长、亮度和人体识别率，不通过时抛出PreflightError
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise PreflightError(f'{label}视频无法打开，请检查文件格式')
+
+    try:
+        info = read_video_info(cap)
+        fps, total_frames = info['fps'], info['total_frames']
+
+        min_fps, max_fps = PREFLIGHT_FPS_RANGE
+        if not fps or fps < min_fps or fps > max_fps:
+            raise PreflightError(f'{label}视频帧率异常（{fps:.0f}fps），请使用{min_fps}~{max_fps}fps的视频')
+
+        duration = total_frames / fps
+        if duration < PREFLIGHT_MIN_DURATION:
+            raise PreflightError(f'{label}视频过短（{duration:.1f}秒），请上传完整的动作视频')
+
+        indices = np.linspace(0, total_frames - 1, min(PREFLIGHT_SAMPLES, total_frames)).astype(int)
+        brightness = []
+        detected = 0
+
+        with pose_pool.borrow('preflight') as pose:
+            for idx in indices:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+                success, frame = cap.read()
+                if not success:
+                    continue
+
+                h, w = frame.shape[:2]
+                scale = PREFLIGHT_SIZE / max(h, w)
+                if scale < 1:
+                    frame = cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))),
+                                       interpolation=cv2.INTER_AREA)
+
+                brightness.append(float(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY).mean()))
+                results = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                if results.pose_landmarks:
+                    detected += 1
+    finally:
+        cap.release()
+
+    if not brightness:
+        raise PreflightError(f'{label}视频无法解码，请检查文件是否完整')
+
+    mean_brightness = float(np.mean(brightness))
+    if mean_brightness < PREFLIGHT_MIN_BRIGHTNESS:
+        raise PreflightError(f'{label}视频画面过暗，请在光线充足的环境下拍摄')
+
+    detection_rate = detected / len(brightness)
+    if detection_rate < PREFLIGHT_MIN_DETECTION_RATE:
+        raise PreflightError(f'{label}视频中未能稳定识别到人体（识别率{detection_rate:.0%}），'
+                             f'请确保全身入镜，且背景与衣着颜色区分明显')
+
+    return {
+        'fps': fps,
+        'duration': duration,
+        'brightness': mean_brightness,
+        'detection_rate': detection_rate
+    }
@@ -1,48 +1,25 @@
-import cv2
-import mediapipe as mp
 import pandas as pd
 import numpy as np
-import os
-import json
 from scipy import signal
-from scipy.interpolate import interp1d
-from tqdm import tqdm
-import matplotlib.pyplot as plt
 
-# 检查MediaPipe版本
-print(f"MediaPipe版本: {mp.__version__}")
+from .landmark_cache import cache_key as landmark_cache_key, landmark_cache
+from .landmark_store import NUM_LANDMARKS, NUM_CHANNELS
+from .pose_extraction import extract_landmarks, extraction_settings, probe_video_info, window_length
+from .pose_pool import create_pose, pose_pool
+from .rep_detector import StreamingRepDetector
+from .segment_stats import segment_stats
+from .signal_filters import lowpass_filtfilt
+from .timing import StageTimer
+
+# 线上使用的平滑参数
+SMOOTH_METHOD = 'double_exponential'
+SMOOTH_FACTOR = 0.7
 
 
 class AdvancedPullUpBenchmark:
-    def __init__(self, smooth_method='double_exponential', smooth_factor=0.7):
-        """初始化，添加平滑方法参数"""
-        # MediaPipe初始化
-        self.mp_pose = mp.solutions.pose
-        self.mp_drawing = mp.solutions.drawing_utils
-
-        # ============== 修改1: 使用MediaPipe 0.10.21兼容参数 ==============
-        # 根据MediaPipe 0.10.21文档，正确的参数如下：
-        try:
-            # 先尝试最全的参数
-            self.pose = self.mp_pose.Pose(
-                static_image_mode=False,
-                model_complexity=2,
-                smooth_landmarks=True,
-                enable_segmentation=False,
-                min_detection_confidence=0.8,
-                min_tracking_confidence=0.8
-            )
-        except TypeError as e:
-            # 如果还有问题，使用最简参数
-            print(f"⚠️ 使用最简参数: {e}")
-            self.pose = self.mp_pose.Pose(
-                static_image_mode=False,
-                model_complexity=1,
-                smooth_landmarks=True,
-                min_detection_confidence=0.8,
-                min_tracking_confidence=0.8
-            )
-        # ==================================================================
+    def __init__(self, smooth_method='double_exponential', smooth_factor=0.7, pose=None):
+        """初始化，添加平滑方法参数；pose为从实例池借出的Pose，不传则在提取时新建"""
+        self.pose = pose
 
         # 关键点定义
         self.LANDMARK_INDICES = {
@@ -65,7 +42,7 @@ class AdvancedPullUpBenchmark:
 
     # ============== 修改3: 添加LandmarkSmoother内部类 ==============
     class LandmarkSmoother:
-        """专门用于MediaPipe关键点平滑的类"""
+        """专门用于MediaPipe关键点平滑的类，状态保存在定长数组中"""
 
         def __init__(self, smooth_method='double_exponential',
                      smoothing_factor=0.7,
@@ -73,357 +50,208 @@ class AdvancedPullUpBenchmark:
             self.method = smooth_method
             self.smoothing_factor = smoothing_factor
             self.window_size = filter_window
+            self.reset()
 
-            # 存储历史数据
-            self.history = []
-            self.smoothed_history = []
-
-        def smooth_frame(self, landmarks):
-            """平滑单个帧的关键点"""
-            if landmarks is None:
+        def smooth_frame(self, points):
+            """在线平滑单帧 (33, 4) 关键点数组"""
+            if points is None:
                 return None
 
-            # 提取关键点坐标
-            current_points = self._extract_points(landmarks)
+            current = np.asarray(points, dtype=np.float64)
 
-            # 添加到历史
-            self.history.append(current_points)
+            # 写入移动平均的环形缓冲区
+            self.window[self.count % self.window_size] = current
+            self.count += 1
 
             # 根据方法进行平滑
             if self.method == 'double_exponential':
-                smoothed = self._double_exponential_smoothing(current_points)
+                smoothed = self._double_exponential_smoothing(current)
             elif self.method == 'moving_average':
-                smoothed = self._moving_average_smoothing(current_points)
+                smoothed = self._moving_average_smoothing(current)
             else:
-                smoothed = current_points
-
-            self.smoothed_history.append(smoothed)
-            return self._create_landmarks(smoothed)
-
-        def _double_exponential_smoothing(self, current_points):
-            """双指数平滑 - 适用于有速度变化的运动"""
-            if len(self.smoothed_history) == 0:
-                return current_points
-
-            last_smoothed = self.smoothed_history[-1]
-            smoothed = {}
-
-            for i, (x, y, z, v) in current_points.items():
-                if i in last_smoothed:
-                    # 位置平滑
-                    s_x = self.smoothing_factor * x + (1 - self.smoothing_factor) * last_smoothed[i][0]
-                    s_y = self.smoothing_factor * y + (1 - self.smoothing_factor) * last_smoothed[i][1]
-                    s_z = self.smoothing_factor * z + (1 - self.smoothing_factor) * last_smoothed[i][2]
-
-                    # 趋势平滑
-                    if len(self.smoothed_history) > 1:
-                        prev_smoothed = self.smoothed_history[-2]
-                        trend_x = last_smoothed[i][0] - prev_smoothed[i][0]
-                        trend_y = last_smoothed[i][1] - prev_smoothed[i][1]
-                        trend_z = last_smoothed[i][2] - prev_smoothed[i][2]
-
-                        s_x += self.smoothing_factor * trend_x
-                        s_y += self.smoothing_factor * trend_y
-                        s_z += self.smoothing_factor * trend_z
-                else:
-                    s_x, s_y, s_z = x, y, z
-
-                smoothed[i] = (s_x, s_y, z, v)
+                smoothed = current
 
+            # 只保留最近两帧平滑结果
+            self.last_smoothed[1] = self.last_smoothed[0]
+            self.last_smoothed[0] = smoothed
+            self.smoothed_count += 1
             return smoothed
 
-        def _moving_average_smoothing(self, current_points):
-            """移动平均滤波"""
-            if len(self.history) < 2:
-                return current_points
-
-            window = self.history[-self.window_size:] if len(self.history) >= self.window_size else self.history
-
-            smoothed = {}
+        def smooth_clip(self, points, valid):
+            """离线平滑整段视频，只按顺序平滑检测到人体的帧"""
+            self.reset()
+            smoothed = points.copy()
+            for frame_idx in np.flatnonzero(valid):
+                smoothed[frame_idx] = self.smooth_frame(points[frame_idx])
+            return smoothed
 
-            for i in current_points.keys():
-                # 收集窗口内该关键点的所有坐标
-                points_in_window = []
-                valid_frames = 0
+        def _double_exponential_smoothing(self, current):
+            """双指数平滑 - 适用于有速度变化的运动"""
+            if self.smoothed_count == 0:
+                return current
 
-                for frame in window:
-                    if i in frame and len(frame[i]) >= 4 and frame[i][3] > 0.5:  # visibility > 0.5
-                        points_in_window.append(frame[i])
-                        valid_frames += 1
+            alpha = self.smoothing_factor
+            last = self.last_smoothed[0]
+            smoothed = current.copy()
 
-                if valid_frames > 0:
-                    # 计算平均值
-                    avg_x = sum(p[0] for p in points_in_window) / valid_frames
-                    avg_y = sum(p[1] for p in points_in_window) / valid_frames
-                    avg_z = sum(p[2] for p in points_in_window) / valid_frames
+            # 位置平滑（只平滑x、y，z与可见度沿用当前帧）
+            smoothed[:, :2] = alpha * current[:, :2] + (1 - alpha) * last[:, :2]
 
-                    # 使用当前帧的可见度
-                    visibility = current_points[i][3] if i in current_points and len(current_points[i]) >= 4 else 0.5
-                    smoothed[i] = (avg_x, avg_y, avg_z, visibility)
-                else:
-                    smoothed[i] = current_points[i] if i in current_points else (0, 0, 0, 0)
+            # 趋势平滑
+            if self.smoothed_count > 1:
+                prev = self.last_smoothed[1]
+                smoothed[:, :2] += alpha * (last[:, :2] - prev[:, :2])
 
             return smoothed
 
-        def _extract_points(self, landmarks):
-            """从MediaPipe Landmarks对象提取点"""
-            points = {}
-            for idx, landmark in enumerate(landmarks.landmark):
-                points[idx] = (landmark.x, landmark.y, landmark.z, landmark.visibility)
-            return points
-
-        def _create_landmarks(self, points_dict):
-            """从点字典创建MediaPipe Landmarks对象"""
-
-            class SimpleLandmark:
-                def __init__(self, x, y, z, visibility):
-                    self.x = x
-                    self.y = y
-                    self.z = z
-                    self.visibility = visibility
-
-            class SimpleLandmarkList:
-                def __init__(self):
-                    self.landmark = []
+        def _moving_average_smoothing(self, current):
+            """移动平均滤波"""
+            if self.count < 2:
+                return current
 
-            landmark_list = SimpleLandmarkList()
+            window = self.window[:min(self.count, self.window_size)]
 
-            for i in sorted(points_dict.keys()):
-                if i in points_dict and len(points_dict[i]) >= 4:
-                    x, y, z, visibility = points_dict[i]
-                    landmark_list.landmark.append(SimpleLandmark(x, y, z, visibility))
+            # 只统计窗口内 visibility > 0.5 的帧
+            visible = window[:, :, 3] > 0.5
+            valid_frames = visible.sum(axis=0)
+            totals = (window[:, :, :3] * visible[:, :, None]).sum(axis=0)
 
-            return landmark_list
+            smoothed = current.copy()
+            has_valid = valid_frames > 0
+            # 使用当前帧的可见度
+            smoothed[has_valid, :3] = totals[has_valid] / valid_frames[has_valid, None]
+            return smoothed
 
         def reset(self):
             """重置历史数据"""
-            self.history = []
-            self.smoothed_history = []
+            self.window = np.zeros((self.window_size, NUM_LANDMARKS, NUM_CHANNELS))
+            self.count = 0
+            self.last_smoothed = np.zeros((2, NUM_LANDMARKS, NUM_CHANNELS))
+            self.smoothed_count = 0
 
     # =============================================================
 
-    def extract_comprehensive_landmarks(self, video_path, output_video_path=None, enable_smoothing=True):
-        """提取综合关键点数据并生成简单可视化视频"""
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            return None
+    def extract_comprehensive_landmarks(self, video_path, enable_smoothing=True, timer=None, **options):
+        """提取关键点到LandmarkStore，可视化视频由 render_overlay 按需单独生成
 
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-        # 视频写入器
-        out = None
-        if output_video_path:
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_video_path, fourcc, fps, (width, height))
-            print(f"🎬 将生成可视化视频: {output_video_path}")
-
-        # 自定义躯干连接线
-        TORSO_CONNECTIONS = [
-            (15, 13), (16, 14), (13, 11), (14, 12),
-            (11, 12), (11, 23), (12, 24), (23, 24),
-            (23, 25), (24, 26), (25, 27), (26, 28)
-        ]
+        timer: 可选的StageTimer，记录解码/推理/平滑/插值各阶段耗时
+        options: 透传给 extract_landmarks，如 on_progress / analysis_fps / stride / roi_tracking / segment_parallel
+        """
+        timer = timer or StageTimer()
+        if self.pose is None:
+            self.pose = create_pose('front')
 
-        landmarks_data = []
+        store = extract_landmarks(video_path, self.pose, 'front', timer=timer, **options)
 
-        # ============== 修改4: 重置平滑器 ==============
+        if store is None:
+            return None
+        store.trim()
+
+        # ============== 修改5: 应用平滑处理 ==============
+        # 对检测到人体的帧按顺序离线平滑，再对跳过的帧插值
         if enable_smoothing:
-            self.landmark_smoother.reset()
-        # =============================================
-
-        with tqdm(total=total_frames, desc="提取综合关键点") as pbar:
-            for frame_count in range(total_frames):
-                success, frame = cap.read()
-                if not success:
-                    break
-
-                display_frame = frame.copy()
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = self.pose.process(frame_rgb)
-
-                frame_data = {
-                    'frame': frame_count,
-                    'timestamp': frame_count / fps
-                }
+            with timer.span('smoothing'):
+                store.points = self.landmark_smoother.smooth_clip(store.points, store.valid)
+        # ================================================
 
-                if results.pose_landmarks:
-                    # ============== 修改5: 应用平滑处理 ==============
-                    if enable_smoothing:
-                        smoothed_landmarks = self.landmark_smoother.smooth_frame(results.pose_landmarks)
-                        # 使用平滑后的关键点进行绘制和计算
-                        self._draw_custom_skeleton(display_frame, smoothed_landmarks, TORSO_CONNECTIONS, width, height)
-                        frame_data.update(self._calculate_grip_metrics(smoothed_landmarks))
-                        frame_data.update(self._calculate_height_metrics(smoothed_landmarks))
-                        frame_data.update(self._calculate_torso_angle(smoothed_landmarks))
-                    else:
-                        # 使用原始关键点
-                        self._draw_custom_skeleton(display_frame, results.pose_landmarks, TORSO_CONNECTIONS, width,
-                                                   height)
-                        frame_data.update(self._calculate_grip_metrics(results.pose_landmarks))
-                        frame_data.update(self._calculate_height_metrics(results.pose_landmarks))
-                        frame_data.update(self._calculate_torso_angle(results.pose_landmarks))
-                    # ================================================
-
-                    # 保存到视频文件
-                    if out:
-                        out.write(display_frame)
-
-                else:
-                    # 即使没有检测到关键点，也保存原始帧到视频
-                    if out:
-                        out.write(display_frame)
-
-                    # 标记缺失数据
-                    frame_data.update(self._get_nan_metrics())
-
-                landmarks_data.append(frame_data)
-                pbar.update(1)
-
-        cap.release()
-
-        # 关闭视频写入器
-        if out:
-            out.release()
-            print(f"✅ 可视化视频已保存: {output_video_path}")
-
-        return pd.DataFrame(landmarks_data)
-
-    def _calculate_grip_metrics(self, landmarks):
-        """计算握距相关指标"""
-        metrics = {}
-        try:
-            # 使用世界坐标计算握距
-            left_wrist = np.array([landmarks.landmark[15].x, landmarks.landmark[15].y])
-            right_wrist = np.array([landmarks.landmark[16].x, landmarks.landmark[16].y])
-            left_shoulder = np.array([landmarks.landmark[11].x, landmarks.landmark[11].y])
-            right_shoulder = np.array([landmarks.landmark[12].x, landmarks.landmark[12].y])
+        with timer.span('fill_skipped'):
+            return store.fill_skipped()
 
-            wrist_distance = np.linalg.norm(left_wrist - right_wrist)
-            shoulder_distance = np.linalg.norm(left_shoulder - right_shoulder)
+    def compute_frame_metrics(self, store):
+        """从关键点数组一次性计算所有帧的指标，未检测到人体的帧为NaN"""
+        points = store.points.astype(np.float64)
+        points[~store.valid] = np.nan
 
-            metrics['GRIP_WIDTH'] = wrist_distance
-            metrics['SHOULDER_WIDTH'] = shoulder_distance
-            metrics['GRIP_RATIO'] = wrist_distance / shoulder_distance if shoulder_distance > 0 else np.nan
+        metrics = {
+            'frame': store.frames,
+            'timestamp': store.timestamps
+        }
+        metrics.update(self._calculate_grip_metrics(points))
+        metrics.update(self._calculate_height_metrics(points))
+        metrics.update(self._calculate_torso_angle(points))
 
-        except Exception as e:
-            metrics['GRIP_WIDTH'] = np.nan
-            metrics['SHOULDER_WIDTH'] = np.nan
-            metrics['GRIP_RATIO'] = np.nan
+        return pd.DataFrame(metrics)
 
-        return metrics
+    def _calculate_grip_metrics(self, points):
+        """计算握距相关指标"""
+        wrist_distance = np.linalg.norm(points[:, 15, :2] - points[:, 16, :2], axis=1)
+        shoulder_distance = np.linalg.norm(points[:, 11, :2] - points[:, 12, :2], axis=1)
 
-    def _calculate_height_metrics(self, landmarks):
-        """计算高度相关指标"""
-        metrics = {}
-        try:
-            # 使用归一化坐标（0-1范围）
-            # 手腕坐标
-            left_wrist_x = landmarks.landmark[15].x
-            left_wrist_y = landmarks.landmark[15].y
-            right_wrist_x = landmarks.landmark[16].x
-            right_wrist_y = landmarks.landmark[16].y
-
-            left_shoulder_y = landmarks.landmark[11].y
-            right_shoulder_y = landmarks.landmark[12].y
-            # 添加肘部坐标
-            left_elbow_x = landmarks.landmark[13].x
-            left_elbow_y = landmarks.landmark[13].y
-            right_elbow_x = landmarks.landmark[14].x
-            right_elbow_y = landmarks.landmark[14].y
-
-            metrics['LEFT_WRIST_X'] = left_wrist_x
-            metrics['LEFT_WRIST_Y'] = left_wrist_y
-            metrics['RIGHT_WRIST_X'] = right_wrist_x
-            metrics['RIGHT_WRIST_Y'] = right_wrist_y
-
-            metrics['LEFT_SHOULDER_Y'] = left_shoulder_y
-            metrics['RIGHT_SHOULDER_Y'] = right_shoulder_y
-            metrics['AVG_WRIST_HEIGHT'] = (left_wrist_y + right_wrist_y) / 2
-            metrics['AVG_SHOULDER_HEIGHT'] = (left_shoulder_y + right_shoulder_y) / 2
-            metrics['MIN_SHOULDER_HEIGHT'] = min(left_shoulder_y, right_shoulder_y)
-
-            # 添加肘部坐标
-            metrics['LEFT_ELBOW_X'] = left_elbow_x
-            metrics['LEFT_ELBOW_Y'] = left_elbow_y
-            metrics['RIGHT_ELBOW_X'] = right_elbow_x
-            metrics['RIGHT_ELBOW_Y'] = right_elbow_y
+        with np.errstate(divide='ignore', invalid='ignore'):
+            grip_ratio = np.where(shoulder_distance > 0, wrist_distance / shoulder_distance, np.nan)
 
-        except Exception as e:
-            metrics.update({key: np.nan for key in [
-                'LEFT_WRIST_X', 'LEFT_WRIST_Y',  # 新增左手腕X坐标
-                'RIGHT_WRIST_X', 'RIGHT_WRIST_Y',
-                'LEFT_SHOULDER_Y', 'RIGHT_SHOULDER_Y',  # 新增右手腕X坐标'LEFT_SHOULDER_Y', 'RIGHT_SHOULDER_Y',
-                'AVG_WRIST_HEIGHT', 'AVG_SHOULDER_HEIGHT', 'MIN_SHOULDER_HEIGHT', 'LEFT_ELBOW_X', 'LEFT_ELBOW_Y',
-                'RIGHT_ELBOW_X', 'RIGHT_ELBOW_Y'
-            ]})
+        return {
+            'GRIP_WIDTH': wrist_distance,
+            'SHOULDER_WIDTH': shoulder_distance,
+            'GRIP_RATIO': grip_ratio
+        }
+
+    def _calculate_height_metrics(self, points):
+        """计算高度相关指标"""
+        # 使用归一化坐标（0-1范围）
+        left_wrist_y = points[:, 15, 1]
+        right_wrist_y = points[:, 16, 1]
+        left_shoulder_y = points[:, 11, 1]
+        right_shoulder_y = points[:, 12, 1]
 
-        return metrics
+        return {
+            # 手腕坐标
+            'LEFT_WRIST_X': points[:, 15, 0],
+            'LEFT_WRIST_Y': left_wrist_y,
+            'RIGHT_WRIST_X': points[:, 16, 0],
+            'RIGHT_WRIST_Y': right_wrist_y,
+
+            'LEFT_SHOULDER_Y': left_shoulder_y,
+            'RIGHT_SHOULDER_Y': right_shoulder_y,
+            'AVG_WRIST_HEIGHT': (left_wrist_y + right_wrist_y) / 2,
+            'AVG_SHOULDER_HEIGHT': (left_shoulder_y + right_shoulder_y) / 2,
+            'MIN_SHOULDER_HEIGHT': np.minimum(left_shoulder_y, right_shoulder_y),
+
+            # 肘部坐标
+            'LEFT_ELBOW_X': points[:, 13, 0],
+            'LEFT_ELBOW_Y': points[:, 13, 1],
+            'RIGHT_ELBOW_X': points[:, 14, 0],
+            'RIGHT_ELBOW_Y': points[:, 14, 1]
+        }
 
-    def _calculate_torso_angle(self, landmarks):
+    def _calculate_torso_angle(self, points):
         """计算躯干角度"""
-        metrics = {}
-        try:
-            # 肩膀中心
-            left_shoulder = np.array([landmarks.landmark[11].x, landmarks.landmark[11].y])
-            right_shoulder = np.array([landmarks.landmark[12].x, landmarks.landmark[12].y])
-            shoulder_center = (
-                (left_shoulder[0] + right_shoulder[0]) / 2,
-                (left_shoulder[1] + right_shoulder[1]) / 2
-            )
+        # 肩膀中心与髋部中心
+        shoulder_center = (points[:, 11, :2] + points[:, 12, :2]) / 2
+        hip_center = (points[:, 23, :2] + points[:, 24, :2]) / 2
 
-            # 髋部中心
-            left_hip = np.array([landmarks.landmark[23].x, landmarks.landmark[23].y])
-            right_hip = np.array([landmarks.landmark[24].x, landmarks.landmark[24].y])
-            hip_center = (
-                (left_hip[0] + right_hip[0]) / 2,
-                (left_hip[1] + right_hip[1]) / 2
-            )
+        # 躯干向量
+        dx = shoulder_center[:, 0] - hip_center[:, 0]  # 水平分量
+        dy = shoulder_center[:, 1] - hip_center[:, 1]  # 垂直分量
+
+        # 计算与垂直线的夹角
+        angle = np.degrees(np.arctan2(dx, dy))
+        return {
+            'TORSO_ANGLE': angle,
+            'TORSO_ANGLE_ABS': np.abs(angle)  # 绝对值表示倾斜程度
+        }
 
-            # 躯干向量
-            dx = shoulder_center[0] - hip_center[0]  # 水平分量
-            dy = shoulder_center[1] - hip_center[1]  # 垂直分量
+    def create_rep_feed(self, total_frames, on_rep):
+        """
+        提取过程中的流式周期检测，返回 (on_points回调, 检测器)
+        关键点先按离线处理相同的方式在线平滑，再取较高一侧的肩膀高度
+        """
+        detector = StreamingRepDetector(total_frames, boundary_peak=True, on_cycle=on_rep)
+        smoother = self.LandmarkSmoother(
+            smooth_method=self.landmark_smoother.method,
+            smoothing_factor=self.landmark_smoother.smoothing_factor,
+            filter_window=self.landmark_smoother.window_size
+        )
 
-            # 计算与垂直线的夹角
-            angle = np.degrees(np.arctan2(dx, dy))
-            metrics['TORSO_ANGLE'] = angle
-            metrics['TORSO_ANGLE_ABS'] = abs(angle)  # 绝对值表示倾斜程度
+        def on_points(frame_idx, points):
+            if points is None:
+                detector.push(None)
+                return
+            # 与LandmarkStore一样按float32保存平滑结果
+            smoothed = smoother.smooth_frame(points).astype(np.float32)
+            detector.push(float(min(smoothed[11, 1], smoothed[12, 1])))
 
-        except Exception as e:
-            metrics['TORSO_ANGLE'] = np.nan
-            metrics['TORSO_ANGLE_ABS'] = np.nan
-
-        return metrics
-
-    def _draw_custom_skeleton(self, frame, landmarks, connections, width, height):
-        """自定义绘制骨架"""
-        # 绘制连接线
-        for start_idx, end_idx in connections:
-            start_landmark = landmarks.landmark[start_idx]
-            end_landmark = landmarks.landmark[end_idx]
-
-            if start_landmark.visibility > 0.3 and end_landmark.visibility > 0.3:
-                start_x = int(start_landmark.x * width)
-                start_y = int(start_landmark.y * height)
-                end_x = int(end_landmark.x * width)
-                end_y = int(end_landmark.y * height)
-
-                cv2.line(frame, (start_x, start_y), (end_x, end_y), (0, 255, 255), 2)
-
-        # 绘制关键点
-        connected_points = set()
-        for connection in connections:
-            connected_points.add(connection[0])
-            connected_points.add(connection[1])
-
-        for point_idx in connected_points:
-            landmark = landmarks.landmark[point_idx]
-            if landmark.visibility > 0.3:
-                x = int(landmark.x * width)
-                y = int(landmark.y * height)
-                cv2.circle(frame, (x, y), 5, (0, 255, 0), -1)
+        return on_points, detector
 
     def detect_rep_cycles_by_shoulder_height(self, df):
         """基于肩膀高度检测引体向上周期"""
@@ -537,14 +365,24 @@ class AdvancedPullUpBenchmark:
             print("没有检测到周期，创建空基准")
             return self._create_empty_benchmark()
 
-        # 分析每个周期
+        # 分析每个周期：所有周期的统计量通过一次分段归约得到，不再逐周期复制数据
         cycle_analyses = {}
+        cycles = [(i, cycle) for i, cycle in enumerate(rep_cycles)
+                  if cycle['start_frame'] < cycle['end_frame'] < len(df)]
+
+        if cycles:
+            stats = segment_stats(
+                df[self.CYCLE_STAT_COLUMNS].to_numpy(dtype=np.float64),
+                [cycle['start_frame'] for _, cycle in cycles],
+                [cycle['end_frame'] for _, cycle in cycles]
+            )
 
-        for i, cycle in enumerate(rep_cycles):
-            cycle_name = f"cycle_{i + 1}"
-            cycle_analysis = self._analyze_single_cycle(df, cycle, cycle_name)
-            if cycle_analysis:
-                cycle_analyses[cycle_name] = cycle_analysis
+            for k, (i, cycle) in enumerate(cycles):
+                cycle_name = f"cycle_{i + 1}"
+                cycle_stats = {name: values[k] for name, values in stats.items()}
+                cycle_analysis = self._analyze_single_cycle(df, cycle, cycle_name, cycle_stats)
+                if cycle_analysis:
+                    cycle_analyses[cycle_name] = cycle_analysis
 
         if not cycle_analyses:
             return self._create_empty_benchmark()
@@ -562,39 +400,39 @@ class AdvancedPullUpBenchmark:
 
         return benchmark
 
-    def _analyze_single_cycle(self, df, cycle, cycle_name):
-        """分析单个周期"""
+    # 周期统计使用的列，顺序与 segment_stats 结果的列一致
+    CYCLE_STAT_COLUMNS = ['GRIP_RATIO', 'TORSO_ANGLE_ABS']
+
+    def _analyze_single_cycle(self, df, cycle, cycle_name, stats):
+        """整理单个周期的分析结果，stats 为该周期各列的 mean/max/min/std"""
         try:
             start, bottom, end = cycle['start_frame'], cycle['bottom_frame'], cycle['end_frame']
+            grip, torso = 0, 1
 
-            if end >= len(df):
-                return None
-
-            cycle_data = df.iloc[start:end].copy()
-
-            # 计算握距统计
-            grip_ratios = cycle_data['GRIP_RATIO'].dropna()
+            # 握距统计
             grip_stats = {
-                'grip_ratio_mean': float(np.mean(grip_ratios)) if len(grip_ratios) > 0 else np.nan,
-                'grip_ratio_max': float(np.max(grip_ratios)) if len(grip_ratios) > 0 else np.nan,
-                'grip_ratio_min': float(np.min(grip_ratios)) if len(grip_ratios) > 0 else np.nan,
-                'grip_ratio_std': float(np.std(grip_ratios)) if len(grip_ratios) > 0 else np.nan
+                'grip_ratio_mean': float(stats['mean'][grip]),
+                'grip_ratio_max': float(stats['max'][grip]),
+                'grip_ratio_min': float(stats['min'][grip]),
+                'grip_ratio_std': float(stats['std'][grip])
             }
 
-            # 计算躯干角度统计
-            torso_angles = cycle_data['TORSO_ANGLE_ABS'].dropna()
+            # 躯干角度统计
             torso_stats = {
-                'torso_angle_max': float(np.max(torso_angles)) if len(torso_angles) > 0 else np.nan,
-                'torso_angle_min': float(np.min(torso_angles)) if len(torso_angles) > 0 else np.nan,
-                'torso_angle_mean': float(np.mean(torso_angles)) if len(torso_angles) > 0 else np.nan,
-                'torso_angle_std': float(np.std(torso_angles)) if len(torso_angles) > 0 else np.nan
+                'torso_angle_max': float(stats['max'][torso]),
+                'torso_angle_min': float(stats['min'][torso]),
+                'torso_angle_mean': float(stats['mean'][torso]),
+                'torso_angle_std': float(stats['std'][torso])
             }
 
+            # 最高点（下巴过杠点）所在帧
+            bottom_data = df.iloc[bottom] if start <= bottom < end else None
+
             # 计算最高点（下巴过杠点）的肩膀中心与手腕中心高度差
-            peak_height_diff = self._calculate_peak_height_difference(cycle_data, bottom)
+            peak_height_diff = self._calculate_peak_height_difference(bottom_data, bottom)
 
             # 计算最高点时手腕-肘部角度
-            wrist_elbow_angle = self._calculate_wrist_elbow_angle_at_peak(cycle_data, bottom)
+            wrist_elbow_angle = self._calculate_wrist_elbow_angle_at_peak(bottom_data, bottom)
 
             cycle_analysis = {
                 'cycle_info': {
@@ -616,23 +454,15 @@ class AdvancedPullUpBenchmark:
             print(f"分析周期 {cycle_name} 错误: {e}")
             return None
 
-    def _calculate_peak_height_difference(self, cycle_data, bottom_frame):
-        """计算最高点（下巴过杠点）的肩膀中心与手腕中心高度差"""
+    def _calculate_peak_height_difference(self, bottom_data, bottom_frame):
+        """计算最高点（下巴过杠点）的肩膀中心与手腕中心高度差，bottom_data 为该帧的指标，不在周期内时为None"""
         try:
-            # 修正索引处理：找到cycle_data中距离bottom_frame最近的帧
-            cycle_start = cycle_data.index[0]
-            relative_bottom = bottom_frame - cycle_start
-
-            # 确保索引在有效范围内
-            if 0 <= relative_bottom < len(cycle_data):
-                bottom_data = cycle_data.iloc[relative_bottom]
+            if bottom_data is not None:
 
                 # 获取高度数据
                 shoulder_center_y = bottom_data.get('AVG_SHOULDER_HEIGHT', np.nan)
                 wrist_center_y = bottom_data.get('AVG_WRIST_HEIGHT', np.nan)
 
-                print(f"调试: 帧{bottom_frame} - 肩膀高度: {shoulder_center_y}, 手腕高度: {wrist_center_y}")  # 调试信息
-
                 if not np.isnan(shoulder_center_y) and not np.isnan(wrist_center_y):
                     height_diff = shoulder_center_y - wrist_center_y
                     return {
@@ -658,16 +488,10 @@ class AdvancedPullUpBenchmark:
                 'frame': int(bottom_frame)
             }
 
-    def _calculate_wrist_elbow_angle_at_peak(self, cycle_data, bottom_frame):
-        """计算最高点时手腕与手肘之间的连接向量与垂直方向的夹角"""
+    def _calculate_wrist_elbow_angle_at_peak(self, bottom_data, bottom_frame):
+        """计算最高点时手腕与手肘之间的连接向量与垂直方向的夹角，bottom_data 为该帧的指标，不在周期内时为None"""
         try:
-            # 修正索引处理：找到cycle_data中距离bottom_frame最近的帧
-            cycle_start = cycle_data.index[0]
-            relative_bottom = bottom_frame - cycle_start
-
-            # 确保索引在有效范围内
-            if 0 <= relative_bottom < len(cycle_data):
-                bottom_data = cycle_data.iloc[relative_bottom]
+            if bottom_data is not None:
 
                 # 获取左手手腕和手肘坐标
                 left_wrist_x = bottom_data.get('LEFT_WRIST_X')
@@ -745,19 +569,6 @@ class AdvancedPullUpBenchmark:
                 'frame': int(bottom_frame)
             }
 
-    def _get_nan_metrics(self):
-        """返回NaN指标字典"""
-        return {
-            'GRIP_WIDTH': np.nan, 'SHOULDER_WIDTH': np.nan, 'GRIP_RATIO': np.nan,
-            'LEFT_WRIST_X': np.nan, 'LEFT_WRIST_Y': np.nan,  # 新增
-            'RIGHT_WRIST_X': np.nan, 'RIGHT_WRIST_Y': np.nan,  # 新增
-            'LEFT_SHOULDER_Y': np.nan, 'RIGHT_SHOULDER_Y': np.nan,
-            'AVG_WRIST_HEIGHT': np.nan, 'AVG_SHOULDER_HEIGHT': np.nan, 'MIN_SHOULDER_HEIGHT': np.nan,
-            'WRIST_SHOULDER_DIFF_LEFT': np.nan, 'WRIST_SHOULDER_DIFF_RIGHT': np.nan, 'WRIST_SHOULDER_DIFF_AVG': np.nan,
-            'TORSO_ANGLE': np.nan, 'TORSO_ANGLE_ABS': np.nan,
-            'LEFT_ELBOW_X': np.nan, 'LEFT_ELBOW_Y': np.nan, 'RIGHT_ELBOW_X': np.nan, 'RIGHT_ELBOW_Y': np.nan
-        }
-
     def _create_empty_benchmark(self):
         """创建空基准"""
         return {
@@ -771,8 +582,11 @@ class AdvancedPullUpBenchmark:
         }
 
     # ============== 修改6: 添加后处理滤波方法 ==============
-    def post_process_filtering(self, df, method='butterworth', order=4, cutoff_freq=0.1):
-        """后处理滤波 - 在数据提取完成后进行更精细的平滑"""
+    def post_process_filtering(self, df, method='butterworth', order=4, cutoff_freq=0.1, fps=None):
+        """后处理滤波 - 在数据提取完成后进行更精细的平滑
+
+        所有坐标列作为一个二维数组沿时间轴一次滤波；fps为视频实际帧率，不传时由timestamp列推算
+        """
         df_smoothed = df.copy()
 
         # 需要平滑的列
@@ -786,109 +600,204 @@ class AdvancedPullUpBenchmark:
             'GRIP_RATIO', 'TORSO_ANGLE'
         ]
 
-        fps = 30  # 估计的帧率，可以根据实际情况调整
-
-        for col in coordinate_columns:
-            if col in df.columns:
-                series = df[col].copy()
-
-                # 检查是否有有效数据
-                if series.isna().all() or len(series) < 10:
-                    continue
-
-                # 插值填充缺失值
-                series_filled = series.interpolate(method='linear', limit_direction='both')
-                series_filled = series_filled.ffill().bfill()  # 前后填充
-
-                if method == 'butterworth':
-                    # 巴特沃斯滤波器 - 最适合生物信号
-                    nyquist = fps / 2
-                    normal_cutoff = cutoff_freq / nyquist
-
-                    if normal_cutoff < 1.0:  # 确保截止频率有效
-                        b, a = signal.butter(order, normal_cutoff, btype='low')
-
-                        # 向前向后滤波（零相位失真）
-                        filtered = signal.filtfilt(b, a, series_filled)
-
-                        # 确保滤波后数据范围合理
-                        if 'ANGLE' in col or 'GRIP' in col:
-                            # 角度和比例值范围检查
-                            filtered = np.clip(filtered, series_filled.min() * 0.5, series_filled.max() * 1.5)
-
-                        df_smoothed[col] = filtered
-
-                elif method == 'savgol':
-                    # Savitzky-Golay滤波器
-                    window_length = min(11, len(series_filled) // 3 * 2 + 1)  # 自动调整窗口
-                    if window_length >= 5 and window_length <= len(series_filled):
-                        polyorder = min(3, window_length - 1)
-                        try:
-                            filtered = signal.savgol_filter(
-                                series_filled,
-                                window_length=window_length,
-                                polyorder=polyorder
-                            )
-                            df_smoothed[col] = filtered
-                        except:
-                            df_smoothed[col] = series_filled
-                    else:
-                        df_smoothed[col] = series_filled
+        # 检查是否有有效数据
+        columns = [col for col in coordinate_columns if col in df.columns and not df[col].isna().all()]
+        if not columns or len(df) < 10:
+            return df_smoothed
+
+        if fps is None:
+            fps = self._estimate_fps(df)
+
+        # 插值填充缺失值
+        filled = df[columns].interpolate(method='linear', limit_direction='both')
+        filled = filled.ffill().bfill().to_numpy()  # 前后填充
+
+        if method == 'butterworth':
+            # 巴特沃斯滤波器 - 最适合生物信号，向前向后滤波（零相位失真）
+            filtered = lowpass_filtfilt(filled, fps, cutoff_freq, order)
+            if filtered is None:
+                return df_smoothed
+
+            # 确保滤波后数据范围合理：角度和比例值范围检查
+            clipped = np.array([('ANGLE' in col or 'GRIP' in col) for col in columns])
+            if clipped.any():
+                low, high = filled.min(axis=0) * 0.5, filled.max(axis=0) * 1.5
+                filtered[:, clipped] = np.clip(filtered[:, clipped], low[clipped], high[clipped])
+
+            df_smoothed[columns] = filtered
+
+        elif method == 'savgol':
+            # Savitzky-Golay滤波器
+            window_length = min(11, len(filled) // 3 * 2 + 1)  # 自动调整窗口
+            if window_length >= 5 and window_length <= len(filled):
+                polyorder = min(3, window_length - 1)
+                try:
+                    df_smoothed[columns] = signal.savgol_filter(
+                        filled,
+                        window_length=window_length,
+                        polyorder=polyorder,
+                        axis=0
+                    )
+                except Exception as e:
+                    # 滤波失败时退回插值后的数据
+                    print(f"Savitzky-Golay滤波失败: {e}")
+                    df_smoothed[columns] = filled
+            else:
+                df_smoothed[columns] = filled
 
         return df_smoothed
+
+    def _estimate_fps(self, df):
+        """由相邻帧的时间戳推算帧率，无法推算时按30fps"""
+        if 'timestamp' in df.columns and len(df) > 1:
+            step = np.median(np.diff(df['timestamp'].to_numpy()))
+            if step > 0:
+                return 1.0 / step
+        return 30
     # =====================================================
 
-def process(front_path):
-    benchmark_system = AdvancedPullUpBenchmark(
-        smooth_method='double_exponential',  # 使用双指数平滑
-        smooth_factor=0.7  # 平滑因子
-    )
-    i = 0
+def cache_key(content_hash, model_complexity=None, analysis_fps=None, frame_range=None):
+    """正面视频在给定提取参数（默认为配置值）下的关键点缓存键"""
+    return landmark_cache_key(content_hash, 'front', smoothing=(SMOOTH_METHOD, SMOOTH_FACTOR),
+                              **extraction_settings('front', model_complexity, analysis_fps=analysis_fps,
+                                                    frame_range=frame_range))
+
+
+def extract(front_path, content_hash=None, on_progress=None, on_rep=None, timer=None,
+            model_complexity=None, analysis_fps=None, frame_range=None):
+    """提取关键点和逐帧指标，返回 (LandmarkStore, DataFrame)；相同内容的视频直接复用缓存，跳过姿态提取
+    on_progress(frames_done, total_frames): 提取进度回调（已节流）
+    on_rep(cycle): 提取过程中每完成一个动作周期回调一次（流式检测，用于实时反馈）
+    timer: 可选的StageTimer，记录各阶段耗时和帧数计数
+    model_complexity / analysis_fps: 由计算预算选择的模型复杂度和抽帧率，None表示使用配置默认值
+    frame_range: 两路视频对齐后的公共动作窗口 [起始帧, 结束帧)，None表示分析整个视频
+    """
+    timer = timer or StageTimer()
+    key = cache_key(content_hash, model_complexity, analysis_fps, frame_range) if content_hash else None
+    with timer.span('cache_load'):
+        cached = landmark_cache.load(key)
+    if cached is not None:
+        timer.count('cache_hits')
+        print("⚡ 命中关键点缓存，跳过正面视频姿态提取")
+        if on_rep is not None:
+            _replay_reps(cached[1], on_rep)
+        return cached
+
+    with pose_pool.borrow('front', model_complexity) as pose:
+        benchmark_system = AdvancedPullUpBenchmark(
+            smooth_method=SMOOTH_METHOD,  # 使用双指数平滑
+            smooth_factor=SMOOTH_FACTOR,  # 平滑因子
+            pose=pose
+        )
+        on_points, detector = None, None
+        if on_rep is not None:
+            info = probe_video_info(front_path)
+            if info is not None:
+                total_frames = window_length(info['total_frames'], frame_range)
+                on_points, detector = benchmark_system.create_rep_feed(total_frames, on_rep)
+
+        store = benchmark_system.extract_comprehensive_landmarks(front_path, on_progress=on_progress,
+                                                                 on_points=on_points, timer=timer,
+                                                                 model_complexity=model_complexity,
+                                                                 analysis_fps=analysis_fps,
+                                                                 frame_range=frame_range)
+
+    if store is None:
+        return None
+    if detector is not None:
+        detector.finish()
+
+    with timer.span('metrics'):
+        df = benchmark_system.compute_frame_metrics(store)
+    with timer.span('cache_save'):
+        landmark_cache.save(key, store, df)
+    return store, df
+
+
+def _replay_reps(df, on_rep):
+    """命中缓存时没有提取过程，直接把逐帧指标按顺序送入流式检测"""
+    detector = StreamingRepDetector(len(df), boundary_peak=True, on_cycle=on_rep)
+    for value in df['MIN_SHOULDER_HEIGHT'].to_numpy():
+        detector.push(value)
+    detector.finish()
+
+
+def detect(store, df=None, timer=None):
+    """对关键点轨迹滤波并检测动作周期，返回 (滤波后的逐帧指标, 周期列表)"""
+    timer = timer or StageTimer()
+    benchmark_system = AdvancedPullUpBenchmark(smooth_method=SMOOTH_METHOD, smooth_factor=SMOOTH_FACTOR)
+    if df is None:
+        with timer.span('metrics'):
+            df = benchmark_system.compute_frame_metrics(store)
 
-    df = benchmark_system.extract_comprehensive_landmarks(front_path)
-    if df is not None:
+    with timer.span('filtering'):
         df_smoothed = benchmark_system.post_process_filtering(
             df,
             method='butterworth',  # 巴特沃斯滤波器
-            cutoff_freq=0.1  # 截止频率（Hz），保留低频信号
+            cutoff_freq=0.1,  # 截止频率（Hz），保留低频信号
+            fps=store.fps or None  # 按视频实际帧率设计滤波器
         )
 
-        # 使用平滑后的数据进行分析
+    # 使用平滑后的数据进行分析
+    with timer.span('rep_detection'):
         rep_cycles = benchmark_system.detect_rep_cycles_by_shoulder_height(df_smoothed)
+    timer.count('reps', len(rep_cycles))
+    return df_smoothed, rep_cycles
+
+
+def describe(df_smoothed, rep_cycles, timer=None, cycle_numbers=None):
+    """
+    按周期生成描述，返回 (描述, 周期数)
+    cycle_numbers: 各周期与侧面统一的编号（见 alignment.number_cycles），None时按顺序编号
+    """
+    i = 0
+    numbers = {f'cycle_{k + 1}': number for k, number in enumerate(cycle_numbers or [])}
+    timer = timer or StageTimer()
+    benchmark_system = AdvancedPullUpBenchmark(smooth_method=SMOOTH_METHOD, smooth_factor=SMOOTH_FACTOR)
+    with timer.span('benchmark'):
         benchmark = benchmark_system.create_biomechanical_benchmark(df_smoothed, rep_cycles)
 
-        # 打印结果摘要
-        if benchmark['analysis_summary']['status'] == 'success':
-            res=f'我一共做了{len(rep_cycles)}个引体向上,下面是我每个周期从正面看的描述：'
-            # print(f"\n📊 分析摘要:")
-            # print(f"   周期数: {benchmark['analysis_summary']['total_cycles']}")
-
-            for cycle_name, cycle_data in benchmark['cycles'].items():
-                i = i + 1
-                print(f"\n{cycle_name}:")
-                grip = cycle_data['grip_metrics']
-                torso = cycle_data['torso_metrics']
-                peak = cycle_data['peak_height_difference']
-                wrist_angle = cycle_data['wrist_elbow_angle']
-                if wrist_angle['avg_wrist_elbow_angle'] is not None and not np.isnan(
-                        wrist_angle['avg_wrist_elbow_angle']):
-                    wrist_angle_string=(f"   手腕-肘部角度: 左手={wrist_angle['left_wrist_elbow_angle']:.1f}°, "
-                                        f"右手={wrist_angle['right_wrist_elbow_angle']:.1f}°, "
-                                        f"平均={wrist_angle['avg_wrist_elbow_angle']:.1f}°")
-
-                res=res+(f"第{i}个周期：我的握距相对肩宽比例为：平均={grip['grip_ratio_mean']:.3f},最大={grip['grip_ratio_max']:.3f}, "
-                         f"最小={grip['grip_ratio_min']:.3f} ;我的脊柱相对竖直线角度为：最大={torso['torso_angle_max']:.1f}°,"
-                         f"最小={torso['torso_angle_min']:.1f}°, 平均={torso['torso_angle_mean']:.1f}°"
-                         f"在最高点时，我肩膀连线与手腕连线的高度差为{peak['height_difference']:.3f}。")+wrist_angle_string
-
-
-            return res,len(rep_cycles)
-        else:
-            print("❌ 未检测到有效的引体向上周期")
-            return None
+    # 打印结果摘要
+    if benchmark['analysis_summary']['status'] == 'success':
+        res=f'我一共做了{len(rep_cycles)}个引体向上,下面是我每个周期从正面看的描述：'
+        # print(f"\n📊 分析摘要:")
+        # print(f"   周期数: {benchmark['analysis_summary']['total_cycles']}")
+
+        for cycle_name, cycle_data in benchmark['cycles'].items():
+            i = i + 1
+            grip = cycle_data['grip_metrics']
+            torso = cycle_data['torso_metrics']
+            peak = cycle_data['peak_height_difference']
+            wrist_angle = cycle_data['wrist_elbow_angle']
+            if wrist_angle['avg_wrist_elbow_angle'] is not None and not np.isnan(
+                    wrist_angle['avg_wrist_elbow_angle']):
+                wrist_angle_string=(f"   手腕-肘部角度: 左手={wrist_angle['left_wrist_elbow_angle']:.1f}°, "
+                                    f"右手={wrist_angle['right_wrist_elbow_angle']:.1f}°, "
+                                    f"平均={wrist_angle['avg_wrist_elbow_angle']:.1f}°")
+
+            res=res+(f"第{numbers.get(cycle_name, i)}个周期：我的握距相对肩宽比例为：平均={grip['grip_ratio_mean']:.3f},最大={grip['grip_ratio_max']:.3f}, "
+                     f"最小={grip['grip_ratio_min']:.3f} ;我的脊柱相对竖直线角度为：最大={torso['torso_angle_max']:.1f}°,"
+                     f"最小={torso['torso_angle_min']:.1f}°, 平均={torso['torso_angle_mean']:.1f}°"
+                     f"在最高点时，我肩膀连线与手腕连线的高度差为{peak['height_difference']:.3f}。")+wrist_angle_string
+
+
+        return res,len(rep_cycles)
     else:
+        print("❌ 未检测到有效的引体向上周期")
+        return None
+
+
+def score(store, df=None, timer=None):
+    """对关键点轨迹滤波、检测周期并生成描述，返回 (描述, 周期数)；不需要视频，可用于重新打分"""
+    return describe(*detect(store, df, timer), timer=timer)
+
+
+def process(front_path, content_hash=None):
+    extracted = extract(front_path, content_hash)
+    if extracted is None:
         print("❌ 数据提取失败")
         return None
+    return score(*extracted)
 
 # 使用示例
 if __name__ == "__main__":
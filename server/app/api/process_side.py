@@ -1,27 +1,19 @@
-import cv2
-import mediapipe as mp
 import pandas as pd
 import numpy as np
-import os
-import json
 from scipy import signal
-from scipy.interpolate import interp1d
-from tqdm import tqdm
-import matplotlib.pyplot as plt
+
+from .landmark_cache import cache_key as landmark_cache_key, landmark_cache
+from .pose_extraction import extract_landmarks, extraction_settings, probe_video_info, window_length
+from .pose_pool import create_pose, pose_pool
+from .rep_detector import StreamingRepDetector
+from .segment_stats import segment_stats
+from .timing import StageTimer
 
 
 class AdvancedPullUpBenchmark:
-    def __init__(self):
-        # MediaPipe初始化
-        self.mp_pose = mp.solutions.pose
-        self.mp_drawing = mp.solutions.drawing_utils
-        self.pose = self.mp_pose.Pose(
-            static_image_mode=False,
-            model_complexity=1,
-            smooth_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+    def __init__(self, pose=None):
+        # pose为从实例池借出的Pose，不传则在提取时新建
+        self.pose = pose
 
         # 关键点定义
         self.LANDMARK_INDICES = {
@@ -35,200 +27,81 @@ class AdvancedPullUpBenchmark:
 
         self.BENCHMARK_POINTS = [0, 25, 50, 75, 100]
 
-    def extract_comprehensive_landmarks(self, video_path, output_video_path=None):
-        """提取关键点数据并生成可视化视频"""
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            print(f"❌ 无法打开视频文件: {video_path}")
-            return None
-
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-        print(f"📊 视频信息: {width}x{height}, FPS: {fps}, 总帧数: {total_frames}")
-
-        # 视频写入器
-        out = None
-        if output_video_path:
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_video_path, fourcc, fps, (width, height))
-            print(f"🎬 将生成可视化视频: {output_video_path}")
-
-        # 自定义躯干连接线
-        TORSO_CONNECTIONS = [
-            (15, 13),   # 手腕-肘部
-            (13, 11),   # 肘部-肩膀
-            (11, 23), # 肩膀-髋部
-            (23, 25), # 髋部-膝盖
-            (25, 27)  # 膝盖-脚踝
-        ]
-
-        landmarks_data = []
-
-        with tqdm(total=total_frames, desc="提取关键点并生成视频") as pbar:
-            for frame_count in range(total_frames):
-                success, frame = cap.read()
-                if not success:
-                    break
-
-                display_frame = frame.copy()
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = self.pose.process(frame_rgb)
-
-                frame_data = {
-                    'frame': frame_count,
-                    'timestamp': frame_count / fps if fps > 0 else frame_count
-                }
-
-                if results.pose_landmarks:
-                    # 绘制骨架
-                    self._draw_custom_skeleton(display_frame, results.pose_landmarks, TORSO_CONNECTIONS, width, height)
-
-                    # 保存关键点数据（可选，如果您需要后续分析）
-                    for name, idx in self.LANDMARK_INDICES.items():
-                        landmark = results.pose_landmarks.landmark[idx]
-                        frame_data[f'{name}_X'] = landmark.x
-                        frame_data[f'{name}_Y'] = landmark.y
-                        frame_data[f'{name}_Z'] = landmark.z
-                        frame_data[f'{name}_VIS'] = landmark.visibility
-
-                else:
-                    # 即使没有检测到关键点，也标记缺失数据
-                    for name in self.LANDMARK_INDICES.keys():
-                        frame_data[f'{name}_X'] = np.nan
-                        frame_data[f'{name}_Y'] = np.nan
-                        frame_data[f'{name}_Z'] = np.nan
-                        frame_data[f'{name}_VIS'] = np.nan
-
-                # 保存到视频文件
-                if out:
-                    out.write(display_frame)
-
-                frame_data.update(self._calculate_upper_stability(results.pose_landmarks))
-                frame_data.update(self._calculate_low_stability(results.pose_landmarks))
-                frame_data.update(self._calculate_height_metrics(results.pose_landmarks))
-                landmarks_data.append(frame_data)
-                pbar.update(1)
-            else:
-                # 即使没有检测到关键点，也保存原始帧到视频
-                if out:
-                    out.write(display_frame)
-
-                # 标记缺失数据
-                frame_data.update(self._get_nan_metrics())
-
-            landmarks_data.append(frame_data)
-            pbar.update(1)
-
-        cap.release()
-        if out:
-            out.release()
-        cv2.destroyAllWindows()
-
-        if output_video_path:
-            print(f"✅ 可视化视频已保存: {output_video_path}")
-
-        return pd.DataFrame(landmarks_data)
-
-    def _draw_custom_skeleton(self, frame, landmarks, connections, width, height):
-        """自定义绘制骨架"""
-        # 1. 首先绘制连接线
-        for start_idx, end_idx in connections:
-            start_landmark = landmarks.landmark[start_idx]
-            end_landmark = landmarks.landmark[end_idx]
-
-            # 只绘制可见的关键点之间的连接线
-            if start_landmark.visibility > 0.5 and end_landmark.visibility > 0.5:
-                start_x = int(start_landmark.x * width)
-                start_y = int(start_landmark.y * height)
-                end_x = int(end_landmark.x * width)
-                end_y = int(end_landmark.y * height)
-
-                # 绘制连接线（黄色，粗细为2）
-                cv2.line(frame, (start_x, start_y), (end_x, end_y), (0, 255, 255), 2)
-
-        # 2. 绘制关键点
-        connected_points = set()
-        for connection in connections:
-            connected_points.add(connection[0])
-            connected_points.add(connection[1])
-
-        for point_idx in connected_points:
-            landmark = landmarks.landmark[point_idx]
-            if landmark.visibility > 0.5:  # 只绘制可见的关键点
-                x = int(landmark.x * width)
-                y = int(landmark.y * height)
-                # 绘制关键点（绿色圆点，半径为5）
-                cv2.circle(frame, (x, y), 5, (0, 255, 0), -1)
-                # 添加白色边框
-                cv2.circle(frame, (x, y), 6, (255, 255, 255), 1)
-
-    def _get_landmark_point(self, landmarks, idx, width, height):
-        """获取关键点像素坐标"""
-        landmark = landmarks.landmark[idx]
-        return (int(landmark.x * width), int(landmark.y * height))
-
-    def _calculate_upper_stability(self,landmarks):
-        metrics={}
-        try:
-            left_shoulder = np.array([landmarks.landmark[11].x, landmarks.landmark[11].y])
-            left_hip = np.array([landmarks.landmark[23].x, landmarks.landmark[23].y])
+    def extract_comprehensive_landmarks(self, video_path, timer=None, **options):
+        """提取关键点到LandmarkStore，可视化视频由 render_overlay 按需单独生成
 
-            # 躯干向量
-            dx = left_shoulder[0] - left_hip[0]  # 水平分量
-            dy = left_shoulder[1] - left_hip[1]  # 垂直分量
+        timer: 可选的StageTimer，记录解码/推理/插值各阶段耗时
+        options: 透传给 extract_landmarks，如 on_progress / analysis_fps / stride / roi_tracking / segment_parallel
+        """
+        timer = timer or StageTimer()
+        if self.pose is None:
+            self.pose = create_pose('side')
 
-            # 计算与垂直线的夹角
-            angle = np.degrees(np.arctan2(dx, dy))
-            metrics['TORSO_ANGLE_side'] = angle
-            metrics['TORSO_ANGLE_ABS_side'] = abs(angle)  # 绝对值表示倾斜程度
+        store = extract_landmarks(video_path, self.pose, 'side', timer=timer, **options)
+        if store is None:
+            return None
 
-        except Exception as e:
-            metrics['TORSO_ANGLE'] = np.nan
-            metrics['TORSO_ANGLE_ABS'] = np.nan
+        # 对被抽帧跳过的帧插值
+        with timer.span('fill_skipped'):
+            return store.trim().fill_skipped()
 
-        return metrics
+    def compute_frame_metrics(self, store):
+        """从关键点数组一次性计算所有帧的指标，未检测到人体的帧为NaN"""
+        points = store.points.astype(np.float64)
+        points[~store.valid] = np.nan
 
-    def _calculate_low_stability(self,landmarks):
-        metrics={}
-        try:
-            left_knee = np.array([landmarks.landmark[25].x, landmarks.landmark[25].y])
-            left_hip = np.array([landmarks.landmark[23].x, landmarks.landmark[23].y])
+        metrics = {
+            'frame': store.frames,
+            'timestamp': store.timestamps
+        }
+        metrics.update(self._calculate_upper_stability(points))
+        metrics.update(self._calculate_low_stability(points))
+        metrics.update(self._calculate_height_metrics(points))
 
-            # 躯干向量
-            dx = left_hip[0] - left_knee[0]  # 水平分量
-            dy = left_hip[1] - left_knee[1]  # 垂直分量
+        return pd.DataFrame(metrics)
 
-            # 计算与垂直线的夹角
-            angle = np.degrees(np.arctan2(dx, dy))
-            metrics['LOWER_ANGLE_side'] = angle
-            metrics['LOWER_ANGLE_ABS_side'] = abs(angle)  # 绝对值表示倾斜程度
+    def _calculate_upper_stability(self, points):
+        """肩膀-髋部连线与竖直线的夹角"""
+        # 躯干向量
+        dx = points[:, 11, 0] - points[:, 23, 0]  # 水平分量
+        dy = points[:, 11, 1] - points[:, 23, 1]  # 垂直分量
 
-        except Exception as e:
-            metrics['LOWER_ANGLE_side'] = np.nan
-            metrics['LOWER_ANGLE_ABS_side'] = np.nan
+        # 计算与垂直线的夹角
+        angle = np.degrees(np.arctan2(dx, dy))
+        return {
+            'TORSO_ANGLE_side': angle,
+            'TORSO_ANGLE_ABS_side': np.abs(angle)  # 绝对值表示倾斜程度
+        }
 
-        return metrics
+    def _calculate_low_stability(self, points):
+        """髋部-膝盖连线与竖直线的夹角"""
+        # 大腿向量
+        dx = points[:, 23, 0] - points[:, 25, 0]  # 水平分量
+        dy = points[:, 23, 1] - points[:, 25, 1]  # 垂直分量
 
+        # 计算与垂直线的夹角
+        angle = np.degrees(np.arctan2(dx, dy))
+        return {
+            'LOWER_ANGLE_side': angle,
+            'LOWER_ANGLE_ABS_side': np.abs(angle)  # 绝对值表示倾斜程度
+        }
 
-    def _calculate_height_metrics(self, landmarks):
+    def _calculate_height_metrics(self, points):
         """计算高度相关指标"""
-        metrics = {}
-        try:
-            # 使用归一化坐标（0-1范围）
-            left_wrist_y = landmarks.landmark[15].y
-            left_shoulder_y = landmarks.landmark[11].y
+        # 使用归一化坐标（0-1范围）
+        return {
+            'LEFT_WRIST_Y': points[:, 15, 1],
+            'LEFT_SHOULDER_Y': points[:, 11, 1]
+        }
 
-            metrics['LEFT_WRIST_Y'] = left_wrist_y
-            metrics['LEFT_SHOULDER_Y'] = left_shoulder_y
-        except Exception as e:
-            metrics.update({key: np.nan for key in [
-                'LEFT_WRIST_Y', 'LEFT_SHOULDER_Y',
-            ]})
+    def create_rep_feed(self, total_frames, on_rep):
+        """提取过程中的流式周期检测，返回 (on_points回调, 检测器)"""
+        detector = StreamingRepDetector(total_frames, on_cycle=on_rep)
 
-        return metrics
+        def on_points(frame_idx, points):
+            detector.push(None if points is None else float(points[11, 1]))
+
+        return on_points, detector
 
     def detect_rep_cycles_by_shoulder_height(self, df):
         """基于肩膀高度检测引体向上周期"""
@@ -324,14 +197,24 @@ class AdvancedPullUpBenchmark:
             print("没有检测到周期，创建空基准")
             return self._create_empty_benchmark()
 
-        # 分析每个周期
+        # 分析每个周期：所有周期的统计量通过一次分段归约得到，不再逐周期复制数据
         cycle_analyses = {}
-
-        for i, cycle in enumerate(rep_cycles):
-            cycle_name = f"cycle_{i + 1}"
-            cycle_analysis = self._analyze_single_cycle(df, cycle, cycle_name)
-            if cycle_analysis:
-                cycle_analyses[cycle_name] = cycle_analysis
+        cycles = [(i, cycle) for i, cycle in enumerate(rep_cycles)
+                  if cycle['start_frame'] < cycle['end_frame'] < len(df)]
+
+        if cycles:
+            stats = segment_stats(
+                df[self.CYCLE_STAT_COLUMNS].to_numpy(dtype=np.float64),
+                [cycle['start_frame'] for _, cycle in cycles],
+                [cycle['end_frame'] for _, cycle in cycles]
+            )
+
+            for k, (i, cycle) in enumerate(cycles):
+                cycle_name = f"cycle_{i + 1}"
+                cycle_stats = {name: values[k] for name, values in stats.items()}
+                cycle_analysis = self._analyze_single_cycle(cycle, cycle_name, cycle_stats)
+                if cycle_analysis:
+                    cycle_analyses[cycle_name] = cycle_analysis
 
         if not cycle_analyses:
             return self._create_empty_benchmark()
@@ -349,32 +232,29 @@ class AdvancedPullUpBenchmark:
 
         return benchmark
 
-    def _analyze_single_cycle(self, df, cycle, cycle_name):
-        """分析单个周期"""
+    # 周期统计使用的列，顺序与 segment_stats 结果的列一致
+    CYCLE_STAT_COLUMNS = ['TORSO_ANGLE_ABS_side', 'LOWER_ANGLE_ABS_side']
+
+    def _analyze_single_cycle(self, cycle, cycle_name, stats):
+        """整理单个周期的分析结果，stats 为该周期各列的 mean/max/min/std"""
         try:
             start, bottom, end = cycle['start_frame'], cycle['bottom_frame'], cycle['end_frame']
+            torso, low = 0, 1
 
-            if end >= len(df):
-                return None
-
-            cycle_data = df.iloc[start:end].copy()
-
-
-            # 计算上半身躯干角度统计
-            torso_angles = cycle_data['TORSO_ANGLE_ABS_side'].dropna()
+            # 上半身躯干角度统计
             torso_stats = {
-                '侧面_torso_angle_max': float(np.max(torso_angles)) if len(torso_angles) > 0 else np.nan,
-                '侧面_torso_angle_min': float(np.min(torso_angles)) if len(torso_angles) > 0 else np.nan,
-                '侧面_torso_angle_mean': float(np.mean(torso_angles)) if len(torso_angles) > 0 else np.nan,
-                '侧面_torso_angle_std': float(np.std(torso_angles)) if len(torso_angles) > 0 else np.nan
+                '侧面_torso_angle_max': float(stats['max'][torso]),
+                '侧面_torso_angle_min': float(stats['min'][torso]),
+                '侧面_torso_angle_mean': float(stats['mean'][torso]),
+                '侧面_torso_angle_std': float(stats['std'][torso])
             }
 
-            low_angles = cycle_data['LOWER_ANGLE_ABS_side'].dropna()
+            # 大腿角度统计
             low_stats = {
-                '侧面_low_angle_max': float(np.max(low_angles)) if len(low_angles) > 0 else np.nan,
-                '侧面_low_angle_min': float(np.min(low_angles)) if len(low_angles) > 0 else np.nan,
-                '侧面_low_angle_mean': float(np.mean(low_angles)) if len(low_angles) > 0 else np.nan,
-                '侧面_low_angle_std': float(np.std(low_angles)) if len(low_angles) > 0 else np.nan
+                '侧面_low_angle_max': float(stats['max'][low]),
+                '侧面_low_angle_min': float(stats['min'][low]),
+                '侧面_low_angle_mean': float(stats['mean'][low]),
+                '侧面_low_angle_std': float(stats['std'][low])
             }
 
             cycle_analysis = {
@@ -394,12 +274,6 @@ class AdvancedPullUpBenchmark:
         except Exception as e:
             print(f"分析周期 {cycle_name} 错误: {e}")
             return None
-    def _get_nan_metrics(self):
-        """返回NaN指标字典"""
-        return {
-            'LEFT_SHOULDER_Y': np.nan,
-        }
-
     def _create_empty_benchmark(self):
         """创建空基准"""
         return {
@@ -412,30 +286,116 @@ class AdvancedPullUpBenchmark:
             'cycles': {}
         }
 
-def process(side_path):
+def cache_key(content_hash, model_complexity=None, analysis_fps=None, frame_range=None):
+    """侧面视频在给定提取参数（默认为配置值）下的关键点缓存键"""
+    return landmark_cache_key(content_hash, 'side',
+                              **extraction_settings('side', model_complexity, analysis_fps=analysis_fps,
+                                                    frame_range=frame_range))
+
+
+def extract(side_path, content_hash=None, on_progress=None, on_rep=None, timer=None,
+            model_complexity=None, analysis_fps=None, frame_range=None):
+    """提取关键点和逐帧指标，返回 (LandmarkStore, DataFrame)；相同内容的视频直接复用缓存，跳过姿态提取
+    on_progress(frames_done, total_frames): 提取进度回调（已节流）
+    on_rep(cycle): 提取过程中每完成一个动作周期回调一次（流式检测，用于实时反馈）
+    timer: 可选的StageTimer，记录各阶段耗时和帧数计数
+    model_complexity / analysis_fps: 由计算预算选择的模型复杂度和抽帧率，None表示使用配置默认值
+    frame_range: 两路视频对齐后的公共动作窗口 [起始帧, 结束帧)，None表示分析整个视频
+    """
+    timer = timer or StageTimer()
+    key = cache_key(content_hash, model_complexity, analysis_fps, frame_range) if content_hash else None
+    with timer.span('cache_load'):
+        cached = landmark_cache.load(key)
+    if cached is not None:
+        timer.count('cache_hits')
+        print("⚡ 命中关键点缓存，跳过侧面视频姿态提取")
+        if on_rep is not None:
+            _replay_reps(cached[1], on_rep)
+        return cached
+
+    with pose_pool.borrow('side', model_complexity) as pose:
+        benchmark_system = AdvancedPullUpBenchmark(pose=pose)
+        on_points, detector = None, None
+        if on_rep is not None:
+            info = probe_video_info(side_path)
+            if info is not None:
+                total_frames = window_length(info['total_frames'], frame_range)
+                on_points, detector = benchmark_system.create_rep_feed(total_frames, on_rep)
+
+        store = benchmark_system.extract_comprehensive_landmarks(side_path, on_progress=on_progress,
+                                                                 on_points=on_points, timer=timer,
+                                                                 model_complexity=model_complexity,
+                                                                 analysis_fps=analysis_fps,
+                                                                 frame_range=frame_range)
+
+    if store is None:
+        return None
+    if detector is not None:
+        detector.finish()
+
+    with timer.span('metrics'):
+        df = benchmark_system.compute_frame_metrics(store)
+    with timer.span('cache_save'):
+        landmark_cache.save(key, store, df)
+    return store, df
+
+
+def _replay_reps(df, on_rep):
+    """命中缓存时没有提取过程，直接把逐帧指标按顺序送入流式检测"""
+    detector = StreamingRepDetector(len(df), boundary_peak=False, on_cycle=on_rep)
+    for value in df['LEFT_SHOULDER_Y'].to_numpy():
+        detector.push(value)
+    detector.finish()
+
+
+def detect(store, df=None, timer=None):
+    """对关键点轨迹检测动作周期，返回 (逐帧指标, 周期列表)"""
+    timer = timer or StageTimer()
     benchmark_system = AdvancedPullUpBenchmark()
-    df = benchmark_system.extract_comprehensive_landmarks(side_path)
-    i=0
-    if df is not None:
+    if df is None:
+        with timer.span('metrics'):
+            df = benchmark_system.compute_frame_metrics(store)
+    with timer.span('rep_detection'):
         rep_cycles = benchmark_system.detect_rep_cycles_by_shoulder_height(df)
-        # 创建基准
+    timer.count('reps', len(rep_cycles))
+    return df, rep_cycles
+
+
+def describe(df, rep_cycles, timer=None, cycle_numbers=None):
+    """按周期生成描述；cycle_numbers: 各周期与正面统一的编号，None时按顺序编号"""
+    timer = timer or StageTimer()
+    benchmark_system = AdvancedPullUpBenchmark()
+    i=0
+    numbers = {f'cycle_{k + 1}': number for k, number in enumerate(cycle_numbers or [])}
+    # 创建基准
+    with timer.span('benchmark'):
         benchmark = benchmark_system.create_biomechanical_benchmark(df, rep_cycles)
-        # 打印结果摘要
-        if benchmark['analysis_summary']['status'] == 'success':
-            res='从侧面看的周期分析：'
-            for cycle_name, cycle_data in benchmark['cycles'].items():
-                # print(f"\n{cycle_name}:")
-                i=i+1
-                upper = cycle_data['torso_metrics']
-                low = cycle_data['low_metrics']
-                res+=(f"第{i}个周期：我的肩膀与髋部连线与竖直线的角度为：最大={upper['侧面_torso_angle_max']:.1f}°, "
-                      f"最小={upper['侧面_torso_angle_min']:.1f}°, 平均={upper['侧面_torso_angle_mean']:.1f}°;"
-                      f"我的大腿与竖直线的角度为：最大={low['侧面_low_angle_max']:.1f}°,"
-                      f"最小={low['侧面_low_angle_min']:.1f}°, 平均={low['侧面_low_angle_mean']:.1f}。")
-            return res
-        else:
-            print("❌ 未检测到有效的引体向上周期")
-            return None
+    # 打印结果摘要
+    if benchmark['analysis_summary']['status'] == 'success':
+        res='从侧面看的周期分析：'
+        for cycle_name, cycle_data in benchmark['cycles'].items():
+            # print(f"\n{cycle_name}:")
+            i=i+1
+            upper = cycle_data['torso_metrics']
+            low = cycle_data['low_metrics']
+            res+=(f"第{numbers.get(cycle_name, i)}个周期：我的肩膀与髋部连线与竖直线的角度为：最大={upper['侧面_torso_angle_max']:.1f}°, "
+                  f"最小={upper['侧面_torso_angle_min']:.1f}°, 平均={upper['侧面_torso_angle_mean']:.1f}°;"
+                  f"我的大腿与竖直线的角度为：最大={low['侧面_low_angle_max']:.1f}°,"
+                  f"最小={low['侧面_low_angle_min']:.1f}°, 平均={low['侧面_low_angle_mean']:.1f}。")
+        return res
     else:
+        print("❌ 未检测到有效的引体向上周期")
+        return None
+
+
+def score(store, df=None, timer=None):
+    """对关键点轨迹检测周期并生成描述；不需要视频，可用于重新打分"""
+    return describe(*detect(store, df, timer), timer=timer)
+
+
+def process(side_path, content_hash=None):
+    extracted = extract(side_path, content_hash)
+    if extracted is None:
         print("❌ 数据提取失败")
         return None
+    return score(*extracted)
@@ -0,0 +1,108 @@
+# app/api/render_overlay.py
+import os
+
+import cv2
+
+from app import config
+from .frame_reader import FrameReader
+from .pose_extraction import read_video_info
+
+
+# 是否默认为每次评估生成骨架可视化视频（上传时也可单独指定）
+RENDER_OVERLAY = getattr(config, 'RENDER_OVERLAY', False)
+
+# 各视角的骨架连接线与绘制样式
+OVERLAY_STYLES = {
+    'front': {
+        'connections': [
+            (15, 13), (16, 14), (13, 11), (14, 12),
+            (11, 12), (11, 23), (12, 24), (23, 24),
+            (23, 25), (24, 26), (25, 27), (26, 28)
+        ],
+        'min_visibility': 0.3,
+        'outline': False
+    },
+    'side': {
+        'connections': [
+            (15, 13),   # 手腕-肘部
+            (13, 11),   # 肘部-肩膀
+            (11, 23),   # 肩膀-髋部
+            (23, 25),   # 髋部-膝盖
+            (25, 27)    # 膝盖-脚踝
+        ],
+        'min_visibility': 0.5,
+        'outline': True
+    },
+}
+
+
+def draw_skeleton(frame, points, view):
+    """在BGR帧上原地绘制骨架，points为 (33, 4) 关键点数组"""
+    style = OVERLAY_STYLES[view]
+    height, width = frame.shape[:2]
+    min_visibility = style['min_visibility']
+
+    # 绘制连接线（黄色）
+    for start_idx, end_idx in style['connections']:
+        start_x, start_y, _, start_vis = points[start_idx]
+        end_x, end_y, _, end_vis = points[end_idx]
+
+        if start_vis > min_visibility and end_vis > min_visibility:
+            cv2.line(frame,
+                     (int(start_x * width), int(start_y * height)),
+                     (int(end_x * width), int(end_y * height)),
+                     (0, 255, 255), 2)
+
+    # 绘制关键点（绿色圆点）
+    connected_points = {idx for connection in style['connections'] for idx in connection}
+    for point_idx in connected_points:
+        x, y, _, visibility = points[point_idx]
+        if visibility > min_visibility:
+            center = (int(x * width), int(y * height))
+            cv2.circle(frame, center, 5, (0, 255, 0), -1)
+            if style['outline']:
+                # 白色边框
+                cv2.circle(frame, center, 6, (255, 255, 255), 1)
+
+
+def render_overlay(video_path, store, output_path, view, first_frame=0):
+    """
+    重新解码视频，按LandmarkStore中已保存（平滑、插值后）的关键点绘制骨架并写出可视化视频
+    first_frame: store第0帧对应的视频帧号（只分析了对齐窗口时为窗口起点），窗口外的帧原样写出
+    返回输出路径，无法打开视频时返回None
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        cap.release()
+        print(f"❌ 无法打开视频文件: {video_path}")
+        return None
+
+    info = read_video_info(cap)
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    # 先写临时文件，完成后再替换，下载接口不会读到写了一半的视频
+    root, ext = os.path.splitext(output_path)
+    tmp_path = f'{root}.{os.getpid()}.tmp{ext}'
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(tmp_path, fourcc, info['fps'], (info['width'], info['height']))
+
+    completed = False
+    try:
+        # 只需要BGR帧，跳过RGB转换
+        with FrameReader(cap, rgb=False) as reader:
+            for frame_idx, frame, _ in reader:
+                store_idx = frame_idx - first_frame
+                if 0 <= store_idx < len(store) and store.valid[store_idx]:
+                    # 解码出的帧只在这里使用，直接原地绘制，无需复制
+                    draw_skeleton(frame, store.points[store_idx], view)
+                out.write(frame)
+        completed = True
+    finally:
+        out.release()
+        cap.release()
+        if completed:
+            os.replace(tmp_path, output_path)
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    print(f"✅ 可视化视频已保存: {output_path}")
+    return output_path
@@ -0,0 +1,299 @@
+# app/api/rep_detector.py
+import math
+from collections import deque
+
+import numpy as np
+from scipy import signal
+
+from .signal_filters import savgol_dot_coeffs
+
+
+# 与批量检测 detect_rep_cycles_by_shoulder_height 的参数一致
+MIN_FRAMES = 20
+PROMINENCE = 0.02
+MIN_CYCLE_FRAMES = 10
+MAX_CYCLE_FRAMES = 200
+MIN_CYCLE_AMPLITUDE = 0.02
+
+
+class _PeakTracker:
+    """
+    在线版 signal.find_peaks(x, distance, prominence)：逐个样本输入，确定的波峰按帧顺序输出
+    与find_peaks一样先在所有局部极大值中按高度做距离筛选，再检查突出度
+    """
+
+    def __init__(self, distance, prominence):
+        self.distance = distance
+        self.prominence = prominence
+        self.index = -1
+        self.prev = None
+        # 正在上升或处于平台的候选：(起始帧, 左侧最低值)
+        self.rise = None
+        # 单调栈 (值, 该段最低值)，用于求每个样本到左侧第一个更高点之间的最低值
+        self.stack = []
+        # 相邻间隔小于distance的一串局部极大值，距离筛选需要整串一起决定
+        self.chain = []
+        # 通过距离筛选、等待突出度判定的波峰（按帧顺序）
+        self.pending = []
+
+    @property
+    def resolved_until(self):
+        """早于该帧的波峰都已确定"""
+        candidates = [self.index + 1]
+        if self.rise is not None:
+            candidates.append(self.rise[0])
+        if self.chain:
+            candidates.append(self.chain[0]['index'])
+        if self.pending:
+            candidates.append(self.pending[0]['index'])
+        return min(candidates)
+
+    def push(self, value):
+        """输入下一个样本，返回新确定的波峰 [(帧, 值), ...]"""
+        self.index += 1
+        i = self.index
+
+        # 更新各候选右侧到第一个更高点之间的最低值
+        for peak in self.chain + self.pending:
+            if peak['closed']:
+                continue
+            if value > peak['value']:
+                peak['closed'] = True
+            else:
+                peak['right_min'] = min(peak['right_min'], value)
+
+        left_min = value
+        while self.stack and self.stack[-1][0] <= value:
+            left_min = min(left_min, self.stack.pop()[1])
+        self.stack.append((value, left_min))
+
+        # 局部极大值（平台取中点），与 find_peaks 的判定方式一致
+        if self.prev is not None:
+            if value > self.prev:
+                self.rise = (i, left_min)
+            elif value < self.prev and self.rise is not None:
+                start, rise_left_min = self.rise
+                self.rise = None
+                self._add_candidate({
+                    'index': (start + i - 1) // 2,
+                    'value': self.prev,
+                    'left_min': rise_left_min,
+                    'right_min': value,
+                    'closed': False
+                })
+        self.prev = value
+
+        # 之后出现的极大值离当前串足够远时，这一串可以做距离筛选
+        if self.chain and i - self.chain[-1]['index'] >= self.distance and \
+                (self.rise is None or self.rise[0] - self.chain[-1]['index'] >= self.distance):
+            self._close_chain()
+
+        return self._emit(final=False)
+
+    def finish(self):
+        """信号结束，判定剩余候选"""
+        self._close_chain()
+        return self._emit(final=True)
+
+    def _add_candidate(self, peak):
+        if self.chain and peak['index'] - self.chain[-1]['index'] >= self.distance:
+            self._close_chain()
+        self.chain.append(peak)
+
+    def _close_chain(self):
+        """按 find_peaks 的规则：从高到低保留波峰，删除距离小于distance的较低波峰"""
+        if not self.chain:
+            return
+
+        chain = self.chain
+        self.chain = []
+        keep = [True] * len(chain)
+        order = np.argsort([peak['value'] for peak in chain])
+        for position in order[::-1]:
+            if not keep[position]:
+                continue
+            j = position - 1
+            while j >= 0 and chain[position]['index'] - chain[j]['index'] < self.distance:
+                keep[j] = False
+                j -= 1
+            j = position + 1
+            while j < len(chain) and chain[j]['index'] - chain[position]['index'] < self.distance:
+                keep[j] = False
+                j += 1
+
+        self.pending.extend(peak for peak, kept in zip(chain, keep) if kept)
+
+    def _emit(self, final):
+        """按帧顺序输出突出度已确定的波峰"""
+        emitted = []
+        while self.pending:
+            peak = self.pending[0]
+            if peak['value'] - peak['left_min'] < self.prominence:
+                accepted = False
+            elif peak['value'] - peak['right_min'] >= self.prominence:
+                accepted = True
+            elif peak['closed'] or final:
+                accepted = False
+            else:
+                break
+
+            self.pending.pop(0)
+            if accepted:
+                emitted.append((peak['index'], peak['value']))
+        return emitted
+
+
+class StreamingRepDetector:
+    """
+    流式引体向上周期检测：提取过程中逐帧输入肩膀高度，周期一结束就输出
+    插值、Savitzky-Golay平滑、波峰/波谷检测和周期校验的参数与批量检测一致
+    total_frames: 视频总帧数（批量检测的平滑窗口和波峰间距由总帧数决定）
+    boundary_peak: 是否允许第一帧作为波峰（正面检测使用）
+    on_cycle(cycle): 每检测到一个周期回调一次
+    """
+
+    def __init__(self, total_frames, boundary_peak=False, on_cycle=None):
+        total_frames = max(int(total_frames), 0)
+        self.window = max(3, min(11, total_frames // 10 * 2 + 1))
+        self.min_distance = max(15, total_frames // 20)
+        self.search_range = min(self.min_distance, total_frames // 4)
+        self.boundary_peak = boundary_peak
+        self.on_cycle = on_cycle
+        self.coeffs = savgol_dot_coeffs(self.window, 2)
+
+        # 插值：缺失样本先挂起，等到下一个有效值再线性插值
+        self.count = 0
+        self.gap = 0
+        self.last_valid = None
+        # 平滑窗口
+        self.raw = deque(maxlen=self.window)
+        self.smoothed_count = 0
+
+        self.peaks = _PeakTracker(self.min_distance, PROMINENCE)
+        self.valleys = _PeakTracker(self.min_distance, PROMINENCE)
+        self.peak_queue = deque()
+        self.valley_list = []
+        self.last_peak = None
+        # 判断第一帧是否为边界波峰前保留的平滑值
+        self.head = [] if boundary_peak else None
+        self.cycles = []
+
+    def push(self, value):
+        """输入下一帧的肩膀高度（缺失为NaN/None），返回新完成的周期"""
+        self.count += 1
+        if value is None or math.isnan(value):
+            self.gap += 1
+            return []
+
+        if self.last_valid is None:
+            # 开头的缺失值用第一个有效值填充
+            samples = [value] * (self.gap + 1)
+        else:
+            positions = np.arange(1, self.gap + 1)
+            samples = list(np.interp(positions, [0, self.gap + 1], [self.last_valid, value])) + [value]
+        self.gap = 0
+        self.last_valid = value
+
+        completed = []
+        for sample in samples:
+            completed.extend(self._push_raw(sample))
+        return completed
+
+    def finish(self):
+        """视频结束，输出剩余周期，返回本次新完成的周期"""
+        completed = []
+        if self.last_valid is not None:
+            # 结尾的缺失值用最后一个有效值填充
+            for _ in range(self.gap):
+                completed.extend(self._push_raw(self.last_valid))
+            self.gap = 0
+
+            half = self.window // 2
+            if len(self.raw) == self.window and self.count >= MIN_FRAMES:
+                # 结尾半个窗口与批量平滑一样用多项式拟合
+                tail = signal.savgol_filter(np.array(self.raw), self.window, 2)
+                for value in tail[half + 1:]:
+                    completed.extend(self._push_smoothed(value))
+
+        if self.count < MIN_FRAMES:
+            return []
+
+        completed.extend(self._track(self.peaks.finish(), self.valleys.finish(), final=True))
+        return completed
+
+    def _push_raw(self, value):
+        self.raw.append(value)
+        if len(self.raw) < self.window:
+            return []
+
+        half = self.window // 2
+        if self.smoothed_count == 0:
+            # 开头半个窗口用多项式拟合，与 savgol_filter 的 interp 模式一致
+            head = signal.savgol_filter(np.array(self.raw), self.window, 2)
+            completed = []
+            for smoothed in head[:half + 1]:
+                completed.extend(self._push_smoothed(smoothed))
+            return completed
+        return self._push_smoothed(float(np.dot(self.coeffs, self.raw)))
+
+    def _push_smoothed(self, value):
+        self.smoothed_count += 1
+        if self.head is not None:
+            self.head.append(value)
+        return self._track(self.peaks.push(value), self.valleys.push(-value), final=False)
+
+    def _track(self, new_peaks, new_valleys, final):
+        """收集波峰/波谷，两个相邻波峰之间的波谷都确定后组成周期"""
+        self.valley_list.extend((index, -value) for index, value in new_valleys)
+
+        self.peak_queue.extend(new_peaks)
+        if self.head is not None:
+            # 等到第二个波峰出现（约两个完整周期）再判断第一帧，分位数更接近整段信号
+            if len(self.peak_queue) >= 2 or final:
+                self._decide_boundary_peak()
+            else:
+                return []
+
+        completed = []
+        while self.peak_queue and (final or self.valleys.resolved_until >= self.peak_queue[0][0]):
+            end = self.peak_queue.popleft()
+            start, self.last_peak = self.last_peak, end
+            if start is None:
+                continue
+
+            # 两个波峰之间的第一个波谷
+            self.valley_list = [v for v in self.valley_list if v[0] > start[0]]
+            between = [v for v in self.valley_list if v[0] < end[0]]
+            if not between:
+                continue
+            bottom = between[0]
+
+            duration = end[0] - start[0]
+            amplitude = start[1] - bottom[1]
+            if duration < MIN_CYCLE_FRAMES or duration > MAX_CYCLE_FRAMES or amplitude < MIN_CYCLE_AMPLITUDE:
+                continue
+
+            cycle = {
+                'start_frame': int(start[0]),
+                'bottom_frame': int(bottom[0]),
+                'end_frame': int(end[0]),
+                'duration': int(duration),
+                'amplitude': float(amplitude)
+            }
+            self.cycles.append(cycle)
+            completed.append(cycle)
+            if self.on_cycle is not None:
+                self.on_cycle(cycle)
+        return completed
+
+    def _decide_boundary_peak(self):
+        """
+        第一帧高于其后若干帧、且高于60%分位数时作为波峰
+        批量检测用整段信号的分位数，这里用第二个波峰确定前已有的样本
+        """
+        head, self.head = self.head, None
+        if self.search_range <= 0 or len(head) < 2:
+            return
+        subsequent = head[1:self.search_range]
+        if len(subsequent) > 0 and head[0] > max(subsequent) and head[0] > np.percentile(head, 60):
+            self.last_peak = (0, head[0])
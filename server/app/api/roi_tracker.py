@@ -0,0 +1,110 @@
+# app/api/roi_tracker.py
+import cv2
+import numpy as np
+
+from app import config
+
+
+DEFAULT_ROI_TRACKING = getattr(config, 'ROI_TRACKING', True)
+DEFAULT_INFERENCE_SIZE = getattr(config, 'ROI_INFERENCE_SIZE', 480)
+DEFAULT_ROI_PADDING = getattr(config, 'ROI_PADDING', 0.25)
+
+
+class PersonRoiTracker:
+    """检测到人体后只裁剪人体周围区域做姿态推理，并缩放到固定的推理分辨率"""
+
+    def __init__(self, width, height, inference_size=None, padding=None, enabled=None):
+        self.width = width
+        self.height = height
+        self.inference_size = inference_size or DEFAULT_INFERENCE_SIZE
+        self.padding = DEFAULT_ROI_PADDING if padding is None else padding
+        self.enabled = DEFAULT_ROI_TRACKING if enabled is None else enabled
+        self.roi = None  # (x0, y0, x1, y1) 像素坐标，None表示整帧
+        self.input_roi = None  # 上一次送入Pose的图像对应的区域
+        self.pose_tracking = False  # 上一次推理是否检测到人体（Pose内部处于跟踪状态）
+
+    @property
+    def active(self):
+        return self.roi is not None
+
+    def reset(self):
+        """丢失跟踪，回退到整帧检测"""
+        self.roi = None
+
+    def input_changed(self):
+        """
+        本次送入Pose的区域是否与上一次不同（裁剪框移动、整帧与裁剪之间切换），调用后记为当前区域
+        MediaPipe的跟踪和关键点平滑状态基于上一次输入的归一化坐标，区域变化时需要重置
+        """
+        changed = self.roi != self.input_roi
+        self.input_roi = self.roi
+        return changed
+
+    def prepare(self, frame_rgb):
+        """裁剪并缩放出送入Pose的图像；没有裁剪区域时整帧原样送入，与不跟踪时的推理输入一致"""
+        if self.roi is None:
+            return frame_rgb
+
+        x0, y0, x1, y1 = self.roi
+        image = frame_rgb[y0:y1, x0:x1]
+        h, w = image.shape[:2]
+        scale = self.inference_size / max(h, w)
+        if scale < 1:
+            image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                               interpolation=cv2.INTER_AREA)
+        return image
+
+    def to_frame_coords(self, points):
+        """把裁剪区域内的归一化坐标映射回整帧归一化坐标"""
+        if self.roi is None:
+            return points
+
+        x0, y0, x1, y1 = self.roi
+        crop_w, crop_h = x1 - x0, y1 - y0
+        mapped = points.copy()
+        mapped[:, 0] = (points[:, 0] * crop_w + x0) / self.width
+        mapped[:, 1] = (points[:, 1] * crop_h + y0) / self.height
+        # z与x使用相同尺度
+        mapped[:, 2] = points[:, 2] * crop_w / self.width
+        return mapped
+
+    def update(self, points):
+        """用当前帧的整帧坐标更新下一帧的裁剪区域"""
+        if not self.enabled or points is None:
+            self.roi = None
+            return
+
+        visible = points[:, 3] > 0.5
+        if visible.sum() < 4:
+            self.roi = None
+            return
+
+        xs = np.clip(points[visible, 0], 0, 1) * self.width
+        ys = np.clip(points[visible, 1], 0, 1) * self.height
+        left, right, top, bottom = xs.min(), xs.max(), ys.min(), ys.max()
+        margin = self.padding * max(right - left, bottom - top)
+
+        roi = (
+            int(max(0, left - margin)),
+            int(max(0, top - margin)),
+            int(min(self.width, right + margin)),
+            int(min(self.height, bottom + margin))
+        )
+
+        # 人体仍在当前区域的内圈且区域没有明显过大时保持不变，避免裁剪框抖动
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            inner = margin / 2
+            inside = (left - x0 >= inner and x1 - right >= inner and
+                      top - y0 >= inner and y1 - bottom >= inner)
+            oversized = (x1 - x0) * (y1 - y0) > 4 * (right - left + 2 * margin) * (bottom - top + 2 * margin)
+            if inside and not oversized:
+                return
+            if not oversized:
+                # 区域变化时Pose需要重置（代价约为普通帧的6~8倍），因此只扩大不平移：
+                # 几个动作后区域覆盖完整的动作范围，之后不再变化
+                roi = (min(roi[0], x0), min(roi[1], y0), max(roi[2], x1), max(roi[3], y1))
+
+        self.roi = roi
+        if self.roi[2] - self.roi[0] < 16 or self.roi[3] - self.roi[1] < 16:
+            self.roi = None
@@ -0,0 +1,36 @@
+# app/api/segment_stats.py
+import numpy as np
+
+
+def segment_stats(values, starts, ends):
+    """
+    对 (帧数, 列数) 的指标数组按若干 [start, end) 帧段一次性计算忽略NaN的统计量
+    返回 {'mean', 'max', 'min', 'std'}，每项为 (段数, 列数) 数组；段内全为NaN时结果为NaN
+    """
+    values = np.asarray(values, dtype=np.float64)
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(ends, dtype=np.int64) - starts
+    if len(starts) == 0 or (lengths <= 0).any():
+        raise ValueError('帧段不能为空')
+
+    # 把所有帧段首尾相接取出，再按段起点做 reduceat 归约
+    offsets = np.cumsum(lengths) - lengths
+    index = np.arange(lengths.sum()) - np.repeat(offsets, lengths) + np.repeat(starts, lengths)
+    data = values[index]
+
+    valid = ~np.isnan(data)
+    count = np.add.reduceat(valid, offsets, axis=0)
+    total = np.add.reduceat(np.where(valid, data, 0.0), offsets, axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        deviation = np.where(valid, data - np.repeat(mean, lengths, axis=0), 0.0)
+        std = np.sqrt(np.add.reduceat(deviation ** 2, offsets, axis=0) / count)
+
+    # fmax/fmin 忽略NaN
+    return {
+        'mean': mean,
+        'max': np.fmax.reduceat(data, offsets, axis=0),
+        'min': np.fmin.reduceat(data, offsets, axis=0),
+        'std': std
+    }
@@ -0,0 +1,37 @@
+# app/api/signal_filters.py
+from functools import lru_cache
+
+import numpy as np
+from scipy import signal
+
+
+@lru_cache(maxsize=32)
+def butter_lowpass_sos(order, cutoff_freq, fps):
+    """设计巴特沃斯低通滤波器（二阶节形式），相同 (阶数, 截止频率, 帧率) 只设计一次；截止频率无效时返回None"""
+    normal_cutoff = cutoff_freq / (fps / 2)
+    if not 0 < normal_cutoff < 1:
+        return None
+    # 截止频率远低于帧率时 (b, a) 形式数值不稳定，使用sos
+    return signal.butter(order, normal_cutoff, btype='low', output='sos')
+
+
+def lowpass_filtfilt(data, fps, cutoff_freq, order=4):
+    """
+    对 (帧数, 列数) 的二维数组沿时间轴一次性做零相位低通滤波
+    数据过短或截止频率无效时返回None
+    """
+    sos = butter_lowpass_sos(order, cutoff_freq, fps)
+    if sos is None:
+        return None
+
+    # 与 sosfiltfilt 默认的边界延拓长度一致
+    padlen = 3 * (2 * len(sos) + 1 - min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum()))
+    if len(data) <= padlen:
+        return None
+    return signal.sosfiltfilt(sos, np.asarray(data, dtype=np.float64), axis=0)
+
+
+@lru_cache(maxsize=32)
+def savgol_dot_coeffs(window_length, polyorder):
+    """Savitzky-Golay窗口中心点的系数，与窗口内样本点积即得平滑值（流式平滑用）"""
+    return signal.savgol_coeffs(window_length, polyorder, use='dot')
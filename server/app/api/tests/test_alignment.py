@@ -0,0 +1,168 @@
+# app/api/tests/test_alignment.py
+"""两路视频的时间偏移估计、动作窗口、周期配对和对齐结果的缓存"""
+import numpy as np
+import pytest
+
+alignment = pytest.importorskip('app.api.alignment', exc_type=ImportError)
+from app.api.landmark_cache import LandmarkCache
+
+
+RATE = 5.0
+
+
+def _signal(heights, rate=RATE, fps=30.0):
+    return {'rate': rate, 'heights': np.asarray(heights, dtype=np.float64), 'fps': fps,
+            'total_frames': int(len(heights) * fps / rate)}
+
+
+def _pullups(duration=40.0, active=(10.0, 25.0), shift=0.0):
+    """肩膀高度：active区间内周期3秒的上下运动（起止处渐入渐出），其余时间静止；shift秒后开始"""
+    t = np.arange(0, duration, 1 / RATE) - shift
+    envelope = np.clip(np.minimum(t - active[0], active[1] - t), 0, 1)
+    return 0.3 + 0.1 * np.sin(2 * np.pi * t / 3.0) * envelope
+
+
+@pytest.fixture
+def probe(monkeypatch):
+    monkeypatch.setattr(alignment, 'ALIGN_PROBE_FPS', RATE)
+    monkeypatch.setattr(alignment, 'ALIGN_MAX_LAG_SECONDS', 30)
+    monkeypatch.setattr(alignment, 'ALIGN_MIN_OVERLAP_SECONDS', 5)
+
+
+@pytest.mark.parametrize('shift', [4.0, -4.0, 0.0])
+def test_estimate_offset_recovers_shift(probe, shift):
+    # 侧面的动作比正面晚shift秒
+    offset, correlation = alignment.estimate_offset(_signal(_pullups()), _signal(_pullups(shift=shift)))
+
+    assert (offset, correlation) == pytest.approx((shift, 1.0), abs=1e-6)
+
+
+def test_estimate_offset_respects_max_lag(probe, monkeypatch):
+    monkeypatch.setattr(alignment, 'ALIGN_MAX_LAG_SECONDS', 3)
+
+    offset, correlation = alignment.estimate_offset(_signal(_pullups()), _signal(_pullups(shift=4.0)))
+
+    assert abs(offset) <= 3
+    assert correlation < 1.0
+
+
+def test_estimate_offset_without_motion_or_overlap(probe, monkeypatch):
+    assert alignment.estimate_offset(_signal(np.full(200, 0.3)), _signal(_pullups())) == (None, 0.0)
+    assert alignment.estimate_offset(_signal([0.3, np.nan, 0.4]), _signal(_pullups())) == (None, 0.0)
+
+    monkeypatch.setattr(alignment, 'ALIGN_MIN_OVERLAP_SECONDS', 60)
+    assert alignment.estimate_offset(_signal(_pullups()), _signal(_pullups())) == (None, 0.0)
+
+
+@pytest.fixture
+def window_limits(monkeypatch):
+    monkeypatch.setattr(alignment, 'ALIGN_MIN_MOTION', 0.02)
+    monkeypatch.setattr(alignment, 'ALIGN_PADDING_SECONDS', 1.5)
+    monkeypatch.setattr(alignment, 'ALIGN_MIN_WINDOW_SECONDS', 3)
+
+
+def test_active_window_pads_motion(window_limits):
+    start, end = alignment.active_window(_signal(_pullups()))
+
+    # 动作在10~25秒之间，向外留白1.5秒，再加上最多1秒的滑动窗口
+    assert 7.5 <= start <= 8.5
+    assert 26.5 <= end <= 27.5
+
+
+def test_active_window_clamps_and_ignores_gaps(window_limits):
+    heights = _pullups(active=(0.0, 20.0))
+    heights[100:110] = np.nan
+
+    start, end = alignment.active_window(_signal(heights))
+
+    assert start == 0.0
+    assert end <= 22.0
+    assert alignment.active_window(_signal(np.full(200, 0.3))) is None
+    assert alignment.active_window(_signal([0.3, 0.4])) is None
+
+
+@pytest.mark.parametrize('window, expected', [
+    ((1.0, 9.0), (30, 270)),
+    ((-0.5, 5.0), (0, 150)),
+    ((1.0, 12.0), (30, None)),
+    ((0.0, 12.0), None),
+    ((1.0, 3.5), None),
+    (None, None),
+])
+def test_frame_range_clamps_to_video(window_limits, window, expected):
+    # 10秒、30帧/秒的视频
+    assert alignment._frame_range(window, _signal(np.zeros(50))) == expected
+
+
+def _alignment():
+    return {
+        'offset_seconds': 1.2,
+        'correlation': 0.91,
+        'aligned': True,
+        'views': {'front': {'frame_range': (30, 600), 'fps': 30.0},
+                  'side': {'frame_range': (66, None), 'fps': 30.0}}
+    }
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = LandmarkCache(str(tmp_path), 1024 * 1024)
+    monkeypatch.setattr(alignment, 'landmark_cache', cache)
+    return cache
+
+
+def test_alignment_round_trip(cache):
+    assert alignment.load_alignment('front', 'side') is None
+
+    alignment.save_alignment('front', 'side', _alignment())
+
+    assert alignment.load_alignment('front', 'side') == _alignment()
+    # 视角顺序不同是另一对视频
+    assert alignment.load_alignment('side', 'front') is None
+
+
+def test_alignment_needs_both_hashes(cache):
+    alignment.save_alignment(None, 'side', _alignment())
+
+    assert alignment.load_alignment(None, 'side') is None
+
+
+def _cycles(midpoints, fps=30.0, half_width=15):
+    return [{'start_frame': int(t * fps) - half_width, 'end_frame': int(t * fps) + half_width} for t in midpoints]
+
+
+def test_number_cycles_keeps_unpaired_cycles():
+    info = {'offset_seconds': 1.0, 'correlation': 0.9, 'aligned': True,
+            'views': {'front': {'frame_range': None, 'fps': 30.0}, 'side': {'frame_range': None, 'fps': 30.0}}}
+    # 正面漏检了第3个动作，侧面漏检了第5个动作（侧面比正面晚1秒）
+    front = _cycles([2, 4, 8, 10])
+    side = _cycles([3, 5, 7, 9])
+
+    pairs = alignment.pair_cycles(front, side, info)
+    front_numbers, side_numbers = alignment.number_cycles(front, side, info, pairs)
+
+    assert pairs == [(0, 0), (1, 1), (2, 3)]
+    assert front_numbers == [1, 2, 4, 5]
+    assert side_numbers == [1, 2, 3, 4]
+
+
+@pytest.mark.parametrize('side_midpoint, paired', [(3.4, True), (2.6, True), (3.6, False), (2.4, False)])
+def test_pair_cycles_within_half_a_cycle(side_midpoint, paired):
+    info = {'offset_seconds': 1.0, 'correlation': 0.9, 'aligned': True,
+            'views': {'front': {'frame_range': None, 'fps': 30.0}, 'side': {'frame_range': (30, None), 'fps': 30.0}}}
+    # 周期长1秒，容差为半个周期；侧面只分析第1秒之后的帧，帧号从窗口起点开始计
+    side = _cycles([side_midpoint - 1.0])
+
+    assert alignment.pair_cycles(_cycles([2]), side, info) == ([(0, 0)] if paired else [])
+
+
+def test_pair_cycles_needs_alignment():
+    info = {'offset_seconds': None, 'correlation': 0.2, 'aligned': False,
+            'views': {'front': {'frame_range': None, 'fps': 30.0}, 'side': {'frame_range': None, 'fps': 30.0}}}
+
+    assert alignment.pair_cycles(_cycles([2]), _cycles([3]), info) == []
+    assert alignment.pair_cycles(_cycles([2]), _cycles([3]), None) == []
+
+
+def test_number_cycles_without_pairs():
+    assert alignment.number_cycles(_cycles([2]), _cycles([3]), None, []) == (None, None)
@@ -0,0 +1,31 @@
+# app/api/tests/test_compute_budget.py
+"""计算预算：已有缓存的一档优先于按队列积压选择的一档"""
+import pytest
+
+compute_budget = pytest.importorskip('app.api.compute_budget', exc_type=ImportError)
+
+
+def _info(seconds=60, fps=30):
+    return {'fps': fps, 'total_frames': seconds * fps, 'width': 1280, 'height': 720}
+
+
+def test_cached_choice_returns_finest_cached_level():
+    ladder = compute_budget.BUDGET_LADDERS['front']
+    cached_levels = {ladder[2], ladder[3]}
+
+    choice = compute_budget.cached_choice('front', lambda *settings: settings in cached_levels)
+
+    assert choice['level'] == 2
+    assert (choice['model_complexity'], choice['analysis_fps']) == ladder[2]
+    assert compute_budget.cached_choice('front', lambda *settings: False) is None
+
+
+def test_cached_level_is_independent_of_queue_depth():
+    cached = {'front': compute_budget.cached_choice('front', lambda *settings: True), 'side': None}
+    infos = {'front': None, 'side': _info()}
+
+    idle = compute_budget.plan_budget(infos, queue_depth=0, cached=cached)
+    busy = compute_budget.plan_budget(infos, queue_depth=100, cached=cached)
+
+    assert idle['views']['front'] == busy['views']['front'] == cached['front']
+    assert busy['views']['side']['level'] >= idle['views']['side']['level']
@@ -0,0 +1,66 @@
+# app/api/tests/test_frame_metrics.py
+"""逐帧指标的批量（NumPy）计算与按帧标量公式一致"""
+import math
+
+import numpy as np
+import pytest
+
+from app.api.landmark_store import LandmarkStore
+
+# 两个视角的模块依赖OpenCV/MediaPipe和配置文件，缺少时跳过
+process_front = pytest.importorskip('app.api.process_front', exc_type=ImportError)
+process_side = pytest.importorskip('app.api.process_side', exc_type=ImportError)
+
+
+def _store(count=120, seed=0):
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0.1, 0.9, size=(count, 33, 4)).astype(np.float32)
+    valid = np.ones(count, dtype=bool)
+    valid[[5, 6, 40]] = False
+    # 两肩重合的帧：握距比例应为NaN
+    points[70, 12, :2] = points[70, 11, :2]
+    return LandmarkStore.from_arrays(points, valid, 30.0)
+
+
+def _angle(top, bottom):
+    return math.degrees(math.atan2(top[0] - bottom[0], top[1] - bottom[1]))
+
+
+def test_front_metrics_match_per_frame_formulas():
+    store = _store()
+    df = process_front.AdvancedPullUpBenchmark().compute_frame_metrics(store)
+    assert len(df) == len(store)
+
+    for i in range(len(store)):
+        row = df.iloc[i]
+        if not store.valid[i]:
+            assert np.isnan(row['GRIP_RATIO']) and np.isnan(row['TORSO_ANGLE'])
+            continue
+        p = store.points[i].astype(np.float64)
+        wrist = math.dist(p[15, :2], p[16, :2])
+        shoulder = math.dist(p[11, :2], p[12, :2])
+        assert row['GRIP_WIDTH'] == pytest.approx(wrist, abs=1e-9)
+        if shoulder > 0:
+            assert row['GRIP_RATIO'] == pytest.approx(wrist / shoulder, rel=1e-9)
+        else:
+            assert np.isnan(row['GRIP_RATIO'])
+        assert row['MIN_SHOULDER_HEIGHT'] == pytest.approx(min(p[11, 1], p[12, 1]), abs=1e-9)
+        assert row['AVG_WRIST_HEIGHT'] == pytest.approx((p[15, 1] + p[16, 1]) / 2, abs=1e-9)
+        angle = _angle((p[11, :2] + p[12, :2]) / 2, (p[23, :2] + p[24, :2]) / 2)
+        assert row['TORSO_ANGLE'] == pytest.approx(angle, abs=1e-7)
+        assert row['TORSO_ANGLE_ABS'] == pytest.approx(abs(angle), abs=1e-7)
+
+
+def test_side_metrics_match_per_frame_formulas():
+    store = _store(seed=1)
+    df = process_side.AdvancedPullUpBenchmark().compute_frame_metrics(store)
+
+    for i in range(len(store)):
+        row = df.iloc[i]
+        if not store.valid[i]:
+            assert np.isnan(row['TORSO_ANGLE_side']) and np.isnan(row['LEFT_SHOULDER_Y'])
+            continue
+        p = store.points[i].astype(np.float64)
+        assert row['TORSO_ANGLE_side'] == pytest.approx(_angle(p[11], p[23]), abs=1e-7)
+        assert row['LOWER_ANGLE_ABS_side'] == pytest.approx(abs(_angle(p[23], p[25])), abs=1e-7)
+        assert row['LEFT_SHOULDER_Y'] == pytest.approx(p[11, 1], abs=1e-9)
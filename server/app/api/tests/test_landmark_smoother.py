@@ -0,0 +1,96 @@
+# app/api/tests/test_landmark_smoother.py
+"""定长数组实现的关键点平滑与原来按历史列表逐帧平滑的结果一致"""
+import numpy as np
+import pytest
+
+# 正面模块依赖OpenCV/MediaPipe和配置文件，缺少时跳过
+process_front = pytest.importorskip('app.api.process_front', exc_type=ImportError)
+
+
+class _ListSmoother:
+    """原实现：每帧关键点存为 {序号: (x, y, z, v)}，保留全部历史"""
+
+    def __init__(self, method, alpha=0.7, window_size=5):
+        self.method = method
+        self.alpha = alpha
+        self.window_size = window_size
+        self.history = []
+        self.smoothed_history = []
+
+    def smooth_frame(self, points):
+        current = {i: tuple(float(c) for c in p) for i, p in enumerate(points)}
+        self.history.append(current)
+        if self.method == 'double_exponential':
+            smoothed = self._double_exponential(current)
+        elif self.method == 'moving_average':
+            smoothed = self._moving_average(current)
+        else:
+            smoothed = current
+        self.smoothed_history.append(smoothed)
+        return np.array([smoothed[i] for i in sorted(smoothed)])
+
+    def _double_exponential(self, current):
+        if not self.smoothed_history:
+            return current
+        a, last = self.alpha, self.smoothed_history[-1]
+        smoothed = {}
+        for i, (x, y, z, v) in current.items():
+            s_x = a * x + (1 - a) * last[i][0]
+            s_y = a * y + (1 - a) * last[i][1]
+            if len(self.smoothed_history) > 1:
+                prev = self.smoothed_history[-2]
+                s_x += a * (last[i][0] - prev[i][0])
+                s_y += a * (last[i][1] - prev[i][1])
+            smoothed[i] = (s_x, s_y, z, v)
+        return smoothed
+
+    def _moving_average(self, current):
+        if len(self.history) < 2:
+            return current
+        window = self.history[-self.window_size:]
+        smoothed = {}
+        for i in current:
+            visible = [frame[i] for frame in window if frame[i][3] > 0.5]
+            if visible:
+                smoothed[i] = (sum(p[0] for p in visible) / len(visible),
+                               sum(p[1] for p in visible) / len(visible),
+                               sum(p[2] for p in visible) / len(visible),
+                               current[i][3])
+            else:
+                smoothed[i] = current[i]
+        return smoothed
+
+
+def _track(count=200, seed=0):
+    rng = np.random.default_rng(seed)
+    # 随机游走的坐标，可见度在0.5上下随机（移动平均只统计可见的帧）
+    points = np.cumsum(rng.normal(scale=0.01, size=(count, 33, 4)), axis=0) + 0.5
+    points[:, :, 3] = rng.uniform(0.2, 1.0, size=(count, 33))
+    valid = rng.random(count) > 0.1
+    return points, valid
+
+
+@pytest.mark.parametrize('method', ['double_exponential', 'moving_average', 'none'])
+def test_smooth_clip_matches_list_smoother(method):
+    points, valid = _track()
+    smoother = process_front.AdvancedPullUpBenchmark.LandmarkSmoother(smooth_method=method)
+
+    smoothed = smoother.smooth_clip(points, valid)
+
+    baseline = _ListSmoother(method)
+    for i in range(len(points)):
+        if valid[i]:
+            np.testing.assert_allclose(smoothed[i], baseline.smooth_frame(points[i]), rtol=1e-12, atol=1e-12)
+        else:
+            # 未检测到人体的帧不参与平滑，原样保留
+            np.testing.assert_array_equal(smoothed[i], points[i])
+
+
+def test_smooth_clip_starts_from_clean_state():
+    points, valid = _track(seed=1)
+    smoother = process_front.AdvancedPullUpBenchmark.LandmarkSmoother()
+
+    first = smoother.smooth_clip(points, valid)
+    second = smoother.smooth_clip(points, valid)
+
+    np.testing.assert_array_equal(first, second)
@@ -0,0 +1,68 @@
+# app/api/tests/test_rep_detector.py
+"""流式周期检测与批量检测（savgol + find_peaks）结果一致"""
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import signal
+
+from app.api.rep_detector import PROMINENCE, StreamingRepDetector, _PeakTracker
+
+
+def _shoulder_signal(seed, count=None, fps=30, gaps=True):
+    """带噪声和缺失帧的肩膀高度信号"""
+    rng = np.random.default_rng(seed)
+    count = count or int(rng.integers(300, 2000))
+    t = np.arange(count) / fps
+    period = rng.uniform(1.5, 4.0)
+    x = 0.5 + rng.uniform(0.03, 0.12) * np.cos(2 * np.pi * t / period + rng.uniform(0, 6))
+    x += rng.normal(0, rng.uniform(0.001, 0.01), count)
+    if gaps:
+        for _ in range(3):
+            start = int(rng.integers(0, count))
+            x[start:start + int(rng.integers(1, 20))] = np.nan
+    return x
+
+
+def _stream(detector, values):
+    cycles = []
+    for value in values:
+        cycles.extend(detector.push(value))
+    cycles.extend(detector.finish())
+    return cycles
+
+
+def _key(cycles):
+    return [(c['start_frame'], c['bottom_frame'], c['end_frame'], round(c['amplitude'], 9)) for c in cycles]
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_peak_tracker_matches_find_peaks(seed):
+    x = _shoulder_signal(seed, gaps=False)
+    x = signal.savgol_filter(x, 11, 2)
+    distance = max(15, len(x) // 20)
+    for values in (x, -x):
+        expected, _ = signal.find_peaks(values, distance=distance, prominence=PROMINENCE)
+        tracker = _PeakTracker(distance, PROMINENCE)
+        found = []
+        for value in values:
+            found.extend(index for index, _ in tracker.push(value))
+        found.extend(index for index, _ in tracker.finish())
+        assert found == list(expected)
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_streaming_matches_batch_detection(seed):
+    process_front = pytest.importorskip('app.api.process_front', exc_type=ImportError)
+    process_side = pytest.importorskip('app.api.process_side', exc_type=ImportError)
+    x = _shoulder_signal(seed)
+
+    cases = ((process_front, 'MIN_SHOULDER_HEIGHT', True), (process_side, 'LEFT_SHOULDER_Y', False))
+    for module, column, boundary_peak in cases:
+        with contextlib.redirect_stdout(io.StringIO()):
+            batch = module.AdvancedPullUpBenchmark().detect_rep_cycles_by_shoulder_height(
+                pd.DataFrame({column: x}))
+        streamed = _stream(StreamingRepDetector(len(x), boundary_peak=boundary_peak), x)
+        assert _key(streamed) == _key(batch)
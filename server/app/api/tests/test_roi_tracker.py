@@ -0,0 +1,34 @@
+# app/api/tests/test_roi_tracker.py
+"""人体区域跟踪：整帧输入不变，反复的上下动作中裁剪区域很快稳定"""
+import numpy as np
+import pytest
+
+roi_tracker = pytest.importorskip('app.api.roi_tracker', exc_type=ImportError)
+
+
+def _body(top, left=0.4, right=0.6, height=0.4):
+    """竖直方向 [top, top + height] 内均匀分布的33个可见关键点（归一化坐标）"""
+    points = np.zeros((33, 4))
+    points[:, 0] = np.linspace(left, right, 33)
+    points[:, 1] = np.linspace(top, top + height, 33)
+    points[:, 3] = 1.0
+    return points
+
+
+def test_full_frame_is_passed_through():
+    tracker = roi_tracker.PersonRoiTracker(1920, 1080, inference_size=480, enabled=True)
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+    assert tracker.prepare(frame) is frame
+
+
+def test_roi_settles_during_repetitions():
+    tracker = roi_tracker.PersonRoiTracker(1920, 1080, enabled=True)
+    changes = []
+    # 10个动作，身体在画面中上下移动20%
+    for top in np.tile(np.concatenate([np.linspace(0.4, 0.2, 15), np.linspace(0.2, 0.4, 15)]), 10):
+        tracker.update(_body(top))
+        changes.append(tracker.input_changed())
+
+    assert sum(changes) <= 4
+    assert not any(changes[60:])
@@ -0,0 +1,49 @@
+# app/api/tests/test_segment_stats.py
+"""分段归约统计与逐段 nanmean/nanmax/nanmin/nanstd 一致"""
+import warnings
+
+import numpy as np
+import pytest
+
+from app.api.segment_stats import segment_stats
+
+
+def _values(count=500, columns=3, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=(count, columns)) * [1.0, 10.0, 100.0]
+    values[rng.random((count, columns)) < 0.05] = np.nan
+    values[200:230, 1] = np.nan  # 整段缺失
+    return values
+
+
+def _expected(values, start, end):
+    segment = values[start:end]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return {
+            'mean': np.nanmean(segment, axis=0),
+            'max': np.nanmax(segment, axis=0),
+            'min': np.nanmin(segment, axis=0),
+            'std': np.nanstd(segment, axis=0)
+        }
+
+
+def test_matches_per_segment_reductions():
+    values = _values()
+    # 包含重叠、乱序、单帧和整段为NaN的帧段
+    starts = [0, 37, 100, 90, 205, 499, 300]
+    ends = [30, 80, 160, 120, 225, 500, 301]
+    stats = segment_stats(values, starts, ends)
+
+    for k, (start, end) in enumerate(zip(starts, ends)):
+        expected = _expected(values, start, end)
+        for name in ('mean', 'max', 'min', 'std'):
+            np.testing.assert_allclose(stats[name][k], expected[name], rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def test_rejects_empty_segments():
+    values = _values()
+    with pytest.raises(ValueError):
+        segment_stats(values, [10], [10])
+    with pytest.raises(ValueError):
+        segment_stats(values, [], [])
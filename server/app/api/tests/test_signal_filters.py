@@ -0,0 +1,41 @@
+# app/api/tests/test_signal_filters.py
+"""批量零相位低通滤波与逐列滤波一致"""
+import numpy as np
+from scipy import signal
+
+from app.api.signal_filters import butter_lowpass_sos, lowpass_filtfilt, savgol_dot_coeffs
+
+
+def _columns(count=400, fps=30.0):
+    t = np.arange(count) / fps
+    rng = np.random.default_rng(3)
+    return np.column_stack([
+        0.5 + 0.1 * np.cos(2 * np.pi * t / 3.0) + rng.normal(0, 0.01, count),
+        0.3 + 0.05 * np.sin(2 * np.pi * t / 2.2) + rng.normal(0, 0.02, count),
+        170 + 5 * np.sin(2 * np.pi * t / 4.0) + rng.normal(0, 1.0, count),
+    ])
+
+
+def test_lowpass_matches_per_column_filtering():
+    data = _columns()
+    for fps, cutoff in ((30.0, 0.1), (60.0, 2.0), (24.0, 5.0)):
+        sos = butter_lowpass_sos(4, cutoff, fps)
+        expected = np.column_stack([signal.sosfiltfilt(sos, data[:, i]) for i in range(data.shape[1])])
+        np.testing.assert_allclose(lowpass_filtfilt(data, fps, cutoff), expected, rtol=0, atol=1e-7)
+
+
+def test_lowpass_rejects_short_data_and_invalid_cutoff():
+    data = _columns()
+    assert lowpass_filtfilt(data[:10], 30.0, 0.1) is None
+    assert lowpass_filtfilt(data, 30.0, 15.0) is None
+    assert lowpass_filtfilt(data, 30.0, 0.0) is None
+
+
+def test_savgol_dot_coeffs_match_centre_of_savgol_filter():
+    x = _columns()[:, 0]
+    window = 11
+    smoothed = signal.savgol_filter(x, window, 2)
+    coeffs = savgol_dot_coeffs(window, 2)
+    half = window // 2
+    for i in range(half, len(x) - half, 37):
+        assert abs(np.dot(coeffs, x[i - half:i + half + 1]) - smoothed[i]) < 1e-9
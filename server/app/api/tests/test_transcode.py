@@ -0,0 +1,44 @@
+# app/api/tests/test_transcode.py
+"""转码判断与分析视频的缓存哈希"""
+import pytest
+
+transcode = pytest.importorskip('app.api.transcode', exc_type=ImportError)
+
+
+def _source(width, height, fps):
+    return {'width': width, 'height': height, 'fps': fps, 'total_frames': 300}
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    monkeypatch.setattr(transcode, 'TRANSCODE', True)
+    monkeypatch.setattr(transcode, 'TRANSCODE_MAX_SIDE', 720)
+    monkeypatch.setattr(transcode, 'TRANSCODE_FPS', 30)
+
+
+@pytest.mark.parametrize('source, expected', [
+    (_source(1280, 720, 30.0), False),
+    (_source(720, 1280, 29.97), False),
+    (_source(640, 480, 25.0), False),
+    (_source(1920, 1080, 30.0), True),
+    (_source(1280, 720, 60.0), True),
+    (_source(1280, 720, 0.0), True),
+    (None, False),
+])
+def test_needs_transcode(source, expected):
+    assert transcode.needs_transcode(source) is expected
+
+
+def test_small_video_is_not_transcoded(monkeypatch):
+    monkeypatch.setattr(transcode, 'find_ffmpeg', lambda: pytest.fail('不应调用ffmpeg'))
+
+    result = transcode.normalize_video('clip.mp4', source=_source(1280, 720, 30.0))
+
+    assert result['path'] == 'clip.mp4'
+    assert not result['transcoded']
+
+
+def test_analysis_hash_depends_only_on_settings():
+    assert transcode.analysis_hash('abc', False) == 'abc'
+    assert transcode.analysis_hash(None, True) is None
+    assert transcode.analysis_hash('abc', True) == transcode.analysis_hash('abc', True) != 'abc'
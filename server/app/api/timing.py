@@ -0,0 +1,57 @@
+# app/api/timing.py
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """
+    按阶段累计耗时（单调时钟）和调用次数，并记录帧数、检测数等计数
+    解码线程与推理线程会同时写入，内部加锁
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def span(self, name):
+        """with timer.span('阶段名'): ... 计时一段代码"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds, calls=1):
+        with self._lock:
+            stage = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            stage['seconds'] += seconds
+            stage['calls'] += calls
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, summary):
+        """合并另一个计时器 as_dict() 的结果（如分段并行各段的计时）"""
+        for name, stage in summary.get('stages', {}).items():
+            self.add(name, stage['seconds'], stage['calls'])
+        for name, value in summary.get('counters', {}).items():
+            self.count(name, value)
+
+    def as_dict(self):
+        """可JSON序列化的汇总：{'stages': {阶段: {'seconds', 'calls'}}, 'counters': {...}}"""
+        with self._lock:
+            return {
+                'stages': {name: {'seconds': round(stage['seconds'], 4), 'calls': stage['calls']}
+                           for name, stage in self.stages.items()},
+                'counters': dict(self.counters)
+            }
+
+
+def log_timings(task_id, timings):
+    """每个任务输出一行结构化（JSON）耗时日志，便于检索和汇总"""
+    print('⏱️ task_timings ' + json.dumps({'task_id': task_id, **timings}, ensure_ascii=False, sort_keys=True))
@@ -8,6 +8,19 @@ def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
 
+def save_file_with_hash(file_storage, path, chunk_size=1024 * 1024):
+    """分块保存上传文件，同时计算内容的SHA-256"""
+    sha256 = hashlib.sha256()
+    with open(path, 'wb') as f:
+        while True:
+            chunk = file_storage.stream.read(chunk_size)
+            if not chunk:
+                break
+            sha256.update(chunk)
+            f.write(chunk)
+    return sha256.hexdigest()
+
+
 def success_response(data=None, message='操作成功'):
     """成功响应"""
     return jsonify({
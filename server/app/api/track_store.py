@@ -0,0 +1,102 @@
+# app/api/track_store.py
+import json
+import os
+import time
+
+import numpy as np
+
+from app import config
+from .landmark_store import LandmarkStore
+
+
+TRACK_FOLDER = getattr(config, 'TRACK_FOLDER', 'tracks')
+TRACK_RETENTION_DAYS = getattr(config, 'TRACK_RETENTION_DAYS', 30)
+
+
+def _path(task_id):
+    return os.path.join(TRACK_FOLDER, f'{task_id}.npz')
+
+
+def save_tracks(task_id, tracks, alignment=None):
+    """
+    保存一次评估各视角的关键点轨迹，坐标以float16压缩存储
+    tracks: {'front': LandmarkStore, 'side': LandmarkStore}
+    alignment: 两路的对齐结果（轨迹从各自 frame_range 的起始帧开始），重新打分时用于周期配对
+    """
+    if not TRACK_FOLDER:
+        return
+
+    arrays = {}
+    if alignment is not None:
+        arrays['alignment'] = np.array(json.dumps(alignment))
+    for view, store in tracks.items():
+        arrays[f'{view}_points'] = store.points[:len(store)].astype(np.float16)
+        arrays[f'{view}_valid'] = store.valid[:len(store)]
+        arrays[f'{view}_fps'] = np.float64(store.fps or 0)
+
+    os.makedirs(TRACK_FOLDER, exist_ok=True)
+    path = _path(task_id)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ 关键点轨迹保存失败: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+
+    purge_expired()
+
+
+def load_tracks(task_id):
+    """读取保存的关键点轨迹，返回 {视角: LandmarkStore}，不存在时返回None"""
+    path = _path(task_id)
+    if not TRACK_FOLDER or not os.path.exists(path):
+        return None
+
+    tracks = {}
+    with np.load(path, allow_pickle=False) as data:
+        views = [name[:-len('_points')] for name in data.files if name.endswith('_points')]
+        for view in views:
+            tracks[view] = LandmarkStore.from_arrays(
+                data[f'{view}_points'].astype(np.float32),
+                data[f'{view}_valid'],
+                float(data[f'{view}_fps'])
+            )
+    return tracks
+
+
+def load_track_alignment(task_id):
+    """读取与轨迹一同保存的对齐结果，不存在时返回None"""
+    path = _path(task_id)
+    if not TRACK_FOLDER or not os.path.exists(path):
+        return None
+
+    with np.load(path, allow_pickle=False) as data:
+        if 'alignment' not in data.files:
+            return None
+        return json.loads(str(data['alignment']))
+
+
+def list_task_ids():
+    """列出所有仍保存着轨迹的任务ID（用于批量重新打分）"""
+    if not TRACK_FOLDER or not os.path.isdir(TRACK_FOLDER):
+        return []
+    return sorted(name[:-len('.npz')] for name in os.listdir(TRACK_FOLDER) if name.endswith('.npz'))
+
+
+def purge_expired():
+    """删除超过保留天数的轨迹，TRACK_RETENTION_DAYS为None时永久保留"""
+    if TRACK_RETENTION_DAYS is None or not os.path.isdir(TRACK_FOLDER):
+        return
+
+    deadline = time.time() - TRACK_RETENTION_DAYS * 24 * 3600
+    for name in os.listdir(TRACK_FOLDER):
+        path = os.path.join(TRACK_FOLDER, name)
+        try:
+            if os.path.getmtime(path) < deadline:
+                os.remove(path)
+        except OSError:
+            continue
@@ -0,0 +1,150 @@
+# app/api/transcode.py
+import os
+import shutil
+import subprocess
+import time
+
+from app import config
+from .pose_extraction import probe_video_info
+
+
+TRANSCODE = getattr(config, 'TRANSCODE', True)
+# 转码后视频短边的上限（像素），不放大
+TRANSCODE_MAX_SIDE = getattr(config, 'TRANSCODE_MAX_SIDE', 720)
+# 转码后的恒定帧率上限，原视频帧率更低时保持原帧率
+TRANSCODE_FPS = getattr(config, 'TRANSCODE_FPS', 30)
+TRANSCODE_CRF = getattr(config, 'TRANSCODE_CRF', 20)
+# 单个视频转码的超时（秒），需远小于Celery任务的软超时（240秒），超时后还要留出分析原视频的时间
+TRANSCODE_TIMEOUT = getattr(config, 'TRANSCODE_TIMEOUT', 90)
+# ffmpeg可执行文件路径，None时依次查找PATH和 imageio_ffmpeg 自带的ffmpeg
+FFMPEG_BINARY = getattr(config, 'FFMPEG_BINARY', None)
+
+
+def find_ffmpeg():
+    """查找可用的ffmpeg，找不到时返回None"""
+    if FFMPEG_BINARY:
+        return FFMPEG_BINARY
+    path = shutil.which('ffmpeg')
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        return None
+
+
+# 帧率的容差，29.97fps等常见帧率视为不超过30fps
+_FPS_TOLERANCE = 0.5
+
+
+def needs_transcode(source):
+    """原视频短边和帧率都已不超过上限时无需转码；未启用转码或无法读取视频时同样不转码"""
+    if not TRANSCODE or source is None:
+        return False
+    width, height, fps = source['width'], source['height'], source['fps']
+    if not width or not height or not fps or fps <= 0:
+        return True
+    return min(width, height) > TRANSCODE_MAX_SIDE or fps > TRANSCODE_FPS + _FPS_TOLERANCE
+
+
+def normalized_path(video_path):
+    """转码输出路径：与上传文件同目录"""
+    root, _ = os.path.splitext(video_path)
+    return f'{root}_normalized.mp4'
+
+
+def _target_fps(source_fps):
+    if not source_fps or source_fps <= 0:
+        return TRANSCODE_FPS
+    return min(TRANSCODE_FPS, round(source_fps, 3))
+
+
+def _ffmpeg_command(ffmpeg, video_path, output_path, fps):
+    # 短边缩放到不超过 TRANSCODE_MAX_SIDE，另一边按比例取偶数；竖屏手机视频同样按短边限制
+    side = TRANSCODE_MAX_SIDE
+    scale = (f"scale=w='if(gte(iw,ih),-2,min({side},iw))':h='if(gte(iw,ih),min({side},ih),-2)'"
+             f":flags=area")
+    return [
+        ffmpeg, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y',
+        '-i', video_path,
+        '-map', '0:v:0', '-an',
+        # fps滤镜按时间戳重采样为恒定帧率，手机拍摄的可变帧率视频帧号与时间一一对应
+        '-vf', f'{scale},fps={fps}',
+        # ultrafast + fastdecode（不用CABAC和去块滤波）解码开销最小；关键帧间隔1秒，便于分段跳转
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'fastdecode',
+        '-crf', str(TRANSCODE_CRF), '-pix_fmt', 'yuv420p', '-g', str(max(1, int(round(fps)))),
+        '-movflags', '+faststart',
+        output_path
+    ]
+
+
+def untranscoded(video_path, source):
+    """直接分析原视频时 normalize_video 的返回值"""
+    return {'path': video_path, 'transcoded': False, 'source': source, 'output': source,
+            'scale_x': 1.0, 'scale_y': 1.0, 'seconds': 0.0}
+
+
+def normalize_video(video_path, label='', source=None):
+    """
+    把上传视频转码为适合分析的中间文件：短边不超过 TRANSCODE_MAX_SIDE、恒定帧率、快速解码的H.264
+    关键点为归一化坐标，按比例缩放不影响指标；记录两个方向的缩放比例便于换算回原视频像素
+    原视频已满足上限、转码未启用、找不到ffmpeg或转码失败时返回原视频，返回值：
+    {'path': 分析使用的视频, 'transcoded', 'source': 原视频信息, 'output': 分析视频信息, 'scale_x', 'scale_y', 'seconds'}
+    source: 已读取的原视频信息（probe_video_info），None时在这里读取
+    """
+    source = source if source is not None else probe_video_info(video_path)
+    result = untranscoded(video_path, source)
+    if not needs_transcode(source):
+        return result
+
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        print("⚠️ 未找到ffmpeg，直接分析原视频")
+        return result
+
+    output_path = normalized_path(video_path)
+    command = _ffmpeg_command(ffmpeg, video_path, output_path, _target_fps(source['fps']))
+    started = time.perf_counter()
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=TRANSCODE_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"⚠️ {label}视频转码失败，直接分析原视频: {e}")
+        _remove(output_path)
+        return result
+
+    output = probe_video_info(output_path) if completed.returncode == 0 else None
+    if output is None or not output['total_frames'] or not source['width'] or not source['height']:
+        print(f"⚠️ {label}视频转码失败，直接分析原视频: {completed.stderr.strip()[-500:]}")
+        _remove(output_path)
+        return result
+
+    result.update(
+        path=output_path,
+        transcoded=True,
+        output=output,
+        scale_x=output['width'] / source['width'],
+        scale_y=output['height'] / source['height'],
+        seconds=round(time.perf_counter() - started, 3)
+    )
+    print(f"🎞️ {label}视频已转码: {source['width']}x{source['height']}@{source['fps']:.1f} → "
+          f"{output['width']}x{output['height']}@{output['fps']:.1f}，耗时{result['seconds']:.1f}s")
+    return result
+
+
+def analysis_hash(content_hash, transcoded):
+    """
+    分析视频对应的内容哈希（用于关键点缓存键）：转码后帧率和分辨率变化，帧号与原视频不再对应，
+    因此附加转码参数，避免与未转码时的缓存混用；只取决于原视频哈希和配置，转码前即可查缓存
+    """
+    if not content_hash or not transcoded:
+        return content_hash
+    return f"{content_hash}@{TRANSCODE_MAX_SIDE}p{TRANSCODE_FPS}crf{TRANSCODE_CRF}"
+
+
+def _remove(path):
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
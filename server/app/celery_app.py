@@ -28,6 +28,8 @@ def make_celery(app_name=__name__):
         task_track_started=True,
         task_time_limit=300,  # 5分钟超时
         task_soft_time_limit=240,  # 4分钟软超时
+        # 每个worker容器并行执行的任务数，计算预算按此估算排队时间
+        worker_concurrency=getattr(config, 'CELERY_CONCURRENCY', 4),
         worker_prefetch_multiplier=1,
         worker_max_tasks_per_child=100,
         broker_connection_retry_on_startup=True,
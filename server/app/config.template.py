@@ -22,6 +22,51 @@ env = os.getenv('FLASK_ENV', 'development')
 DataBase_Name = os.getenv('DATABASE', 'mysql')
 REDIS_HOST=os.getenv('REDIS_HOST', 'localhost')
 REDIS_PORT=os.getenv('REDIS_PORT', 6379)
+CELERY_CONCURRENCY = 4  # 每个celery worker并行执行的任务数
+
+# 视频分析配置
+POSE_POOL_SIZE = 1  # 每个worker进程为每种视角常驻的Pose实例数
+DECODE_QUEUE_SIZE = 4  # 解码线程与姿态推理之间的帧队列长度
+ANALYSIS_FPS = None  # 抽帧检测的目标帧率，None表示逐帧检测
+SAMPLING_DENSIFY_VELOCITY = 0.15  # 肩膀速度低于该值（归一化高度/秒）时逐帧检测，0表示不加密
+ROI_TRACKING = True  # 首次检测后只裁剪人体区域做推理
+ROI_INFERENCE_SIZE = 480  # 送入Pose的图像最长边（像素）
+ROI_PADDING = 0.25  # 裁剪区域相对人体框的外扩比例
+MOTION_GATING = True  # 画面静止（悬垂、停顿）时跳过姿态推理，跳过的帧插值补齐
+MOTION_GATE_THRESHOLD = 2.0  # 缩小灰度图与上一推理帧的平均绝对差（0~255）低于该值视为静止
+MOTION_GATE_MAX_SKIP = 5  # 最多连续跳过的帧数，即至少每 N+1 帧推理一次
+MOTION_GATE_SIZE = 64  # 计算帧差的缩小图宽度（像素）
+SEGMENT_PARALLEL_MIN_DURATION = 120  # 超过该时长（秒）的视频分段并行提取，None表示不启用
+SEGMENT_WORKERS = None  # 分段并行的线程数，None表示 CPU核数 // CELERY_CONCURRENCY（至少为1，即不分段）
+SEGMENT_WARMUP_SECONDS = 1.0  # 每段起点前多解码的秒数，用于重新锁定人体
+PREFLIGHT_SAMPLES = 8  # 预检抽查的帧数
+PREFLIGHT_MIN_DETECTION_RATE = 0.5  # 预检帧中识别到人体的最低比例
+PREFLIGHT_MIN_BRIGHTNESS = 40  # 预检帧的最低平均亮度（0~255）
+LANDMARK_CACHE_FOLDER = os.path.join('cache', 'landmarks')  # 按视频内容哈希缓存关键点，None表示不缓存
+LANDMARK_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 缓存总大小上限，超出时淘汰最久未使用的
+TRACK_FOLDER = 'tracks'  # 按任务保存关键点轨迹（用于重新打分），None表示不保存
+TRACK_RETENTION_DAYS = 30  # 轨迹保留天数，None表示永久保留
+PROGRESS_INTERVAL = 0.5  # 提取进度上报的最小间隔（秒）
+EVENT_STREAM_HEARTBEAT = 15  # 评估进度SSE无事件时的心跳间隔（秒）
+EVENT_STREAM_TOKEN_EXPIRES = timedelta(minutes=15)  # 上传后返回的SSE短期令牌有效期
+EVENT_STREAM_MAX_SECONDS = 900  # SSE连接的最长时长（秒），任务丢失时连接也会按时关闭
+COMPUTE_BUDGET = True  # 按视频时长、分辨率和队列积压自动选择模型复杂度和抽帧率
+BUDGET_TARGET_SECONDS = 120  # 单个任务从排队到完成的目标耗时（秒）
+BUDGET_AVG_TASK_SECONDS = 60  # 估算排队时间用的平均任务耗时（秒）
+BUDGET_WORKERS = None  # 同时执行分析任务的worker数，None表示取 CELERY_CONCURRENCY
+ALIGNMENT = True  # 正面/侧面视频按肩膀高度互相关对齐，只分析两路重叠的动作窗口
+ALIGN_PROBE_FPS = 5  # 对齐探测的抽帧率
+ALIGN_MIN_CORRELATION = 0.5  # 相关系数低于该值时不对齐，各自只裁掉首尾静止片段
+ALIGN_MAX_LAG_SECONDS = 30  # 两路视频开始录制的最大时间差（秒）
+ALIGN_PADDING_SECONDS = 1.5  # 动作窗口前后保留的秒数
+TRANSCODE = True  # worker中先用ffmpeg把上传视频转码为统一分辨率和恒定帧率的中间文件
+TRANSCODE_MAX_SIDE = 720  # 转码后视频短边的上限（像素），不放大
+TRANSCODE_FPS = 30  # 转码后的恒定帧率上限，短边和帧率都不超过上限的视频不转码
+TRANSCODE_TIMEOUT = 90  # 单个视频转码的超时时间（秒），超时则直接分析原视频；需远小于Celery软超时240秒
+FFMPEG_BINARY = None  # ffmpeg路径，None表示依次查找PATH和imageio-ffmpeg自带的ffmpeg
+RENDER_OVERLAY = False  # 是否默认生成骨架可视化视频（上传时可用 render_overlay 字段单独开启）
+OVERLAY_FOLDER = 'overlays'  # 可视化视频保存目录
+OVERLAY_RETENTION_DAYS = 1  # 可视化视频保存天数（任务记录24小时后过期），None表示永久保留
 
 
 
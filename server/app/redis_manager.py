@@ -121,6 +121,23 @@ class RedisManager:
             'failed_at': self._current_time()
         })
 
+    # ============== 任务事件推送 ==============
+    def publish_task_event(self, task_id, event):
+        """向任务频道发布事件（进度/完成/失败），由SSE接口转发给前端"""
+        channel = f"task_events:{task_id}"
+        return self.redis_client.publish(channel, json.dumps(event, ensure_ascii=False))
+
+    def subscribe_task_events(self, task_id):
+        """订阅任务频道，返回PubSub对象，用完需调用close()"""
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(f"task_events:{task_id}")
+        return pubsub
+
+    # ============== 任务队列 ==============
+    def queue_depth(self, queue_name='celery'):
+        """Celery队列中等待执行的任务数（broker与本实例使用同一个Redis库）"""
+        return self.redis_client.llen(queue_name)
+
     # ============== 辅助方法 ==============
     def _current_time(self):
         """获取当前时间字符串"""
@@ -1,26 +1,32 @@
-import datetime
-import hashlib
 import json
 import os
-import threading
 import time
 import uuid
-from .api import process_side
-from .api import process_front
+from datetime import timedelta
+
 import requests
-from flask import Flask, request, jsonify, Blueprint, Response
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
-from jwt import ExpiredSignatureError, InvalidTokenError
+from flask import request, jsonify, Blueprint, Response, send_file
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt, get_jwt_identity
 from werkzeug.utils import secure_filename
+# 只导入任务入口，视频分析依赖（cv2/mediapipe等）仅在Celery worker中加载
 from .api.celery_tasks import process_video_task
+from .api.overlay_store import overlay_path
+from .celery_app import celery_app
 from . import config
 from .redis_manager import redis_manager
 
 
-from .api.tools import error_response, success_response, hash_password
+from .api.tools import error_response, success_response, save_file_with_hash
 
 
 upload_bp = Blueprint('upload', __name__, url_prefix='/api')
+# SSE连接无事件时发送心跳的间隔（秒），同时借此检查是否错过了完成事件
+EVENT_STREAM_HEARTBEAT = getattr(config, 'EVENT_STREAM_HEARTBEAT', 15)
+# 浏览器EventSource无法设置请求头，SSE使用上传时签发的短期令牌（查询参数 jwt），只能订阅对应任务
+EVENT_STREAM_TOKEN_EXPIRES = getattr(config, 'EVENT_STREAM_TOKEN_EXPIRES', timedelta(minutes=15))
+EVENT_STREAM_SCOPE = 'evaluate_stream'
+# SSE连接的最长时长（秒），默认为任务硬超时加10分钟排队余量；超过后推送错误并关闭，避免任务丢失时连接一直挂起
+EVENT_STREAM_MAX_SECONDS = getattr(config, 'EVENT_STREAM_MAX_SECONDS', celery_app.conf.task_time_limit + 600)
 from .database import get_db
 
 system=get_db(config.DataBase_Name)
@@ -117,8 +123,9 @@ def upload():
     front_path = os.path.join(config.UPLOAD_FOLDER, f"{task_id}_front_{front_filename}")
     side_path = os.path.join(config.UPLOAD_FOLDER, f"{task_id}_side_{side_filename}")
 
-    front_video.save(front_path)
-    side_video.save(side_path)
+    # 保存的同时计算内容哈希，重复上传的视频可直接复用关键点缓存
+    front_hash = save_file_with_hash(front_video, front_path)
+    side_hash = save_file_with_hash(side_video, side_path)
 
 
     redis_manager.create_task(task_id,{
@@ -139,7 +146,14 @@ def upload():
     # )
     # thread.daemon = True
     # thread.start()
-    async_task = process_video_task.delay(task_id, front_path, side_path, user_id)
+    # 可选生成骨架可视化视频，未指定时取配置默认值（默认不生成）
+    render_overlay = request.form.get('render_overlay')
+    if render_overlay is not None:
+        render_overlay = render_overlay.lower() in ('1', 'true', 'yes')
+
+    async_task = process_video_task.delay(task_id, front_path, side_path, user_id,
+                                          front_hash=front_hash, side_hash=side_hash,
+                                          render_overlay=render_overlay)
 
     # 存储Celery任务ID
     redis_manager.update_task(task_id, {
@@ -158,9 +172,16 @@ def upload():
 
 
 
+    stream_token = create_access_token(
+        identity=str(user_id),
+        expires_delta=EVENT_STREAM_TOKEN_EXPIRES,
+        additional_claims={'scope': EVENT_STREAM_SCOPE, 'task_id': task_id}
+    )
+
     return jsonify({
         'success': True,
         'task_id': task_id,
+        'stream_token': stream_token,
         'message': '视频上传成功，正在分析中...'
     })
 
@@ -228,8 +249,12 @@ def get_evaluation_result(task_id):
 
 
     # 如果有Celery任务ID，查询任务状态
+    progress_info = {}
     if 'celery_task_id' in task:
         celery_task = process_video_task.AsyncResult(task['celery_task_id'])
+        if celery_task.state == 'PROCESSING' and isinstance(celery_task.info, dict):
+            # 任务上报的进度、阶段和预计剩余时间
+            progress_info = {key: celery_task.info.get(key) for key in ('progress', 'eta', 'views')}
 
         if celery_task.ready():
             if celery_task.successful():
@@ -253,7 +278,8 @@ def get_evaluation_result(task_id):
         return jsonify({
             'success': True,
             'status': 'processing',
-            'message': '视频分析中...'
+            'message': '视频分析中...',
+            **progress_info
         })
     elif task['status'] == 'error':
         return jsonify({
@@ -269,6 +295,112 @@ def get_evaluation_result(task_id):
         })
 
 
+def _final_event(task):
+    """任务记录已是完成/失败状态时对应的事件，未结束返回None"""
+    if task.get('status') == 'completed' and task.get('result') is not None:
+        return {'status': 'completed', 'result': task['result'], 'project': task.get('project', ''), 'progress': 100}
+    if task.get('status') == 'error':
+        return {'status': 'error', 'progress': 0, 'error': task.get('error', '分析过程中出现错误')}
+    return None
+
+
+def _aborted_event(task_id, task):
+    """
+    Celery已记录任务失败或被撤销（硬超时、worker被杀、进程池重启等），但任务记录没有写入最终状态时，
+    补写错误并返回对应事件；任务仍在排队或执行时返回None
+    """
+    celery_task_id = task.get('celery_task_id')
+    if not celery_task_id:
+        return None
+    if process_video_task.AsyncResult(celery_task_id).state not in ('FAILURE', 'REVOKED'):
+        return None
+    error = '分析任务异常终止，请重新上传视频'
+    redis_manager.set_task_error(task_id, error)
+    return {'status': 'error', 'progress': 0, 'error': error}
+
+
+@upload_bp.route('/evaluate/stream/<task_id>', methods=['GET'])
+@jwt_required(locations=['query_string'])
+def stream_evaluation_result(task_id):
+    """
+    以SSE推送评估进度和结果，任务完成或失败后关闭连接
+    令牌通过查询参数 jwt 传入，必须是上传该任务时返回的 stream_token
+    """
+    claims = get_jwt()
+    if claims.get('scope') != EVENT_STREAM_SCOPE or claims.get('task_id') != task_id:
+        return jsonify({'success': False, 'message': '权限不足'}), 403
+    user_id = get_jwt_identity()
+
+    task = redis_manager.get_task(task_id)
+    if task is None:
+        return jsonify({'success': False, 'message': '任务不存在'})
+    if task['user_id'] != int(user_id):
+        return jsonify({'success': False, 'message': '权限不足'})
+
+    # 先订阅再读取任务状态，避免错过两者之间发布的完成事件
+    pubsub = redis_manager.subscribe_task_events(task_id)
+
+    def generate():
+        try:
+            final = _final_event(redis_manager.get_task(task_id) or {})
+            if final is not None:
+                yield f"data: {json.dumps(final, ensure_ascii=False)}\n\n"
+                return
+
+            deadline = time.monotonic() + EVENT_STREAM_MAX_SECONDS
+            while True:
+                if time.monotonic() >= deadline:
+                    timeout = {'status': 'error', 'progress': 0, 'error': '等待分析结果超时，请稍后重新查询'}
+                    yield f"data: {json.dumps(timeout, ensure_ascii=False)}\n\n"
+                    return
+
+                message = pubsub.get_message(timeout=EVENT_STREAM_HEARTBEAT)
+                if message is None:
+                    # 长时间无事件：检查任务是否已结束，或已被Celery标记为失败（worker被杀时不会写入任务记录）
+                    task = redis_manager.get_task(task_id) or {'status': 'error', 'error': '任务不存在'}
+                    final = _final_event(task) or _aborted_event(task_id, task)
+                    if final is not None:
+                        yield f"data: {json.dumps(final, ensure_ascii=False)}\n\n"
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+
+                yield f"data: {message['data']}\n\n"
+                if json.loads(message['data']).get('status') in ('completed', 'error'):
+                    return
+        finally:
+            pubsub.close()
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
+@upload_bp.route('/evaluate/overlay/<task_id>/<view>', methods=['GET'])
+@jwt_required()
+def get_overlay_video(task_id, view):
+    """下载骨架可视化视频（上传时开启 render_overlay，分析完成后由渲染任务生成）"""
+    user_id = get_jwt_identity()
+    task = redis_manager.get_task(task_id)
+    if task is None:
+        return jsonify({'success': False, 'message': '任务不存在'})
+    if task['user_id'] != int(user_id):
+        return jsonify({'success': False, 'message': '权限不足'})
+    if view not in ('front', 'side'):
+        return jsonify({'success': False, 'message': '视角只能是 front 或 side'})
+
+    path = overlay_path(task_id, view)
+    if not os.path.exists(path):
+        return jsonify({'success': False, 'message': '可视化视频不存在或仍在生成'})
+    return send_file(os.path.abspath(path), mimetype='video/mp4', conditional=True)
+
+
 @upload_bp.route('/chat', methods=['POST'])
 @jwt_required()
 def chat_stream():
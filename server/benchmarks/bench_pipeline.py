@@ -0,0 +1,234 @@
+# benchmarks/bench_pipeline.py
+"""
+视频分析流水线基准：用合成数据测量各阶段耗时、吞吐（帧/秒）和峰值内存，输出JSON并与基线比较
+
+在 server 目录下运行（仅需CPU，无需联网）：
+    # 关键点fixture模式：绕过MediaPipe，只测平滑、指标、滤波、周期检测和评估
+    python benchmarks/bench_pipeline.py --mode fixture --duration 60 --reps 10
+    # 视频模式：生成火柴人视频，走完整的解码 + 姿态推理 + 打分流程
+    python benchmarks/bench_pipeline.py --mode video --width 1280 --height 720 --fps 30
+    # 默认与仓库中的 benchmarks/baseline.json（默认参数的fixture模式，CPU机器上生成）比较，
+    # 吞吐下降超过容差时返回非零；参数与基线不同时跳过比较
+    python benchmarks/bench_pipeline.py --tolerance 0.1
+    # 优化后重新生成基线 / 与其他基线比较 / 不比较
+    python benchmarks/bench_pipeline.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --baseline other.json
+    python benchmarks/bench_pipeline.py --baseline ''
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from synthetic import load_fixture, pullup_landmarks, render_clip, save_fixture  # noqa: E402
+
+
+VIEWS = ('front', 'side')
+# 仓库中提交的基线（默认参数的fixture模式）
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# 这些参数与基线不同时结果不可比
+COMPARABLE_KEYS = ('mode', 'width', 'height', 'fps', 'duration', 'reps', 'seed', 'fixture')
+# 阶段耗时变慢超过该绝对值（秒）才提示，避免毫秒级抖动
+MIN_STAGE_DELTA = 0.005
+
+
+def _modules():
+    from app.api import process_front, process_side
+    return {'front': process_front, 'side': process_side}
+
+
+def run_fixture(view, points, valid, fps):
+    """关键点fixture模式：从原始关键点开始，按线上提取之后的流程计时"""
+    from app.api.landmark_store import LandmarkStore
+    from app.api.timing import StageTimer
+
+    module = _modules()[view]
+    timer = StageTimer()
+    with timer.span('extract'):
+        store = LandmarkStore.from_arrays(points, valid, fps)
+        benchmark_system = module.AdvancedPullUpBenchmark()
+        if view == 'front':
+            with timer.span('smoothing'):
+                store.points = benchmark_system.landmark_smoother.smooth_clip(store.points, store.valid)
+        with timer.span('fill_skipped'):
+            store.fill_skipped()
+        with timer.span('metrics'):
+            df = benchmark_system.compute_frame_metrics(store)
+    timer.count('frames', len(store))
+    with timer.span('score'):
+        module.score(store, df, timer=timer)
+    return timer.as_dict()
+
+
+def run_video(view, video_path):
+    """视频模式：完整提取（不使用关键点缓存）并打分"""
+    from app.api.timing import StageTimer
+
+    module = _modules()[view]
+    timer = StageTimer()
+    with timer.span('extract'):
+        extracted = module.extract(video_path, timer=timer)
+    if extracted is not None:
+        with timer.span('score'):
+            module.score(*extracted, timer=timer)
+    return timer.as_dict()
+
+
+def summarize(timings):
+    """从一次运行的计时中提取总耗时和吞吐"""
+    stages = timings['stages']
+    seconds = sum(stages[name]['seconds'] for name in ('extract', 'score') if name in stages)
+    frames = timings['counters'].get('frames', 0)
+    return {
+        'frames': frames,
+        'seconds': round(seconds, 4),
+        'fps': round(frames / seconds, 2) if seconds > 0 else None,
+        **timings
+    }
+
+
+def run(args):
+    """按参数生成数据并逐个视角运行，每个视角取最快的一次"""
+    config = {key: getattr(args, key) for key in ('mode', 'width', 'height', 'fps', 'duration', 'reps',
+                                                  'seed', 'repeat', 'fixture')}
+    with tempfile.TemporaryDirectory(prefix='pullup-bench-') as workdir:
+        if args.fixture:
+            fixtures = load_fixture(args.fixture)
+        else:
+            fixtures = {view: (pullup_landmarks(view, args.fps, args.duration, args.reps, seed=args.seed),
+                               None, args.fps)
+                        for view in args.views}
+            if args.save_fixture:
+                save_fixture(args.save_fixture, {view: points for view, (points, _, _) in fixtures.items()}, args.fps)
+
+        results = {}
+        for view in args.views:
+            if view not in fixtures:
+                print(f"⚠️ fixture中没有{view}视角，跳过")
+                continue
+            points, valid, fps = fixtures[view]
+            if valid is None:
+                valid = [True] * len(points)
+
+            if args.mode == 'video':
+                video_path = render_clip(os.path.join(workdir, f'{view}.mp4'), points, args.width, args.height, fps)
+                runs = [summarize(run_video(view, video_path)) for _ in range(args.repeat)]
+            else:
+                runs = [summarize(run_fixture(view, points, valid, fps)) for _ in range(args.repeat)]
+            results[view] = min(runs, key=lambda r: r['seconds'])
+
+    return {
+        'config': config,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'views': results
+    }
+
+
+def compare(report, baseline, tolerance):
+    """与基线比较，返回 (吞吐下降的视角列表, 变慢的阶段列表)"""
+    regressions, slower_stages = [], []
+    for view, result in report['views'].items():
+        base = baseline.get('views', {}).get(view)
+        if base is None:
+            continue
+        if base.get('fps') and result['fps'] is not None and result['fps'] < base['fps'] * (1 - tolerance):
+            regressions.append({'view': view, 'fps': result['fps'], 'baseline_fps': base['fps']})
+
+        for name, stage in result['stages'].items():
+            base_stage = base.get('stages', {}).get(name)
+            if base_stage is None:
+                continue
+            delta = stage['seconds'] - base_stage['seconds']
+            if delta > MIN_STAGE_DELTA and stage['seconds'] > base_stage['seconds'] * (1 + tolerance):
+                slower_stages.append({'view': view, 'stage': name, 'seconds': stage['seconds'],
+                                      'baseline_seconds': base_stage['seconds']})
+    return regressions, slower_stages
+
+
+def print_report(report):
+    for view, result in report['views'].items():
+        print(f"📊 {view}: {result['frames']} 帧, {result['seconds']:.3f}s, {result['fps']} 帧/秒")
+        stages = sorted(result['stages'].items(), key=lambda item: -item[1]['seconds'])
+        for name, stage in stages:
+            print(f"   {name:<16} {stage['seconds']:>9.4f}s  ×{stage['calls']}")
+        if result['counters']:
+            print(f"   计数: {result['counters']}")
+    print(f"💾 峰值RSS: {report['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='引体向上视频分析流水线基准')
+    parser.add_argument('--mode', choices=('fixture', 'video'), default='fixture',
+                        help='fixture: 关键点输入，绕过MediaPipe；video: 合成视频，完整流程')
+    parser.add_argument('--views', nargs='+', choices=VIEWS, default=list(VIEWS))
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--duration', type=float, default=30.0, help='视频时长（秒）')
+    parser.add_argument('--reps', type=int, default=8, help='引体向上个数')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='每个视角重复次数，取最快一次')
+    parser.add_argument('--fixture', help='使用已有的关键点轨迹npz（如 tracks/ 下保存的真实轨迹）')
+    parser.add_argument('--save-fixture', help='把生成的关键点轨迹保存为npz')
+    parser.add_argument('--output', help='JSON报告输出路径，默认打印到标准输出')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='与该基线JSON比较，默认为仓库中的 benchmarks/baseline.json，传空字符串不比较')
+    parser.add_argument('--save-baseline', help='把本次结果保存为基线JSON')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='允许的吞吐下降比例')
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+
+    exit_code = 0
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        mismatched = [key for key in COMPARABLE_KEYS
+                      if baseline.get('config', {}).get(key) != report['config'][key]]
+        if mismatched:
+            print(f"⚠️ 参数与基线不同（{', '.join(mismatched)}），跳过比较")
+            baseline = None
+    elif args.baseline:
+        print(f"⚠️ 基线文件不存在: {args.baseline}")
+    if baseline is not None:
+        regressions, slower_stages = compare(report, baseline, args.tolerance)
+        report['comparison'] = {'baseline': args.baseline, 'tolerance': args.tolerance,
+                                'regressions': regressions, 'slower_stages': slower_stages}
+        for item in slower_stages:
+            print(f"⚠️ {item['view']}/{item['stage']} 变慢: {item['baseline_seconds']:.4f}s → {item['seconds']:.4f}s")
+        for item in regressions:
+            print(f"❌ {item['view']} 吞吐下降: {item['baseline_fps']} → {item['fps']} 帧/秒")
+        if regressions:
+            exit_code = 1
+        else:
+            print("✅ 吞吐未低于基线")
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.save_baseline:
+        saved = {key: value for key, value in report.items() if key != 'comparison'}
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(saved, ensure_ascii=False, indent=2) + '\n')
+        print(f"✅ 基线已保存: {args.save_baseline}")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# benchmarks/bench_pose_pool.py
+"""
+Pose实例池基准：测量各种情况下一个任务从借出实例到第一帧推理完成的耗时，评估预热和归还策略的效果
+    cold          新建Pose后的第一帧（不使用实例池时每个任务的开销）
+    warmed        warm_up 之后借出的第一帧（worker启动后的第一个任务）
+    next_task     归还后间隔 --gap 秒（打分等后续阶段）再次借出的第一帧（之后的每个任务）
+    next_task_now 归还后立即再次借出的第一帧（需要等待后台重置完成，最坏情况）
+    after_reset   pose.reset() 之后直接处理的第一帧（旧的归还方式，对照）
+    steady        跟踪状态下的普通帧
+
+在 server 目录下运行（需要mediapipe和opencv）：
+    python benchmarks/bench_pose_pool.py --profile side --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from synthetic import pullup_landmarks, render_frame  # noqa: E402
+
+
+def _frames(view, count, width, height):
+    import cv2
+
+    points = pullup_landmarks(view, 30.0, count / 30.0, 1)
+    return [cv2.cvtColor(render_frame(p, width, height), cv2.COLOR_BGR2RGB) for p in points]
+
+
+def _timed(pose, frame):
+    start = time.perf_counter()
+    pose.process(frame)
+    return time.perf_counter() - start
+
+
+def _first_frame(pool, profile, frames):
+    """借出实例、处理一个任务的帧并归还，返回从借出到第一帧完成的秒数"""
+    start = time.perf_counter()
+    with pool.borrow(profile) as pose:
+        pose.process(frames[0])
+        elapsed = time.perf_counter() - start
+        for frame in frames[1:]:
+            pose.process(frame)
+    return elapsed
+
+
+def run_once(profile, frames, gap):
+    """在同一进程中依次测量各情况，返回 {情况: 秒}"""
+    from app.api.pose_pool import PosePool, create_pose
+
+    result = {}
+    pose = create_pose(profile)
+    result['cold'] = _timed(pose, frames[0])
+    steady = [_timed(pose, frame) for frame in frames[1:]]
+    pose.reset()
+    result['after_reset'] = _timed(pose, frames[0])
+    pose.close()
+    result['steady'] = statistics.median(steady)
+
+    pool = PosePool(size=1)
+    pool.warm_up((profile,))
+    result['warmed'] = _first_frame(pool, profile, frames)
+    time.sleep(gap)
+    result['next_task'] = _first_frame(pool, profile, frames)
+    result['next_task_now'] = _first_frame(pool, profile, frames)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pose实例池预热与归还策略基准')
+    parser.add_argument('--profile', choices=('front', 'side'), default='side')
+    parser.add_argument('--runs', type=int, default=5, help='重复次数（每次新建实例池），取中位数')
+    parser.add_argument('--frames', type=int, default=30, help='每个任务处理的帧数')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--gap', type=float, default=0.5, help='两个任务之间的间隔（秒）')
+    args = parser.parse_args()
+
+    view = 'front' if args.profile == 'front' else 'side'
+    frames = _frames(view, args.frames, args.width, args.height)
+    runs = [run_once(args.profile, frames, args.gap) for _ in range(args.runs)]
+    summary = {name: round(statistics.median(r[name] for r in runs) * 1000, 1) for name in runs[0]}
+
+    for name, ms in summary.items():
+        print(f"⏱️ {name:<14} {ms:>8.1f} ms")
+    print(json.dumps({'profile': args.profile, 'runs': args.runs, 'frame_ms': summary},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
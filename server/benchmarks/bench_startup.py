@@ -0,0 +1,85 @@
+# benchmarks/bench_startup.py
+"""
+测量Web进程 create_app() 的启动耗时和内存占用，并检查是否加载了视频分析依赖
+
+在 server 目录下运行：python benchmarks/bench_startup.py --runs 5
+每次在全新的子进程中导入并创建应用，避免模块缓存影响结果
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Web进程不应加载的视频分析依赖
+HEAVY_MODULES = ['cv2', 'mediapipe', 'matplotlib', 'scipy', 'pandas', 'tqdm']
+
+# 子进程中执行：计时创建应用，读取RSS和已加载的模块
+PROBE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+from app import create_app
+create_app()
+elapsed = time.perf_counter() - start
+
+rss_kb = None
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss_kb = int(line.split()[1])
+print(json.dumps({
+    'seconds': elapsed,
+    'rss_mb': rss_kb / 1024 if rss_kb is not None else None,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy_modules': sorted(m for m in %r if m in sys.modules),
+}))
+''' % (HEAVY_MODULES,)
+
+
+def run_once():
+    """在新的子进程中创建一次应用，返回测量结果"""
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=SERVER_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    # create_app 过程中可能有其他输出，结果在最后一行
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='create_app() 启动耗时与内存基准')
+    parser.add_argument('--runs', type=int, default=5, help='重复次数')
+    parser.add_argument('--json', action='store_true', help='以JSON输出汇总结果')
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    seconds = [r['seconds'] for r in runs]
+    rss = [r['rss_mb'] for r in runs if r['rss_mb'] is not None]
+    summary = {
+        'runs': args.runs,
+        'seconds_median': statistics.median(seconds),
+        'seconds_min': min(seconds),
+        'rss_mb_median': statistics.median(rss) if rss else None,
+        'max_rss_mb_median': statistics.median(r['max_rss_mb'] for r in runs),
+        'heavy_modules': sorted({m for r in runs for m in r['heavy_modules']}),
+    }
+
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    else:
+        print(f"⏱️ create_app() 耗时: 中位数 {summary['seconds_median']:.3f}s, 最快 {summary['seconds_min']:.3f}s")
+        if summary['rss_mb_median'] is not None:
+            print(f"💾 RSS: {summary['rss_mb_median']:.1f} MB (峰值 {summary['max_rss_mb_median']:.1f} MB)")
+        if summary['heavy_modules']:
+            print(f"⚠️ Web进程加载了视频分析依赖: {', '.join(summary['heavy_modules'])}")
+        else:
+            print("✅ 未加载视频分析依赖")
+
+    # 加载了视频分析依赖时返回非零，便于在CI中检查
+    return 1 if summary['heavy_modules'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+# benchmarks/synthetic.py
+"""
+离线生成确定性的合成测试数据：做N个引体向上的火柴人关键点轨迹与对应视频
+
+- pullup_landmarks: 生成 (帧数, 33, 4) 的关键点数组，可直接作为LandmarkStore使用（绕过MediaPipe）
+- render_clip: 把关键点轨迹画成火柴人视频，用于测量解码和姿态推理的吞吐
+- save_fixture / load_fixture: 关键点轨迹的npz文件，与 track_store 保存的轨迹格式一致，
+  因此线上记录的真实轨迹也可以直接作为基准输入
+"""
+import os
+
+import numpy as np
+
+
+NUM_LANDMARKS = 33
+
+# 火柴人绘制用的连接线
+STICK_CONNECTIONS = [
+    (11, 12), (11, 13), (13, 15), (12, 14), (14, 16),
+    (11, 23), (12, 24), (23, 24), (23, 25), (25, 27), (24, 26), (26, 28)
+]
+
+
+def _cycle_phase(frames, fps, duration, reps):
+    """
+    每帧的动作相位：0为悬垂，1为下巴过杠
+    开头1秒从半屈臂下放到悬垂、结尾1秒再略微上拉，使每次悬垂都是信号内部的波峰，N个动作正好对应N个周期
+    """
+    t = frames / fps
+    lead = min(1.0, duration / 10)
+    end = duration - lead
+    period = (end - lead) / max(reps, 1)
+    phase = np.zeros_like(t)
+
+    inside = (t >= lead) & (t < end)
+    phase[inside] = 0.5 - 0.5 * np.cos(2 * np.pi * (t[inside] - lead) / period)
+    before, after = t < lead, t >= end
+    phase[before] = 0.3 * (1 - t[before] / lead) ** 2
+    phase[after] = 0.3 * ((t[after] - end) / lead) ** 2
+    return phase
+
+
+def pullup_landmarks(view='front', fps=30.0, duration=20.0, reps=5, seed=0, noise=0.002):
+    """
+    生成引体向上的关键点轨迹（归一化坐标），返回 (帧数, 33, 4) float32 数组
+    view: 'front' 正面（双臂对称张开）或 'side' 侧面（身体轮廓）
+    """
+    count = int(round(fps * duration))
+    frames = np.arange(count, dtype=np.float64)
+    phase = _cycle_phase(frames, fps, duration, reps)
+    rng = np.random.default_rng(seed)
+
+    points = np.zeros((count, NUM_LANDMARKS, 4))
+    points[:, :, 3] = 0.95
+
+    # 手腕固定在单杠上，肩膀随动作上下移动
+    bar_y = 0.15
+    shoulder_y = 0.45 - 0.17 * phase
+
+    def put(idx, x, y):
+        points[:, idx, 0] = x
+        points[:, idx, 1] = y
+
+    if view == 'front':
+        for side, sign in ((0, -1), (1, 1)):
+            put(11 + side, 0.5 + sign * 0.09, shoulder_y)                            # 肩膀
+            put(15 + side, 0.5 + sign * 0.2, bar_y)                                   # 手腕
+            put(13 + side, 0.5 + sign * (0.19 + 0.04 * phase), (shoulder_y + bar_y) / 2)  # 肘部
+            put(23 + side, 0.5 + sign * 0.06, shoulder_y + 0.26)                      # 髋部
+            put(25 + side, 0.5 + sign * 0.06, shoulder_y + 0.42)                      # 膝盖
+            put(27 + side, 0.5 + sign * 0.05, shoulder_y + 0.56)                      # 脚踝
+    else:
+        # 侧面：左右两侧重合，髋部和腿随动作略微前后摆动
+        sway = 0.02 * np.sin(np.pi * phase)
+        for side in (0, 1):
+            put(11 + side, 0.5, shoulder_y)
+            put(15 + side, 0.52, bar_y)
+            put(13 + side, 0.5 + 0.05 * phase, (shoulder_y + bar_y) / 2)
+            put(23 + side, 0.49 - sway, shoulder_y + 0.26)
+            put(25 + side, 0.5 + sway, shoulder_y + 0.42)
+            put(27 + side, 0.48 + sway, shoulder_y + 0.56)
+
+    # 头部（鼻子及面部关键点）在两肩中点上方
+    head_x = (points[:, 11, 0] + points[:, 12, 0]) / 2
+    for idx in range(0, 11):
+        put(idx, head_x + 0.01 * (idx % 3 - 1), shoulder_y - 0.09)
+    # 手掌和脚掌关键点跟随手腕和脚踝
+    for idx, anchor in ((17, 15), (19, 15), (21, 15), (18, 16), (20, 16), (22, 16),
+                        (29, 27), (31, 27), (30, 28), (32, 28)):
+        put(idx, points[:, anchor, 0], points[:, anchor, 1] + 0.02)
+
+    points[:, :, :2] += rng.normal(0, noise, size=(count, NUM_LANDMARKS, 2))
+    return points.astype(np.float32)
+
+
+def render_frame(frame_points, width=1280, height=720):
+    """把一帧关键点画成火柴人图像（BGR，浅色背景、深色躯干）"""
+    import cv2
+
+    thickness = max(2, width // 60)
+    frame = np.full((height, width, 3), 210, dtype=np.uint8)
+    # 单杠
+    bar_y = int(frame_points[15, 1] * height)
+    cv2.line(frame, (0, bar_y), (width, bar_y), (60, 60, 60), thickness // 2 + 1)
+
+    xy = [(int(x * width), int(y * height)) for x, y in frame_points[:, :2]]
+    for start, end in STICK_CONNECTIONS:
+        cv2.line(frame, xy[start], xy[end], (40, 40, 90), thickness)
+    cv2.circle(frame, xy[0], thickness * 3, (40, 40, 90), -1)
+    return frame
+
+
+def render_clip(path, points, width=1280, height=720, fps=30.0):
+    """把关键点轨迹画成火柴人视频，返回视频路径"""
+    import cv2
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    try:
+        for frame_points in points:
+            out.write(render_frame(frame_points, width, height))
+    finally:
+        out.release()
+    return path
+
+
+def save_fixture(path, views, fps):
+    """保存关键点轨迹fixture，格式与 track_store.save_tracks 一致：{视角}_points/_valid/_fps"""
+    arrays = {}
+    for view, points in views.items():
+        arrays[f'{view}_points'] = points
+        arrays[f'{view}_valid'] = np.ones(len(points), dtype=bool)
+        arrays[f'{view}_fps'] = np.float64(fps)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    np.savez_compressed(path, **arrays)
+    return path
+
+
+def load_fixture(path):
+    """读取关键点轨迹fixture，返回 {视角: (points, valid, fps)}"""
+    views = {}
+    with np.load(path, allow_pickle=False) as data:
+        for name in data.files:
+            if name.endswith('_points'):
+                view = name[:-len('_points')]
+                views[view] = (data[name].astype(np.float32), data[f'{view}_valid'], float(data[f'{view}_fps']))
+    return views
@@ -1,7 +1,9 @@
 # gunicorn.conf.py
 bind = "0.0.0.0:5000"
 workers = 4
-worker_class = "sync"
+# SSE长连接（评估进度、聊天）会一直占用处理线程，使用线程worker
+worker_class = "gthread"
+threads = 32
 worker_connections = 1000
 timeout = 30
 max_requests = 1000